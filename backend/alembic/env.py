@@ -28,12 +28,35 @@ BACKEND_DIR_FOR_APP = os.path.abspath(os.path.join(os.path.dirname(__file__), '.
 sys.path.append(BACKEND_DIR_FOR_APP)
 
 from app.models import SQLModel # This should now work as 'app' is findable from BACKEND_DIR_FOR_APP
-from app.database import DATABASE_URL
-
-config.set_main_option('sqlalchemy.url', DATABASE_URL)
+from app.core.config import settings
+from app.database import DATABASE_URL, USAGE_DATABASE_URL, USAGE_TABLES
+
+# `alembic -n usage ...` migrates the separate usage database instead, with
+# the revisions in alembic/usage_versions
+migrating_usage = config.config_ini_section == "usage"
+if migrating_usage:
+    if not settings.USAGE_DATABASE_PATH:
+        raise RuntimeError("USAGE_DATABASE_PATH is not set; the usage tables live in the main database.")
+    config.set_main_option('sqlalchemy.url', USAGE_DATABASE_URL)
+    # Lets the first usage revision copy existing events over from the main database
+    config.attributes['main_database_path'] = settings.DATABASE_PATH
+else:
+    config.set_main_option('sqlalchemy.url', DATABASE_URL)
 
 target_metadata = SQLModel.metadata
 
+USAGE_TABLE_NAMES = {table.name for table in USAGE_TABLES}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Limits autogenerate to the usage tables, without the foreign keys to `user`, for the usage database."""
+    if not migrating_usage:
+        return True
+    if type_ == "foreign_key_constraint":
+        return False
+    table = object if type_ == "table" else getattr(object, "table", None)
+    return table is None or table.name in USAGE_TABLE_NAMES
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -58,6 +81,8 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
+        compare_server_default=True,
     )
 
     with context.begin_transaction():
@@ -79,7 +104,10 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            compare_server_default=True,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,75 @@
+"""Create the usage tables in the separate usage database
+
+Revision ID: c0e2bd422a58
+Revises:
+Create Date: 2026-10-18 12:31:08.214377
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c0e2bd422a58'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = ('usage',)
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 50000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # `user` stays in the main database, so user_id can't be a foreign key here
+    usage_log = op.create_table('addonusagelog',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('addon', sa.String(), nullable=False, server_default='unknown'),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    usage_daily = op.create_table('addonusagedaily',
+    sa.Column('day', sa.String(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('addon', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'user_id', 'addon')
+    )
+
+    # Copy the events already logged in the main database, before the indexes
+    # exist so they are built once. The main database's copies are left alone.
+    main_database_path = context.config.attributes.get('main_database_path')
+    if main_database_path and os.path.exists(main_database_path):
+        source = sa.create_engine(f"sqlite:///file:{main_database_path}?mode=ro&uri=true")
+        try:
+            with source.connect() as conn:
+                existing = set(sa.inspect(conn).get_table_names())
+                for table in (usage_log, usage_daily):
+                    if table.name not in existing:
+                        continue
+                    # Plain DB-API tuples: stored values are copied as they are
+                    columns = ", ".join(column.name for column in table.columns)
+                    placeholders = ", ".join("?" for _ in table.columns)
+                    result = conn.exec_driver_sql(f"SELECT {columns} FROM {table.name}")
+                    for rows in result.partitions(BACKFILL_BATCH_SIZE):
+                        op.get_bind().exec_driver_sql(
+                            f"INSERT INTO {table.name} ({columns}) VALUES ({placeholders})", [tuple(row) for row in rows]
+                        )
+        finally:
+            source.dispose()
+
+    op.create_index('ix_addonusagelog_created_at_id', 'addonusagelog', ['created_at', 'id'], unique=False)
+    op.create_index('ix_addonusagelog_user_id_created_at_id', 'addonusagelog', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index(op.f('ix_addonusagedaily_user_id'), 'addonusagedaily', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_addonusagedaily_user_id'), table_name='addonusagedaily')
+    op.drop_index('ix_addonusagelog_user_id_created_at_id', table_name='addonusagelog')
+    op.drop_index('ix_addonusagelog_created_at_id', table_name='addonusagelog')
+    op.drop_table('addonusagedaily')
+    op.drop_table('addonusagelog')
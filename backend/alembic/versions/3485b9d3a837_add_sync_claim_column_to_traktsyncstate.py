@@ -0,0 +1,28 @@
+"""Add sync claim column to TraktSyncState
+
+Revision ID: 3485b9d3a837
+Revises: 739a7eb5c522
+Create Date: 2026-10-18 12:50:19.270574
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3485b9d3a837'
+down_revision: Union[str, Sequence[str], None] = '739a7eb5c522'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('traktsyncstate', sa.Column('claimed_until', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('traktsyncstate', 'claimed_until')
@@ -0,0 +1,72 @@
+"""Add Trakt sync state, history and watchlist tables
+
+Revision ID: 4f2c8a1d9e60
+Revises: 7b9d2e4f6a13
+Create Date: 2026-10-18 12:41:09.099403
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f2c8a1d9e60'
+down_revision: Union[str, Sequence[str], None] = '7b9d2e4f6a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('trakthistory',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('history_id', sa.Integer(), nullable=False),
+    sa.Column('media_type', sa.String(), nullable=False),
+    sa.Column('trakt_id', sa.Integer(), nullable=False),
+    sa.Column('imdb_id', sa.String(), nullable=True),
+    sa.Column('show_trakt_id', sa.Integer(), nullable=True),
+    sa.Column('season', sa.Integer(), nullable=True),
+    sa.Column('episode', sa.Integer(), nullable=True),
+    sa.Column('watched_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'history_id')
+    )
+    op.create_index('ix_trakthistory_user_id_show_trakt_id_season_episode', 'trakthistory', ['user_id', 'show_trakt_id', 'season', 'episode'], unique=False)
+    op.create_index('ix_trakthistory_user_id_watched_at', 'trakthistory', ['user_id', 'watched_at'], unique=False)
+    op.create_table('traktsyncstate',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('movies_watched_at', sa.String(), nullable=True),
+    sa.Column('episodes_watched_at', sa.String(), nullable=True),
+    sa.Column('watchlist_updated_at', sa.String(), nullable=True),
+    sa.Column('synced_at', sa.DateTime(), nullable=True),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index(op.f('ix_traktsyncstate_synced_at'), 'traktsyncstate', ['synced_at'], unique=False)
+    op.create_table('traktwatchlist',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('media_type', sa.String(), nullable=False),
+    sa.Column('trakt_id', sa.Integer(), nullable=False),
+    sa.Column('imdb_id', sa.String(), nullable=True),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('year', sa.Integer(), nullable=True),
+    sa.Column('rank', sa.Integer(), nullable=True),
+    sa.Column('listed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'media_type', 'trakt_id')
+    )
+    op.create_index('ix_traktwatchlist_user_id_listed_at', 'traktwatchlist', ['user_id', 'listed_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_traktwatchlist_user_id_listed_at', table_name='traktwatchlist')
+    op.drop_table('traktwatchlist')
+    op.drop_index(op.f('ix_traktsyncstate_synced_at'), table_name='traktsyncstate')
+    op.drop_table('traktsyncstate')
+    op.drop_index('ix_trakthistory_user_id_watched_at', table_name='trakthistory')
+    op.drop_index('ix_trakthistory_user_id_show_trakt_id_season_episode', table_name='trakthistory')
+    op.drop_table('trakthistory')
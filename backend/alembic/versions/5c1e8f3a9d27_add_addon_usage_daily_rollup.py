@@ -0,0 +1,47 @@
+"""Add addon column and AddonUsageDaily rollup table
+
+Revision ID: 5c1e8f3a9d27
+Revises: 96a6a1bf0350
+Create Date: 2026-10-18 10:12:41.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e8f3a9d27'
+down_revision: Union[str, Sequence[str], None] = '96a6a1bf0350'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('addonusagelog', sa.Column('addon', sa.String(), nullable=False, server_default='unknown'))
+    op.create_table('addonusagedaily',
+    sa.Column('day', sa.String(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('addon', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('day', 'user_id', 'addon')
+    )
+    op.create_index(op.f('ix_addonusagedaily_user_id'), 'addonusagedaily', ['user_id'], unique=False)
+
+    # Backfill the rollup from existing usage logs
+    op.execute(
+        "INSERT INTO addonusagedaily (day, user_id, addon, count) "
+        "SELECT date(created_at), user_id, addon, count(*) FROM addonusagelog "
+        "GROUP BY date(created_at), user_id, addon"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_addonusagedaily_user_id'), table_name='addonusagedaily')
+    op.drop_table('addonusagedaily')
+    with op.batch_alter_table('addonusagelog') as batch_op:
+        batch_op.drop_column('addon')
@@ -0,0 +1,28 @@
+"""Add refresh claim column to TraktUserAuth
+
+Revision ID: 739a7eb5c522
+Revises: c5e1d7a3f924
+Create Date: 2026-10-18 14:52:17.630941
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '739a7eb5c522'
+down_revision: Union[str, Sequence[str], None] = 'c5e1d7a3f924'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('traktuserauth', sa.Column('refresh_claimed_until', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('traktuserauth', 'refresh_claimed_until')
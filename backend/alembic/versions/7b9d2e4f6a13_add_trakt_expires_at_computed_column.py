@@ -0,0 +1,31 @@
+"""Add computed expires_at column to TraktUserAuth
+
+Revision ID: 7b9d2e4f6a13
+Revises: e3a4b6d0c1f8
+Create Date: 2026-10-18 12:20:05.331870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b9d2e4f6a13'
+down_revision: Union[str, Sequence[str], None] = 'e3a4b6d0c1f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SQLite can only add VIRTUAL generated columns with ALTER TABLE, which is the default
+    op.add_column('traktuserauth', sa.Column('expires_at', sa.Integer(), sa.Computed('created_at + expires_in'), nullable=True))
+    op.create_index(op.f('ix_traktuserauth_expires_at'), 'traktuserauth', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_traktuserauth_expires_at'), table_name='traktuserauth')
+    op.drop_column('traktuserauth', 'expires_at')
@@ -0,0 +1,41 @@
+"""Add CometWarm table and TraktHistory lookup index by media
+
+Revision ID: 9a7c3e5b1d42
+Revises: 4f2c8a1d9e60
+Create Date: 2026-10-18 13:05:22.417730
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a7c3e5b1d42'
+down_revision: Union[str, Sequence[str], None] = '4f2c8a1d9e60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('cometwarm',
+    sa.Column('media_id', sa.String(), nullable=False),
+    sa.Column('media_type', sa.String(), nullable=False),
+    sa.Column('imdb_id', sa.String(), nullable=False),
+    sa.Column('season', sa.Integer(), nullable=True),
+    sa.Column('episode', sa.Integer(), nullable=True),
+    sa.Column('warmed_at', sa.DateTime(), nullable=False),
+    sa.Column('ok', sa.Boolean(), nullable=False),
+    sa.PrimaryKeyConstraint('media_id')
+    )
+    op.create_index(op.f('ix_cometwarm_warmed_at'), 'cometwarm', ['warmed_at'], unique=False)
+    op.create_index('ix_trakthistory_imdb_id_season_episode_watched_at', 'trakthistory', ['imdb_id', 'season', 'episode', 'watched_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_trakthistory_imdb_id_season_episode_watched_at', table_name='trakthistory')
+    op.drop_index(op.f('ix_cometwarm_warmed_at'), table_name='cometwarm')
+    op.drop_table('cometwarm')
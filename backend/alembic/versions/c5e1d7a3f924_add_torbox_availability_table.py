@@ -0,0 +1,35 @@
+"""Add TorboxAvailability table
+
+Revision ID: c5e1d7a3f924
+Revises: 9a7c3e5b1d42
+Create Date: 2026-10-18 13:38:51.204116
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e1d7a3f924'
+down_revision: Union[str, Sequence[str], None] = '9a7c3e5b1d42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('torboxavailability',
+    sa.Column('info_hash', sa.String(), nullable=False),
+    sa.Column('cached', sa.Boolean(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('size', sa.BigInteger(), nullable=True),
+    sa.Column('checked_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('info_hash')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('torboxavailability')
@@ -0,0 +1,33 @@
+"""Add keyset pagination indexes to AddonUsageLog
+
+Revision ID: e3a4b6d0c1f8
+Revises: 5c1e8f3a9d27
+Create Date: 2026-10-18 11:03:27.904116
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a4b6d0c1f8'
+down_revision: Union[str, Sequence[str], None] = '5c1e8f3a9d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_addonusagelog_created_at_id', 'addonusagelog', ['created_at', 'id'], unique=False)
+    op.create_index('ix_addonusagelog_user_id_created_at_id', 'addonusagelog', ['user_id', 'created_at', 'id'], unique=False)
+    # Covered by the leading column of ix_addonusagelog_user_id_created_at_id
+    op.drop_index(op.f('ix_addonusagelog_user_id'), table_name='addonusagelog')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_addonusagelog_user_id'), 'addonusagelog', ['user_id'], unique=False)
+    op.drop_index('ix_addonusagelog_user_id_created_at_id', table_name='addonusagelog')
+    op.drop_index('ix_addonusagelog_created_at_id', table_name='addonusagelog')
@@ -1,44 +1,58 @@
-from typing import List, Dict, Any
-import base64
-import json
-from urllib.parse import urlparse, quote
-from fastapi import APIRouter, Depends
+from typing import List, Literal, Optional
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import AsyncSession, get_async_db
-from app.api.v1.routers.auth_router import get_current_admin_user, get_current_user
+from app.api.v1.routers.auth_router import get_addon_user, get_current_admin_user, get_current_user
+from app.core.user_cache import UserSnapshot
 from app.core.config import settings
+from app.core.http_cache import etag_matches
+from app.core.pagination import decode_cursor, encode_cursor
+from app.core.security import create_addon_token
 from app import crud, models, schemas
 from app.models import User
-from app.schemas.addon_schemas import AddonUsageLog, TorrentioInstallationUrlResponse, AIOStreamsInstallationUrlResponse
+from app.schemas.addon_schemas import AddonHealthStatus, AddonUsageLog, StreamProxyInstallationUrlResponse, StremioStreamsResponse, TorboxCheckRequest, TorboxCheckResponse, TorrentioInstallationUrlResponse, AIOStreamsInstallationUrlResponse
+from app.services.addon_health import addon_health
+from app.services.addon_profiles import CompiledInstallationUrl, addon_profiles
+from app.services.stream_proxy import STREAM_PROXY_MANIFEST, stream_proxy
+from app.services.torbox import torbox_checker
+from app.services.usage_export import export_usage_logs
+from app.services.usage_log_buffer import usage_log_buffer
 
 router = APIRouter(prefix="/addons", tags=["addons"])
 
 
+def installation_url_response(request: Request, compiled: CompiledInstallationUrl) -> Response:
+    headers = {
+        "ETag": compiled.etag,
+        "Cache-Control": f"private, max-age={settings.INSTALLATION_URL_MAX_AGE_SECONDS}",
+        "Vary": "Authorization",
+    }
+    if etag_matches(request, compiled.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=compiled.body, media_type="application/json", headers=headers)
+
+
 @router.get("/torrentio/installation-url", response_model=TorrentioInstallationUrlResponse)
 async def get_torrentio_installation_url(
-    db: AsyncSession = Depends(get_async_db),
-    current_user: models.User = Depends(get_current_user)
-) -> TorrentioInstallationUrlResponse:
+    request: Request,
+    current_user: UserSnapshot = Depends(get_current_user)
+):
     """
     Provides a Stremio installation URL for Torrentio, pre-configured with the 
     shared TorBox API key.
     """
-    parsed_url = urlparse(settings.TORRENTIO_BASE_URL)
-    hostname = parsed_url.netloc
-
-    # Construct the installation URL in the format stremio://<hostname>/<config>/manifest.json
-    installation_url = f"stremio://{hostname}/torbox={settings.TORBOX_API_KEY}/manifest.json"
-
-    await crud.create_addon_usage_log(db=db, user=current_user)
-    return TorrentioInstallationUrlResponse(installation_url=installation_url)
+    usage_log_buffer.record(current_user.id, addon="torrentio")
+    return installation_url_response(request, addon_profiles.get("torrentio"))
 
 
 @router.get("/aiostreams/installation-url", response_model=AIOStreamsInstallationUrlResponse)
 async def get_aiostreams_installation_url(
-    db: AsyncSession = Depends(get_async_db),
-    current_user: models.User = Depends(get_current_user)
-) -> AIOStreamsInstallationUrlResponse:
+    request: Request,
+    current_user: UserSnapshot = Depends(get_current_user)
+):
     """
     Provides a Stremio installation URL for AIOstreams, pre-configured with all needed add-ons:
     - Self-hosted Comet (with shared TorBox API key)
@@ -46,57 +60,137 @@ async def get_aiostreams_installation_url(
     - OpenSubtitles
     - USA TV
     """
-    # Get the hostname for our self-hosted Comet instance
-    server_address = "localhost:8002"  # TODO: Replace with proper domain in production
-    comet_manifest_url = f"http://{server_address}/manifest.json"
-    
-    # Define the addon configuration for AIOstreams
-    config: Dict[str, Any] = {
-        "addons": [
-            # Our self-hosted Comet instance
-            {
-                "name": "Comet (Self-Hosted)",
-                "manifestUrl": comet_manifest_url
-            },
-            # AIOLists for curated content
-            {
-                "name": "AIOLists",
-                "manifestUrl": "https://aiolists.dexter21767.workers.dev/manifest.json"
-            },
-            # OpenSubtitles for subtitles
-            {
-                "name": "OpenSubtitles",
-                "manifestUrl": "https://opensubtitlesv3-pro.dexter21767.com/manifest.json"
-            },
-            # USA TV for live TV streams
-            {
-                "name": "USA TV",
-                "manifestUrl": "https://usa-tv.dexter21767.workers.dev/manifest.json"
-            }
-        ]
-    }
-    
-    # Convert the configuration to a JSON string and encode it in base64
-    encoded_config = base64.b64encode(json.dumps(config).encode()).decode()
-    
-    # Generate the installation URL in AIOstreams format
-    installation_url = f"stremio://aiostreams.elfhosted.com/{encoded_config}/manifest.json"
-    
-    # Log the usage
-    await crud.create_addon_usage_log(db=db, user=current_user)
-    
-    return AIOStreamsInstallationUrlResponse(installation_url=installation_url)
+    # Log the usage (written to the database in the background)
+    usage_log_buffer.record(current_user.id, addon="aiostreams")
+    return installation_url_response(request, addon_profiles.get("aiostreams"))
+
+
+# Stremio fetches addon resources cross-origin and without credentials
+STREMIO_HEADERS = {"Access-Control-Allow-Origin": "*"}
+
+
+@router.get("/streams/installation-url", response_model=StreamProxyInstallationUrlResponse)
+async def get_stream_proxy_installation_url(
+    request: Request,
+    current_user: UserSnapshot = Depends(get_current_user),
+):
+    """
+    Provides the current user's Stremio installation URL for the stream proxy.
+    It embeds a token that only grants access to the proxy's addon routes.
+    """
+    manifest_url = str(request.url_for("get_stream_proxy_manifest", addon_token=create_addon_token(current_user.email)))
+    return {"installation_url": "stremio://" + manifest_url.split("://", 1)[1]}
+
+
+@router.get("/streams/{addon_token}/manifest.json")
+async def get_stream_proxy_manifest(current_user: UserSnapshot = Depends(get_addon_user)):
+    """
+    Stremio manifest for the stream proxy; install it by the URL from /streams/installation-url.
+    """
+    return JSONResponse(content=STREAM_PROXY_MANIFEST, headers=STREMIO_HEADERS)
+
+
+@router.get("/streams/{addon_token}/stream/{media_type}/{media_id}.json", response_model=StremioStreamsResponse)
+async def get_proxied_streams(
+    media_type: Literal["movie", "series"],
+    media_id: str = Path(pattern=r"^[\w.:-]+$"),
+    current_user: UserSnapshot = Depends(get_addon_user),
+):
+    """
+    Stremio stream resource: streams from every upstream addon for an IMDb ID
+    (`tt...`, or `tt...:season:episode` for series), merged and de-duplicated.
+    """
+    body = await stream_proxy.get_streams(media_type, media_id)
+    # Private: debrid stream URLs carry the shared TorBox key
+    headers = {**STREMIO_HEADERS, "Cache-Control": f"private, max-age={settings.STREAM_PROXY_CACHE_TTL_SECONDS}"}
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.post("/torbox/checkcached", response_model=TorboxCheckResponse)
+async def check_torbox_cached(
+    body: TorboxCheckRequest,
+    current_user: UserSnapshot = Depends(get_current_admin_user),
+):
+    """
+    Reports which info hashes are cached on TorBox, answering from the shared
+    availability table where it is fresh. Only accessible by admin users.
+    """
+    try:
+        results = await torbox_checker.check(body.hashes)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"results": results}
 
 
 @router.get("/torrentio/usage-logs", response_model=List[AddonUsageLog])
 async def read_addon_usage_logs(
+    response: Response,
     db: AsyncSession = Depends(get_async_db),
-    skip: int = 0,
-    limit: int = 100,
-    current_user: models.User = Depends(get_current_admin_user),
+    cursor: Optional[str] = None,
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: UserSnapshot = Depends(get_current_admin_user),
 ):
     """
-    Retrieves a list of addon usage logs.
+    Retrieves addon usage logs ordered by (created_at, id), optionally for one
+    user and within a [since, until) range. When a full page is returned, the
+    cursor for the next page is sent in the X-Next-Cursor header. `skip` is
+    kept for backward compatibility and switches to unfiltered offset paging,
+    so it cannot be combined with a cursor or filters.
     """
-    logs = await crud.get_addon_usage_logs(db, skip=skip, limit=limit)
+    if skip:
+        if cursor or user_id is not None or since or until:
+            raise HTTPException(status_code=400, detail="skip cannot be combined with cursor, user_id, since or until")
+        return await crud.get_addon_usage_logs(db, skip=skip, limit=limit)
+
+    after = None
+    if cursor:
+        try:
+            created_at, log_id = decode_cursor(cursor)
+            after = (datetime.fromisoformat(created_at), int(log_id))
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    logs = await crud.get_addon_usage_logs_after(
+        db, after=after, limit=limit, user_id=user_id, since=since, until=until
+    )
+    if len(logs) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(logs[-1].created_at, logs[-1].id)
     return logs
+
+
+@router.get("/torrentio/usage-logs/export")
+async def export_addon_usage_logs(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    current_user: UserSnapshot = Depends(get_current_admin_user),
+):
+    """
+    Streams all matching usage logs as NDJSON or CSV, optionally gzipped, in
+    (created_at, id) order. Memory use stays flat regardless of table size.
+    """
+    filename = f"usage-logs.{format}"
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        export_usage_logs(format=format, gzip=gzip, user_id=user_id, since=since, until=until),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/health", response_model=List[AddonHealthStatus])
+async def read_addon_health(
+    current_user: UserSnapshot = Depends(get_current_admin_user),
+):
+    """
+    Latest manifest probe result and circuit state for every external addon.
+    """
+    return addon_health.statuses()
@@ -1,30 +1,219 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.exc import SQLAlchemyError
 
 from app import crud, models
-from app.database import get_async_db
+from app.database import AsyncReadSessionLocal
 from app.api.v1.routers.auth_router import get_current_admin_user
-from app.schemas.analytics_schemas import AnalyticsStats
+from app.core.cache import AsyncResultCache
+from app.core.config import settings
+from app.core.generations import CHANNELS, generations
+from app.core.http_cache import etag_matches, make_etag
+from app.core.slow_queries import slow_query_log
+from app.core.user_cache import UserSnapshot, user_cache
+from app.schemas.analytics_schemas import AnalyticsStats, CacheStats, CometStats, CometWarmerStats, SlowQueryReport, StreamProxyStats, TorboxCheckerStats, TraktClientStats, TraktSyncStats, UsageQueueStats
+from app.services.comet_cache import get_comet_stats
+from app.services.comet_warmer import comet_warmer
+from app.services.stream_proxy import stream_proxy
+from app.services.torbox import torbox_checker
+from app.services.trakt_client import trakt_client
+from app.services.trakt_sync import trakt_sync_engine
+from app.services.usage_log_buffer import usage_log_buffer
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
+stats_cache = AsyncResultCache(
+    ttl=settings.ANALYTICS_STATS_TTL_SECONDS,
+    stale_ttl=settings.ANALYTICS_STATS_STALE_SECONDS,
+    generation=generations.channel("analytics_stats"),
+)
+
+comet_stats_cache = AsyncResultCache(
+    ttl=settings.COMET_STATS_TTL_SECONDS,
+    stale_ttl=settings.COMET_STATS_STALE_SECONDS,
+)
+
 
-@router.get("/stats", response_model=AnalyticsStats)
+async def compute_analytics_stats() -> tuple[bytes, str]:
+    """
+    Runs the aggregate queries and returns the serialized stats with their ETag.
+    Uses its own session because background refreshes outlive the request.
+    """
+    async with AsyncReadSessionLocal() as db:
+        stats = AnalyticsStats(
+            total_users=await crud.get_total_users(db),
+            total_addon_usage=await crud.get_total_addon_usage(db),
+            usage_by_day=await crud.get_addon_usage_by_day(db),
+            most_active_users=await crud.get_most_active_users(db),
+        )
+    body = stats.model_dump_json().encode()
+    return body, make_etag(body)
+
+
+@router.get(
+    "/stats",
+    response_model=AnalyticsStats,
+    responses={304: {"description": "Stats unchanged since the ETag in If-None-Match"}},
+)
 async def get_analytics_stats(
-    db: AsyncSession = Depends(get_async_db),
-    current_user: models.User = Depends(get_current_admin_user),
+    request: Request,
+    current_user: UserSnapshot = Depends(get_current_admin_user),
 ):
     """
     Retrieve aggregated analytics stats. Only accessible by admin users.
     """
-    total_users = await crud.get_total_users(db)
-    total_addon_usage = await crud.get_total_addon_usage(db)
-    usage_by_day = await crud.get_addon_usage_by_day(db)
-    most_active_users = await crud.get_most_active_users(db)
+    body, etag = await stats_cache.get_or_compute("stats", compute_analytics_stats)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def compute_comet_stats() -> tuple[bytes, str]:
+    stats = CometStats(**await get_comet_stats(stale_after=settings.COMET_STALE_AFTER_SECONDS))
+    body = stats.model_dump_json().encode()
+    return body, make_etag(body)
 
+
+@router.get(
+    "/comet",
+    response_model=CometStats,
+    responses={304: {"description": "Stats unchanged since the ETag in If-None-Match"}},
+)
+async def get_comet_stats_endpoint(
+    request: Request,
+    current_user: UserSnapshot = Depends(get_current_admin_user),
+):
+    """
+    Size, row counts, age distribution, debrid coverage and top media of
+    Comet's cache database, read without write locks. Only accessible by admin users.
+    """
+    try:
+        body, etag = await comet_stats_cache.get_or_compute("comet", compute_comet_stats)
+    except SQLAlchemyError:
+        raise HTTPException(status_code=503, detail="Comet's cache database is not readable")
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/usage-queue", response_model=UsageQueueStats)
+async def get_usage_queue_stats(
+    current_user: UserSnapshot = Depends(get_current_admin_user),
+):
+    """
+    Reports the state of the addon usage write-behind buffer. Only accessible by admin users.
+    """
+    return usage_log_buffer.stats()
+
+
+@router.get("/caches", response_model=Dict[str, CacheStats])
+async def get_cache_stats(
+    current_user: UserSnapshot = Depends(get_current_admin_user),
+):
+    """
+    Reports size and hit/miss counters for the in-process caches. Only accessible by admin users.
+    """
     return {
-        "total_users": total_users,
-        "total_addon_usage": total_addon_usage,
-        "usage_by_day": usage_by_day,
-        "most_active_users": most_active_users,
+        "user": user_cache.stats(),
+        "analytics_stats": stats_cache.stats(),
+        "streams": stream_proxy.cache.stats(),
+        "comet_stats": comet_stats_cache.stats(),
     }
+
+
+@router.get("/stream-proxy", response_model=StreamProxyStats)
+async def get_stream_proxy_stats(
+    current_user: UserSnapshot = Depends(get_current_admin_user),
+):
+    """
+    Reports per-upstream request counts, failures and latency for the stream proxy. Only accessible by admin users.
+    """
+    return stream_proxy.stats()
+
+
+@router.get("/trakt-client", response_model=TraktClientStats)
+async def get_trakt_client_stats(
+    current_user: UserSnapshot = Depends(get_current_admin_user),
+):
+    """
+    Reports per-endpoint request counts and latency for the shared Trakt client. Only accessible by admin users.
+    """
+    return trakt_client.stats()
+
+
+@router.get("/trakt-sync", response_model=TraktSyncStats)
+async def get_trakt_sync_stats(
+    current_user: UserSnapshot = Depends(get_current_admin_user),
+):
+    """
+    Reports counters for the background Trakt history sync. Only accessible by admin users.
+    """
+    return trakt_sync_engine.stats()
+
+
+@router.get("/comet-warmer", response_model=CometWarmerStats)
+async def get_comet_warmer_stats(
+    current_user: UserSnapshot = Depends(get_current_admin_user),
+):
+    """
+    Reports what the Comet cache warmer predicted and warmed, and how many
+    warmed IDs were played afterwards. Only accessible by admin users.
+    """
+    hit_rate = await comet_warmer.hit_rate(days=7)
+    return {
+        **comet_warmer.stats(),
+        "warmed_last_7_days": hit_rate["warmed"],
+        "played_last_7_days": hit_rate["played"],
+        "hit_rate": hit_rate["hit_rate"],
+    }
+
+
+@router.get("/torbox", response_model=TorboxCheckerStats)
+async def get_torbox_checker_stats(
+    current_user: UserSnapshot = Depends(get_current_admin_user),
+):
+    """
+    Reports TorBox availability requests and how many hashes were answered from the shared table. Only accessible by admin users.
+    """
+    return torbox_checker.stats()
+
+
+@router.get("/slow-queries", response_model=SlowQueryReport)
+async def get_slow_queries(
+    limit: int = 20,
+    sort: Literal["total", "max", "count"] = "total",
+    current_user: UserSnapshot = Depends(get_current_admin_user),
+):
+    """
+    Statements slower than SLOW_QUERY_THRESHOLD_MS still in the ring buffers,
+    grouped by shape with their query plan, worst first. With METRICS_DIR set
+    the buffers of all workers are merged; `pid` is the worker that answered.
+    Only accessible by admin users.
+    """
+    return {**slow_query_log.stats(), "queries": slow_query_log.worst(limit=limit, sort=sort)}
+
+
+@router.delete("/slow-queries", status_code=204)
+async def clear_slow_queries(
+    current_user: UserSnapshot = Depends(get_current_admin_user),
+):
+    """
+    Empties the slow-query buffers of all workers, e.g. after adding an index. Only accessible by admin users.
+    """
+    slow_query_log.clear()
+
+
+@router.post("/caches/invalidate", status_code=204)
+async def invalidate_caches(
+    channels: list[Literal[CHANNELS]] = Query(default=list(CHANNELS), alias="channel"),
+    current_user: UserSnapshot = Depends(get_current_admin_user),
+):
+    """
+    Drops the given caches (all of them by default) in every worker, e.g. after
+    editing the database by hand. Only accessible by admin users.
+    """
+    for channel in set(channels):
+        generations.bump(channel)
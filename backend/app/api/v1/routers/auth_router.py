@@ -8,8 +8,9 @@ from fastapi.responses import RedirectResponse
 from httpx_oauth.oauth2 import OAuth2
 
 from app.core.config import settings
-from app.core.security import create_access_token, verify_password
-from app.database import get_async_db
+from app.core.security import ADDON_TOKEN_SCOPE, create_access_token, verify_password_async
+from app.core.user_cache import UserSnapshot, user_cache
+from app.database import AsyncSessionLocal, get_async_db
 from app.models import TraktUserAuth, User
 from app.schemas import Token, TokenData
 from sqlalchemy import select
@@ -31,7 +32,7 @@ async def login_for_access_token(
 ):
     result = await db.execute(select(User).where(User.email == form_data.username))
     user = result.scalar_one_or_none()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -44,7 +45,11 @@ async def login_for_access_token(
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-async def get_current_user(db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)):
+async def authenticate_token(db: AsyncSession, token: str, scope: str | None = None) -> UserSnapshot:
+    """
+    The user a JWT was issued to. Tokens carry a `scope` claim when they only
+    grant access to part of the API; `scope` must match it exactly.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -53,23 +58,46 @@ async def get_current_user(db: AsyncSession = Depends(get_async_db), token: str
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         email: str = payload.get("sub")
-        if email is None:
+        if email is None or payload.get("scope") != scope:
             raise credentials_exception
         token_data = TokenData(email=email)
     except JWTError:
         raise credentials_exception
-    
-    result = await db.execute(select(User).where(User.email == token_data.email))
-    user = result.scalar_one_or_none()
 
-    if user is None:
+    generation = None
+    if settings.USER_CACHE_ENABLED:
+        cached_user = user_cache.get(token_data.email)
+        if cached_user is not None:
+            return cached_user
+        generation = user_cache.current_generation()
+
+    result = await db.execute(
+        select(User.id, User.email, User.is_admin).where(User.email == token_data.email)
+    )
+    row = result.one_or_none()
+
+    if row is None:
         raise credentials_exception
+    user = UserSnapshot(id=row.id, email=row.email, is_admin=row.is_admin)
+    if settings.USER_CACHE_ENABLED:
+        user_cache.set(token_data.email, user, generation=generation)
     return user
 
 
+async def get_current_user(
+    db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)
+) -> UserSnapshot:
+    return await authenticate_token(db, token)
+
+
+async def get_addon_user(addon_token: str, db: AsyncSession = Depends(get_async_db)) -> UserSnapshot:
+    """The user whose addon URL this is, from the token in its path; Stremio can't send headers."""
+    return await authenticate_token(db, addon_token, scope=ADDON_TOKEN_SCOPE)
+
+
 async def get_current_admin_user(
-    current_user: models.User = Depends(get_current_user),
-) -> models.User:
+    current_user: UserSnapshot = Depends(get_current_user),
+) -> UserSnapshot:
     if not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -77,16 +105,23 @@ async def get_current_admin_user(
         )
     return current_user
 
+
+async def get_admin_from_request(request: Request) -> UserSnapshot:
+    """The get_current_admin_user checks for code outside dependency injection, such as middleware."""
+    token = await oauth2_scheme(request)
+    async with AsyncSessionLocal() as db:
+        return await get_current_admin_user(await get_current_user(db=db, token=token))
+
 trakt_oauth_client = OAuth2(
     client_id=settings.TRAKT_CLIENT_ID,
     client_secret=settings.TRAKT_CLIENT_SECRET,
     authorize_endpoint="https://trakt.tv/oauth/authorize",
-    access_token_endpoint="https://api.trakt.tv/oauth/token",
+    access_token_endpoint=f"{settings.TRAKT_API_URL}/oauth/token",
     base_scopes=None,
 )
 
 @router.get("/trakt/login", name="auth:trakt-login")
-async def trakt_login(request: Request, current_user: User = Depends(get_current_user)):
+async def trakt_login(request: Request, current_user: UserSnapshot = Depends(get_current_user)):
     redirect_uri = request.url_for("auth:trakt-callback")
     state = str(current_user.id)
     authorization_url = await trakt_oauth_client.get_authorization_url(
@@ -0,0 +1,67 @@
+import secrets
+
+from fastapi import APIRouter, HTTPException, Request, Response
+
+from app.api.v1.routers.analytics_router import comet_stats_cache, stats_cache
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.user_cache import user_cache
+from app.services.stream_proxy import stream_proxy
+from app.services.torbox import torbox_checker
+from app.services.usage_log_buffer import usage_log_buffer
+
+router = APIRouter()
+
+metrics.counter("stremio_cache_hits_total", "In-process cache hits, including stale hits served while refreshing.")
+metrics.counter("stremio_cache_misses_total", "In-process cache misses.")
+metrics.counter("stremio_cache_evictions_total", "Entries evicted from bounded in-process caches.")
+metrics.gauge("stremio_cache_entries", "Entries currently held by in-process caches.")
+metrics.gauge("stremio_usage_queue_depth", "Usage events waiting in the write-behind buffer.")
+metrics.counter("stremio_usage_events_total", "Usage events passing through the write-behind buffer, by outcome.")
+metrics.counter("stremio_usage_batches_total", "Batches written by the usage write-behind buffer.")
+
+
+def collect_cache_metrics():
+    caches = {
+        "user": user_cache.stats(),
+        "analytics_stats": stats_cache.stats(),
+        "comet_stats": comet_stats_cache.stats(),
+        "streams": stream_proxy.cache.stats(),
+    }
+    for name, stats in caches.items():
+        labels = {"cache": name}
+        yield "stremio_cache_hits_total", labels, stats["hits"] + stats.get("stale_hits", 0)
+        yield "stremio_cache_misses_total", labels, stats["misses"]
+        yield "stremio_cache_evictions_total", labels, stats.get("evictions", 0)
+        yield "stremio_cache_entries", labels, stats["size"]
+    torbox = torbox_checker.stats()
+    yield "stremio_cache_hits_total", {"cache": "torbox_availability"}, torbox["cache_hits"]
+    yield "stremio_cache_misses_total", {"cache": "torbox_availability"}, torbox["cache_misses"]
+
+
+def collect_usage_queue_metrics():
+    stats = usage_log_buffer.stats()
+    yield "stremio_usage_queue_depth", {}, stats["queue_depth"]
+    for outcome in ("enqueued", "written", "dropped", "failed"):
+        yield "stremio_usage_events_total", {"outcome": outcome}, stats[outcome]
+    yield "stremio_usage_batches_total", {}, stats["batches"]
+
+
+metrics.register_collector(collect_cache_metrics)
+metrics.register_collector(collect_usage_queue_metrics)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    """
+    Request, SQL, cache and queue metrics of every worker in Prometheus text format.
+    Requires `Authorization: Bearer <METRICS_BEARER_TOKEN>` when that setting is set;
+    with METRICS_DIR set (production) and no token, metrics are not served at all.
+    """
+    if settings.METRICS_BEARER_TOKEN:
+        expected = f"Bearer {settings.METRICS_BEARER_TOKEN}"
+        if not secrets.compare_digest(request.headers.get("Authorization", ""), expected):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+    elif settings.METRICS_DIR:
+        raise HTTPException(status_code=403, detail="Set METRICS_BEARER_TOKEN to enable /metrics")
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
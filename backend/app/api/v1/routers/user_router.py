@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud, schemas, models
 from app.database import get_async_db
 from app.api.v1.routers.auth_router import get_current_user, get_current_admin_user
+from app.core.pagination import decode_cursor, encode_cursor
+from app.core.user_cache import UserSnapshot
+from app.services.trakt_sync import TraktSyncError, TraktSyncInProgress, trakt_sync_engine
 
 router = APIRouter()
 
@@ -12,7 +18,7 @@ router = APIRouter()
 async def create_user(
     user: schemas.UserCreate, 
     db: AsyncSession = Depends(get_async_db),
-    current_admin: models.User = Depends(get_current_admin_user),
+    current_admin: UserSnapshot = Depends(get_current_admin_user),
 ):
     db_user = await crud.get_user_by_email(db, email=user.email)
     if db_user:
@@ -21,21 +27,40 @@ async def create_user(
 
 
 @router.get("/me", response_model=schemas.User)
-async def read_users_me(current_user: models.User = Depends(get_current_user)):
+async def read_users_me(current_user: UserSnapshot = Depends(get_current_user)):
     return current_user
 
 
 @router.get("/", response_model=list[schemas.User])
 async def read_users(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
     db: AsyncSession = Depends(get_async_db),
-    current_user: models.User = Depends(get_current_admin_user),
+    current_user: UserSnapshot = Depends(get_current_admin_user),
 ):
     """
-    Retrieve users.
+    Retrieve users, ordered by id. When a full page is returned, the cursor for
+    the next page is sent in the X-Next-Cursor header. `skip` is kept for
+    backward compatibility and switches to offset paging, so it cannot be
+    combined with a cursor.
     """
-    users = await crud.get_users(db, skip=skip, limit=limit)
+    if skip:
+        if cursor:
+            raise HTTPException(status_code=400, detail="skip cannot be combined with cursor")
+        return await crud.get_users(db, skip=skip, limit=limit)
+
+    after_id = None
+    if cursor:
+        try:
+            (after_id,) = decode_cursor(cursor)
+            after_id = int(after_id)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    users = await crud.get_users_after(db, after_id=after_id, limit=limit)
+    if len(users) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(users[-1].id)
     return users
 
 
@@ -44,7 +69,7 @@ async def update_user(
     user_id: int,
     user_in: schemas.UserUpdate,
     db: AsyncSession = Depends(get_async_db),
-    current_admin: models.User = Depends(get_current_admin_user),
+    current_admin: UserSnapshot = Depends(get_current_admin_user),
 ):
     db_user = await crud.get_user(db, user_id=user_id)
     if not db_user:
@@ -57,10 +82,31 @@ async def update_user(
 async def delete_user(
     user_id: int,
     db: AsyncSession = Depends(get_async_db),
-    current_admin: models.User = Depends(get_current_admin_user),
+    current_admin: UserSnapshot = Depends(get_current_admin_user),
 ):
     db_user = await crud.get_user(db, user_id=user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     user = await crud.delete_user(db=db, user_id=user_id)
     return user
+
+
+@router.post("/{user_id}/trakt-sync", response_model=schemas.TraktSyncResult)
+async def sync_user_trakt(
+    user_id: int,
+    full: bool = False,
+    current_admin: UserSnapshot = Depends(get_current_admin_user),
+):
+    """
+    Syncs a user's Trakt history and watchlist now. `full` re-fetches and
+    replaces everything instead of only what changed since the last sync.
+    """
+    try:
+        result = await trakt_sync_engine.sync_user(user_id, full=full)
+    except (httpx.HTTPError, TraktSyncError) as e:
+        raise HTTPException(status_code=502, detail=f"Trakt sync failed: {e}")
+    except TraktSyncInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="User has no valid Trakt link")
+    return result
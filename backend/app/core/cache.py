@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded in-memory cache. Entries expire `ttl` seconds after they were set,
+    and the least recently used entry is evicted once `maxsize` is reached.
+
+    With a `generation` (see app.core.generations), the cache is emptied
+    whenever any worker bumps that generation.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, clock=time.monotonic, generation=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._generation = generation
+        self._seen_generation = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation_resets = 0
+
+    def _check_generation(self):
+        current = self._generation.value()
+        if current != self._seen_generation:
+            if self._data and self._seen_generation is not None:
+                self.generation_resets += 1
+            self._data.clear()
+            self._seen_generation = current
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if self._generation is not None:
+            self._check_generation()
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def current_generation(self):
+        """
+        The generation entries stored now belong to. Take it before loading a
+        value and pass it to `set()`, so a value loaded while another worker
+        invalidated the cache isn't stored as fresh.
+        """
+        if self._generation is None:
+            return None
+        self._check_generation()
+        return self._seen_generation
+
+    def set(self, key: Hashable, value: Any, generation=None):
+        if self._generation is not None:
+            self._check_generation()
+            if generation is not None and generation != self._seen_generation:
+                return
+        self._data[key] = (self._clock() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "generation_resets": self.generation_resets,
+        }
+
+
+class AsyncResultCache:
+    """
+    Caches the results of async computations per key.
+
+    A result is fresh for `ttl` seconds. For a further `stale_ttl` seconds it is
+    still served, while a single background task recomputes it
+    (stale-while-revalidate). Concurrent misses for the same key wait on one
+    shared computation instead of each running their own (single-flight).
+
+    With a `generation` (see app.core.generations), cached results are dropped
+    whenever any worker bumps that generation, and results computed across a
+    bump are returned to their callers but not kept.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0.0, clock=time.monotonic, generation=None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._clock = clock
+        self._data: dict[Hashable, tuple[float, Any]] = {}
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self._generation = generation
+        self._seen_generation = None
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.generation_resets = 0
+
+    def _check_generation(self):
+        current = self._generation.value()
+        if current != self._seen_generation:
+            if self._data and self._seen_generation is not None:
+                self.generation_resets += 1
+            self._data.clear()
+            # Computations started before the bump may have read old data
+            self._inflight.clear()
+            self._seen_generation = current
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        if self._generation is not None:
+            self._check_generation()
+        entry = self._data.get(key)
+        if entry is not None:
+            age = self._clock() - entry[0]
+            if age < self.ttl:
+                self.hits += 1
+                return entry[1]
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                if key not in self._inflight:
+                    self._start_refresh(key, compute).add_done_callback(self._log_refresh_error)
+                return entry[1]
+        self.misses += 1
+        task = self._inflight.get(key) or self._start_refresh(key, compute)
+        # Shielded so one cancelled caller doesn't cancel the computation for the others
+        return await asyncio.shield(task)
+
+    def _start_refresh(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        started_generation = self._seen_generation
+
+        async def refresh():
+            try:
+                value = await compute()
+                if self._generation is None or self._generation.value() == started_generation:
+                    self._data[key] = (self._clock(), value)
+                self.refreshes += 1
+                return value
+            finally:
+                if self._inflight.get(key) is task:
+                    del self._inflight[key]
+
+        task = asyncio.create_task(refresh())
+        self._inflight[key] = task
+        return task
+
+    @staticmethod
+    def _log_refresh_error(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Background cache refresh failed", exc_info=task.exception())
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "generation_resets": self.generation_resets,
+        }
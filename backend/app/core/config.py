@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import os
 
@@ -8,18 +10,174 @@ dotenv_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__fil
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Stremio Manager"
 
+    # SQLite database. DATABASE_PROFILE picks a preset from app.database.PROFILES;
+    # any of the SQLITE_*/DATABASE_* values below that are set override the preset.
+    DATABASE_PATH: str = "./database.db"
+    DATABASE_PROFILE: str = "fast"
+    DATABASE_ECHO: Optional[bool] = None
+    DATABASE_POOL_SIZE: Optional[int] = None
+    DATABASE_MAX_OVERFLOW: Optional[int] = None
+    SQLITE_JOURNAL_MODE: Optional[str] = None
+    SQLITE_SYNCHRONOUS: Optional[str] = None
+    SQLITE_MMAP_SIZE: Optional[int] = None
+    SQLITE_CACHE_SIZE: Optional[int] = None
+    SQLITE_BUSY_TIMEOUT_MS: Optional[int] = None
+    SQLITE_TEMP_STORE: Optional[str] = None
+
+    # Optional separate database for addon usage events and their daily rollup,
+    # migrated with `alembic -n usage upgrade head`. USAGE_DATABASE_PROFILE
+    # defaults to DATABASE_PROFILE; the SQLITE_* overrides apply to both.
+    USAGE_DATABASE_PATH: Optional[str] = None
+    USAGE_DATABASE_PROFILE: Optional[str] = None
+
     # Trakt OAuth
     TRAKT_CLIENT_ID: str
     TRAKT_CLIENT_SECRET: str
+    TRAKT_API_URL: str = "https://api.trakt.tv"
+    TRAKT_REDIRECT_URI: str = "http://localhost:8000/api/v1/auth/trakt/callback"
+
+    # Shared Trakt API client. Trakt allows 1000 GETs per 5 minutes per app and
+    # one POST/PUT/DELETE per second per user. The GET budget is shared by all
+    # workers through TRAKT_RATE_LIMIT_PATH (defaults to DATABASE_PATH +
+    # "-trakt-rate-limit"; must be on a local filesystem).
+    TRAKT_MAX_CONNECTIONS: int = 10
+    TRAKT_TIMEOUT_SECONDS: float = 10.0
+    TRAKT_MAX_RETRIES: int = 3
+    TRAKT_GET_LIMIT_PER_5_MINUTES: int = 1000
+    TRAKT_GET_BURST: int = 50
+    TRAKT_WRITE_LIMIT_PER_SECOND: float = 1.0
+    TRAKT_RATE_LIMIT_PATH: Optional[str] = None
+    TRAKT_CACHE_DIR: str = "./trakt_cache"
+    # Cached responses are per access token; ones unused for the max age, and
+    # the least recently used beyond the max entries, are deleted
+    TRAKT_CACHE_MAX_ENTRIES: int = 10000
+    TRAKT_CACHE_MAX_AGE_DAYS: float = 30.0
+
+    # Background Trakt token refresh
+    TRAKT_TOKEN_REFRESH_ENABLED: bool = True
+    TRAKT_TOKEN_REFRESH_INTERVAL_SECONDS: float = 600.0
+    TRAKT_TOKEN_REFRESH_WINDOW_SECONDS: int = 6 * 3600  # refresh tokens expiring within this window
+    TRAKT_TOKEN_REFRESH_BATCH_SIZE: int = 50
+    TRAKT_TOKEN_REFRESH_CONCURRENCY: int = 4
+    # How long a worker owns the tokens it claimed; failed refreshes are retried after it
+    TRAKT_TOKEN_REFRESH_LEASE_SECONDS: int = 300
+
+    # Background Trakt history/watchlist sync. Each user is synced at most once
+    # per interval; only what changed since their last sync is fetched.
+    TRAKT_SYNC_ENABLED: bool = True
+    TRAKT_SYNC_INTERVAL_SECONDS: float = 900.0
+    TRAKT_SYNC_BATCH_SIZE: int = 50
+    TRAKT_SYNC_CONCURRENCY: int = 4
+    TRAKT_SYNC_PAGE_SIZE: int = 500
+    # How long a worker owns the users it claimed; should outlast the slowest sync
+    TRAKT_SYNC_LEASE_SECONDS: int = 900
 
     # Torrentio/Torbox Configuration
     TORRENTIO_BASE_URL: str = "https://torrentio.strem.fun"
     TORBOX_API_KEY: str # Loaded from .env
 
+    # TorBox instant-availability checks, made with the shared API key
+    TORBOX_API_URL: str = "https://api.torbox.app/v1/api"
+    TORBOX_CHECKCACHED_BATCH_SIZE: int = 100  # hashes per checkcached request
+    TORBOX_RATE_LIMIT_PER_SECOND: float = 5.0
+    TORBOX_CONCURRENCY: int = 4
+    TORBOX_CACHE_TTL_SECONDS: int = 6 * 3600  # how long a "cached" answer is trusted
+    TORBOX_NEGATIVE_CACHE_TTL_SECONDS: int = 3600  # uncached hashes can become cached sooner
+
+    # AIOStreams / self-hosted Comet
+    AIOSTREAMS_HOST: str = "aiostreams.elfhosted.com"
+    # Installed into users' Stremio accounts, so production must set the public
+    # URL; the default is the docker-compose Comet, only reachable locally
+    COMET_MANIFEST_URL: str = "http://localhost:8002/manifest.json"
+
+    # How long browsers may reuse an installation URL response without revalidating
+    INSTALLATION_URL_MAX_AGE_SECONDS: int = 300
+
+    # Addon manifest health prober
+    ADDON_HEALTH_ENABLED: bool = True
+    ADDON_HEALTH_INTERVAL_SECONDS: float = 60.0
+    ADDON_HEALTH_TIMEOUT_SECONDS: float = 5.0
+    ADDON_HEALTH_FAILURE_THRESHOLD: int = 3
+    ADDON_HEALTH_RESET_SECONDS: float = 300.0
+    ADDON_HEALTH_EXCLUDE_UNHEALTHY: bool = True
+
+    # Stremio stream proxy: fans lookups out to Comet and Torrentio and caches
+    # the merged result per media ID
+    STREAM_PROXY_COMET_TIMEOUT_SECONDS: float = 10.0
+    STREAM_PROXY_TIMEOUT_SECONDS: float = 5.0
+    STREAM_PROXY_CACHE_TTL_SECONDS: int = 900
+    STREAM_PROXY_CACHE_MAXSIZE: int = 5000
+
+    # Comet's SQLite cache, read (never written) by the warmer and analytics
+    COMET_DATABASE_PATH: str = "../data/comet/comet.db"
+
+    # Comet cache warmer: asks Comet to scrape the next episodes and new
+    # watchlist items of synced Trakt users before anyone presses play
+    COMET_WARM_ENABLED: bool = True
+    COMET_WARM_INTERVAL_SECONDS: float = 1800.0
+    COMET_WARM_CONCURRENCY: int = 2
+    COMET_WARM_MAX_PER_RUN: int = 200
+    COMET_WARM_LOOKBACK_DAYS: int = 30  # only users/items active within this window
+    COMET_WARM_TIMEOUT_SECONDS: float = 60.0  # a cold scrape can take a while
+    COMET_WARM_REWARM_SECONDS: int = 7 * 86400
+
     # JWT settings
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Tokens embedded in the stream proxy's per-user addon URL, which Stremio keeps for good
+    ADDON_TOKEN_EXPIRE_DAYS: int = 365
+
+    # Addon usage log write-behind buffer
+    USAGE_LOG_BATCH_SIZE: int = 500
+    USAGE_LOG_FLUSH_INTERVAL_SECONDS: float = 1.0
+    USAGE_LOG_QUEUE_MAXSIZE: int = 10000
+    USAGE_EXPORT_BATCH_SIZE: int = 5000
+
+    # Authenticated user lookup cache
+    USER_CACHE_ENABLED: bool = True
+    USER_CACHE_TTL_SECONDS: float = 60.0
+    USER_CACHE_MAXSIZE: int = 10000
+
+    # Shared generation counters that invalidate the in-process caches of every worker.
+    # Defaults to DATABASE_PATH + "-generations"; must be on a local filesystem.
+    CACHE_GENERATIONS_PATH: Optional[str] = None
+
+    # Password hashing pool. Requests beyond the pending limit are rejected with a 503.
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+
+    # Analytics stats cache: fresh for the TTL, then served stale while refreshing
+    ANALYTICS_STATS_TTL_SECONDS: float = 30.0
+    ANALYTICS_STATS_STALE_SECONDS: float = 300.0
+
+    # Comet cache analytics: scanning Comet's database is expensive, so results are cached longer
+    COMET_STATS_TTL_SECONDS: float = 300.0
+    COMET_STATS_STALE_SECONDS: float = 3600.0
+    COMET_STALE_AFTER_SECONDS: int = 7 * 86400  # rows older than this count as stale
+
+    # Prometheus metrics at /metrics. With several workers (gunicorn), each one
+    # writes its samples to METRICS_DIR and /metrics merges them; leave it unset
+    # for a single process. The directory should start empty on every deploy.
+    METRICS_ENABLED: bool = True
+    METRICS_DIR: Optional[str] = None
+    METRICS_FLUSH_INTERVAL_SECONDS: float = 5.0
+    # Required by /metrics when set. Without it /metrics is only open when
+    # METRICS_DIR is unset (a single local process) and answers 403 otherwise.
+    METRICS_BEARER_TOKEN: Optional[str] = None
+
+    # Slow-query log: statements slower than the threshold are kept, with their
+    # SQLite query plan, in a per-process ring buffer (/api/v1/analytics/slow-queries).
+    # With METRICS_DIR set, workers also write them below it and the buffers are merged.
+    SLOW_QUERY_ENABLED: bool = True
+    SLOW_QUERY_THRESHOLD_MS: float = 100.0
+    SLOW_QUERY_LOG_SIZE: int = 500
+    SLOW_QUERY_EXPLAIN: bool = True
+
+    # On-demand profiling: admins add `X-Profile: json|folded` (or ?profile=) to a
+    # request and get a sampled profile and DB/Python time split back instead
+    PROFILING_ENABLED: bool = True
+    PROFILING_SAMPLE_INTERVAL_MS: float = 1.0
 
     model_config = SettingsConfigDict(env_file=dotenv_path)
 
@@ -0,0 +1,97 @@
+import fcntl
+import mmap
+import os
+import struct
+import threading
+
+from app.core.config import settings
+
+# Invalidation channels. A channel's slot is its position here, so only ever append.
+CHANNELS = ("user", "analytics_stats", "addon_profiles")
+
+_SLOT = struct.Struct("<Q")
+_SIZE = 64 * _SLOT.size
+
+
+class GenerationTable:
+    """
+    Generation counters shared by every worker process, one per invalidation channel.
+
+    The counters live in a small memory-mapped file, so reading one is a
+    single 8-byte load with no system call: caches compare it with the
+    generation they last saw before serving, and drop their entries when it
+    changed. Bumping takes an exclusive flock on the file and is only done on
+    writes. Without a path the counters are private to the process.
+    """
+
+    def __init__(self, path: str | None):
+        self.path = path
+        self._buffer: mmap.mmap | bytearray | None = None
+        self._fd: int | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        # flock locks belong to the open file, which a forked child would share
+        # with its parent, so each process opens the file itself
+        if self.path is None:
+            self._buffer = bytearray(_SIZE)
+        else:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if os.fstat(fd).st_size < _SIZE:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                try:
+                    if os.fstat(fd).st_size < _SIZE:
+                        os.ftruncate(fd, _SIZE)  # new bytes read as zero
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+            self._buffer = mmap.mmap(fd, _SIZE)
+            self._fd = fd
+        self._pid = os.getpid()
+
+    def _map(self) -> mmap.mmap | bytearray:
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._open()
+        return self._buffer
+
+    def value(self, channel: str) -> int:
+        return _SLOT.unpack_from(self._map(), CHANNELS.index(channel) * _SLOT.size)[0]
+
+    def bump(self, channel: str) -> int:
+        """Advances a channel's generation in every process and returns the new value."""
+        buffer = self._map()
+        offset = CHANNELS.index(channel) * _SLOT.size
+        with self._lock:
+            if self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                value = _SLOT.unpack_from(buffer, offset)[0] + 1
+                _SLOT.pack_into(buffer, offset, value)
+            finally:
+                if self._fd is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return value
+
+    def channel(self, name: str) -> "Generation":
+        if name not in CHANNELS:
+            raise ValueError(f"Unknown invalidation channel {name!r}")
+        return Generation(self, name)
+
+
+class Generation:
+    """One channel of a GenerationTable, as handed to a cache."""
+
+    def __init__(self, table: GenerationTable, name: str):
+        self.table = table
+        self.name = name
+
+    def value(self) -> int:
+        return self.table.value(self.name)
+
+    def bump(self) -> int:
+        return self.table.bump(self.name)
+
+
+generations = GenerationTable(settings.CACHE_GENERATIONS_PATH or f"{settings.DATABASE_PATH}-generations")
@@ -0,0 +1,306 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# The ASGI scope of the request being handled, so SQL timings can be attributed
+# to its route. The router fills in scope["route"] before the endpoint runs.
+current_scope: ContextVar[dict | None] = ContextVar("current_scope", default=None)
+
+# (name, labels, value) samples reported by a collector at scrape time
+Sample = tuple[str, dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict[str, str]) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def route_label(scope: dict | None) -> str:
+    """The route template (e.g. /api/v1/users/{user_id}) rather than the raw path, to bound cardinality."""
+    if scope is None:
+        return "(background)"
+    label = scope.get("metrics.route")
+    if label is not None:
+        return label
+    route = scope.get("route")
+    if route is None or not hasattr(route, "path_regex"):
+        return "(unmatched)"
+    # Routes of included routers may only know their path below the include
+    # prefix; the prefix is whatever precedes the part of the path they match
+    path = scope["path"]
+    label = route.path
+    for index, char in enumerate(path):
+        if char == "/" and route.path_regex.match(path[index:]):
+            label = path[:index] + route.path
+            break
+    scope["metrics.route"] = label
+    return label
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms rendered in Prometheus text format.
+
+    Each process keeps its own samples. When `directory` is set (several
+    gunicorn workers), every worker writes a snapshot to `<directory>/<pid>.json`
+    every `flush_interval` seconds and on shutdown, and `render()` merges the
+    snapshots of all workers: counters and histograms are summed over every
+    file, including workers that have exited, so totals don't go backwards
+    when a worker is replaced; gauges only over workers that are still alive.
+
+    Gauges, and counters owned by other subsystems, come from collectors
+    registered with `register_collector()` and are read when a snapshot is taken.
+    """
+
+    def __init__(self, directory: str | None = None, flush_interval: float = 5.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._types: dict[str, str] = {}
+        self._help: dict[str, str] = {}
+        self._buckets: dict[str, tuple[float, ...]] = {}
+        self._counters: dict[str, dict[str, float]] = {}
+        # name -> labels -> [count per bucket..., +Inf count, sum]
+        self._histograms: dict[str, dict[str, list[float]]] = {}
+        self._collectors: list[Callable[[], Iterable[Sample]]] = []
+        # SQL hooks of the sync engine can run on threadpool threads
+        self._lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+
+    def counter(self, name: str, help: str):
+        self._types[name] = "counter"
+        self._help[name] = help
+        self._counters[name] = {}
+
+    def gauge(self, name: str, help: str):
+        self._types[name] = "gauge"
+        self._help[name] = help
+
+    def histogram(self, name: str, help: str, buckets: tuple[float, ...]):
+        self._types[name] = "histogram"
+        self._help[name] = help
+        self._buckets[name] = buckets
+        self._histograms[name] = {}
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]):
+        self._collectors.append(collector)
+
+    def inc(self, name: str, labels: dict[str, str], value: float = 1.0):
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, labels: dict[str, str], value: float):
+        key = _labels(labels)
+        buckets = self._buckets[name]
+        with self._lock:
+            series = self._histograms[name].get(key)
+            if series is None:
+                series = self._histograms[name][key] = [0.0] * (len(buckets) + 2)
+            series[bisect_left(buckets, value)] += 1
+            series[-1] += value
+
+    def snapshot(self) -> dict:
+        """This process's samples, in the format written to the snapshot files."""
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: {key: list(values) for key, values in series.items()} for name, series in self._histograms.items()}
+        gauges: dict[str, dict[str, float]] = {}
+        for collector in self._collectors:
+            try:
+                samples = list(collector())
+            except Exception:
+                logger.exception("Metrics collector failed")
+                continue
+            for name, labels, value in samples:
+                target = counters if self._types.get(name) == "counter" else gauges
+                series = target.setdefault(name, {})
+                key = _labels(labels)
+                series[key] = series.get(key, 0.0) + value
+        return {"pid": os.getpid(), "counters": counters, "gauges": gauges, "histograms": histograms}
+
+    def _write_snapshot(self):
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(f"{path}.tmp", path)
+
+    def _read_snapshots(self) -> list[tuple[dict, bool]]:
+        """(snapshot, process alive) for every worker's file."""
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue  # being replaced or half-written by a dying worker
+            snapshots.append((snapshot, process_alive(snapshot["pid"])))
+        return snapshots
+
+    def render(self) -> str:
+        if self.directory:
+            self._write_snapshot()
+            snapshots = self._read_snapshots()
+        else:
+            snapshots = [(self.snapshot(), True)]
+
+        counters: dict[str, dict[str, float]] = {}
+        gauges: dict[str, dict[str, float]] = {}
+        histograms: dict[str, dict[str, list[float]]] = {}
+        for snapshot, alive in snapshots:
+            kinds = [(counters, snapshot["counters"])] + ([(gauges, snapshot["gauges"])] if alive else [])
+            for merged, samples in kinds:
+                for name, series in samples.items():
+                    target = merged.setdefault(name, {})
+                    for key, value in series.items():
+                        target[key] = target.get(key, 0.0) + value
+            for name, series in snapshot["histograms"].items():
+                target = histograms.setdefault(name, {})
+                for key, values in series.items():
+                    if key in target and len(target[key]) == len(values):
+                        target[key] = [a + b for a, b in zip(target[key], values)]
+                    else:
+                        target[key] = list(values)
+
+        lines = []
+        for name, kind in self._types.items():
+            lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                buckets = self._buckets[name]
+                for key, values in sorted(histograms.get(name, {}).items()):
+                    prefix = f"{key}," if key else ""
+                    cumulative = 0.0
+                    for bound, count in zip((*buckets, "+Inf"), values[:-1]):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative:g}')
+                    suffix = f"{{{key}}}" if key else ""
+                    lines.append(f"{name}_sum{suffix} {values[-1]:.6f}")
+                    lines.append(f"{name}_count{suffix} {cumulative:g}")
+            else:
+                series = (counters if kind == "counter" else gauges).get(name, {})
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{{{key}}} {value:g}" if key else f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    async def start(self):
+        if not self.directory or self._task is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Final counters of this worker stay in the merged totals after it exits
+        self._write_snapshot()
+
+    async def _run(self):
+        while True:
+            try:
+                self._write_snapshot()
+            except Exception:
+                logger.exception("Writing metrics snapshot failed")
+            await asyncio.sleep(self.flush_interval)
+
+
+def process_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+metrics = MetricsRegistry(directory=settings.METRICS_DIR, flush_interval=settings.METRICS_FLUSH_INTERVAL_SECONDS)
+
+metrics.counter("stremio_http_requests_total", "HTTP requests by route and status code.")
+metrics.histogram("stremio_http_request_duration_seconds", "HTTP request latency by route.", REQUEST_BUCKETS)
+metrics.histogram(
+    "stremio_db_query_duration_seconds", "SQL statement execution time by database and route.", QUERY_BUCKETS
+)
+metrics.counter("stremio_db_query_errors_total", "SQL statements that raised, by database and route.")
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts and latency per route, and exposing the scope to the SQL hooks."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        token = current_scope.set(scope)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_scope.reset(token)
+            labels = {"method": scope["method"], "route": route_label(scope)}
+            metrics.inc("stremio_http_requests_total", {**labels, "status": str(status_code)})
+            metrics.observe("stremio_http_request_duration_seconds", labels, elapsed)
+
+
+def instrument_engine(engine, database: str):
+    """Times every statement run on a sync engine (or an async engine's `sync_engine`)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+        metrics.observe(
+            "stremio_db_query_duration_seconds",
+            {"database": database, "route": route_label(current_scope.get())},
+            elapsed,
+        )
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("metrics_query_start"):
+            conn.info["metrics_query_start"].pop()
+        metrics.inc("stremio_db_query_errors_total", {"database": database, "route": route_label(current_scope.get())})
@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Awaitable, Callable
+from urllib.parse import parse_qs
+
+from sqlalchemy import event
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("json", "folded")
+
+# The profile of the request being handled, for the SQL hooks
+profiled_request: ContextVar["RequestProfile | None"] = ContextVar("profiled_request", default=None)
+
+# Engines whose statements are timed while at least one profile is running
+_engines: list = []
+_active_profiles = 0
+_switch_interval: float | None = None
+
+
+class RequestProfile:
+    """Samples and DB time collected for one profiled request."""
+
+    def __init__(self):
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.python_seconds = 0.0  # the loop was running this request's code
+        self.other_seconds = 0.0  # the loop was running other requests or background tasks
+        self.waiting_seconds = 0.0  # the loop was idle: awaiting the database, network or threads
+        # Wall time inside SQL statements; overlaps the waiting (and other) time above
+        self.db_seconds = 0.0
+        self.db_statements = 0
+
+    def folded(self) -> str:
+        """Stacks in the folded format read by flamegraph.pl, speedscope and inferno."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class SamplingProfiler(threading.Thread):
+    """
+    Samples the event loop thread every `interval` seconds while one request runs.
+
+    A request shares its thread with every other task on the loop, so each
+    sample is attributed by what the loop was doing at that moment: running
+    the profiled task (its Python stack is recorded), running another task,
+    or idle in the selector waiting for I/O. Sync dependencies and bcrypt run
+    on other threads and show up as waiting.
+
+    The sampler needs the GIL to take a sample, so while any profile runs the
+    interpreter's switch interval is lowered to `interval`; otherwise busy
+    Python code would only be sampled every 5 ms.
+    """
+
+    def __init__(self, profile: RequestProfile, loop: asyncio.AbstractEventLoop, task: asyncio.Task, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.profile = profile
+        self.loop = loop
+        self.task = task
+        self.interval = interval
+        self.loop_thread_id = threading.get_ident()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        last = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            current = asyncio.current_task(self.loop)
+            if current is None:
+                self.profile.waiting_seconds += elapsed
+                continue
+            if current is not self.task:
+                self.profile.other_seconds += elapsed
+                continue
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            self.profile.python_seconds += elapsed
+            self.profile.samples += 1
+            self.profile.stacks[_fold(frame)] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _fold(frame) -> str:
+    names = []
+    while frame is not None:
+        names.append(f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_qualname}")
+        frame = frame.f_back
+    names.reverse()
+    # Drop the event loop frames every sample starts with
+    start = 0
+    while start < len(names) - 1 and names[start].startswith(("asyncio.", "uvloop.", "__main__.", "uvicorn.main.")):
+        start += 1
+    return ";".join(names[start:])
+
+
+def track_engine(engine):
+    """Adds a sync engine (or an async engine's `sync_engine`) to the ones timed during profiled requests."""
+    _engines.append(engine)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and profiled_request.get() is not None:
+        context._profile_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_profile_start", None)
+    profile = profiled_request.get()
+    if start is not None and profile is not None:
+        profile.db_seconds += time.perf_counter() - start
+        profile.db_statements += 1
+
+
+def _set_profiling_active(active: bool, interval: float):
+    # Only in effect while a profile runs, so other requests pay nothing
+    global _switch_interval
+    if active:
+        _switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(_switch_interval, interval))
+    elif _switch_interval is not None:
+        sys.setswitchinterval(_switch_interval)
+    for engine in _engines:
+        for name, listener in (
+            ("before_cursor_execute", _before_cursor_execute),
+            ("after_cursor_execute", _after_cursor_execute),
+        ):
+            if active:
+                event.listen(engine, name, listener)
+            elif event.contains(engine, name, listener):
+                event.remove(engine, name, listener)
+
+
+def requested_format(scope) -> str | None:
+    """The profile format asked for with an `X-Profile` header or `profile` query parameter, if any."""
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return _format(value.decode("latin-1"))
+    if b"profile=" in scope["query_string"]:
+        values = parse_qs(scope["query_string"].decode("latin-1")).get("profile")
+        if values:
+            return _format(values[0])
+    return None
+
+
+def _format(value: str) -> str | None:
+    value = value.strip().lower()
+    if value in ("", "0", "false", "off"):
+        return None
+    return value if value in FORMATS else "json"
+
+
+class ProfilingMiddleware:
+    """
+    Runs a request under the sampling profiler when it carries `X-Profile: json|folded`
+    (or `?profile=json|folded`) and `authorize` accepts it, and answers with the
+    profile instead of the endpoint's response.
+
+    Requests without the flag go straight through; `authorize` is given the
+    request and raises HTTPException to refuse it.
+    """
+
+    def __init__(self, app, authorize: Callable[[Request], Awaitable[object]], interval: float = 0.001):
+        self.app = app
+        self.authorize = authorize
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        output = requested_format(scope)
+        if output is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.authorize(Request(scope, receive))
+        except HTTPException as e:
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+            await response(scope, receive, send)
+            return
+
+        status_code = None
+
+        async def capture(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+        global _active_profiles
+        profile = RequestProfile()
+        profiler = SamplingProfiler(profile, asyncio.get_running_loop(), asyncio.current_task(), self.interval)
+        if _active_profiles == 0:
+            _set_profiling_active(True, self.interval)
+        _active_profiles += 1
+        token = profiled_request.set(profile)
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            profiler.stop()
+            wall = time.perf_counter() - start
+            profiled_request.reset(token)
+            _active_profiles -= 1
+            if _active_profiles == 0:
+                _set_profiling_active(False, self.interval)
+
+        logger.info("Profiled %s %s: %.1f ms", scope["method"], scope["path"], wall * 1000)
+        if output == "folded":
+            response = PlainTextResponse(profile.folded())
+        else:
+            response = JSONResponse({
+                "method": scope["method"],
+                "path": scope["path"],
+                "status_code": status_code,
+                "wall_ms": round(wall * 1000, 3),
+                "db_ms": round(profile.db_seconds * 1000, 3),
+                "db_statements": profile.db_statements,
+                "python_ms": round(profile.python_seconds * 1000, 3),
+                "waiting_ms": round(profile.waiting_seconds * 1000, 3),
+                "other_tasks_ms": round(profile.other_seconds * 1000, 3),
+                "sample_interval_ms": self.interval * 1000,
+                "samples": profile.samples,
+                "folded": profile.folded(),
+            })
+        await response(scope, receive, send)
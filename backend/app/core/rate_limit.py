@@ -0,0 +1,91 @@
+import asyncio
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter: refills at `rate` tokens per second up to
+    `capacity`. `acquire()` reserves a token immediately and sleeps until it
+    would have been available, so waiters are served in arrival order.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated_at = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Takes `tokens` and returns how many seconds the caller must wait before using them."""
+        self._refill()
+        self._tokens -= tokens
+        return max(0.0, -self._tokens / self.rate)
+
+    async def acquire(self, tokens: float = 1.0):
+        delay = self.reserve(tokens)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    A TokenBucket shared by every process that opens the same `path`, such as
+    the gunicorn workers, so together they stay within one budget.
+
+    The token count and refill time live in a small memory-mapped file and
+    each reservation holds an exclusive flock on it. The clock must be the
+    same for all processes; time.monotonic is system-wide. Without a path
+    the bucket is private to the process.
+    """
+
+    _STATE = struct.Struct("<dd")  # tokens, updated_at
+
+    def __init__(self, rate: float, capacity: float, path: str | None, clock=time.monotonic):
+        super().__init__(rate, capacity, clock)
+        self.path = path
+        self._buffer: mmap.mmap | None = None
+        self._fd: int | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        # Each process opens the file itself; see GenerationTable._open
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size < self._STATE.size:
+                os.ftruncate(fd, self._STATE.size)
+                os.pwrite(fd, self._STATE.pack(self.capacity, self._clock()), 0)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self._buffer = mmap.mmap(fd, self._STATE.size)
+        self._fd = fd
+        self._pid = os.getpid()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        if self.path is None:
+            return super().reserve(tokens)
+        with self._lock:
+            if self._pid != os.getpid():
+                self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                self._tokens, self._updated_at = self._STATE.unpack_from(self._buffer)
+                # A file left from before a reboot holds a time the clock hasn't reached
+                self._updated_at = min(self._updated_at, self._clock())
+                delay = super().reserve(tokens)
+                self._STATE.pack_into(self._buffer, 0, self._tokens, self._updated_at)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return delay
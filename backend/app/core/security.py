@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 from jose import jwt
@@ -13,6 +15,41 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+
+class PasswordHashingBusy(Exception):
+    """Raised when too many password hash operations are already pending."""
+
+
+# bcrypt releases the GIL, so a small thread pool keeps it off the event loop
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+_pending_hashes = 0
+
+
+async def _run_hashing(func, *args):
+    global _pending_hashes
+    if _pending_hashes >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise PasswordHashingBusy()
+    _pending_hashes += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, func, *args)
+    finally:
+        _pending_hashes -= 1
+
+
+async def verify_password_async(plain_password, hashed_password):
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password):
+    return await _run_hashing(get_password_hash, password)
+
+# `scope` claim of tokens that only grant access to a user's addon URLs
+ADDON_TOKEN_SCOPE = "addon"
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     if expires_delta:
@@ -22,3 +59,10 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
+
+
+def create_addon_token(email: str) -> str:
+    """A long-lived token for a user's addon URLs, which can't be used as a bearer token."""
+    return create_access_token(
+        {"sub": email, "scope": ADDON_TOKEN_SCOPE}, expires_delta=timedelta(days=settings.ADDON_TOKEN_EXPIRE_DAYS)
+    )
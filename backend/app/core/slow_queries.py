@@ -0,0 +1,289 @@
+import glob
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.metrics import current_scope, process_alive, route_label
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+
+def normalize_statement(statement: str) -> str:
+    """
+    The shape of a statement: literals replaced by `?`, IN lists of any length
+    collapsed to `(?...)` and whitespace squeezed, so executions of the same
+    query with different values group together.
+    """
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _IN_LIST.sub("(?...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+def redact_parameters(parameters) -> list | dict | None:
+    """Keeps numbers, booleans and NULLs; strings and bytes (emails, hashes, tokens) become a type and length."""
+    def redact(value):
+        if value is None or isinstance(value, (bool, int, float)):
+            return value
+        if isinstance(value, (str, bytes)):
+            return f"<{type(value).__name__}({len(value)})>"
+        return f"<{type(value).__name__}>"
+
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {name: redact(value) for name, value in parameters.items()}
+    return [redact(value) for value in parameters]
+
+
+def format_query_plan(rows) -> list[str]:
+    """EXPLAIN QUERY PLAN rows (id, parent, notused, detail) as indented lines, like the sqlite3 shell."""
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+def is_full_scan(plan: list[str]) -> bool:
+    """Whether the plan walks a whole table or index (SCAN) rather than only seeking into one (SEARCH)."""
+    return any(line.strip().startswith("SCAN ") and "CONSTANT ROW" not in line for line in plan)
+
+
+class SlowQueryLog:
+    """
+    Bounded ring buffer of statements that took longer than `threshold` seconds.
+
+    Each entry holds the statement's shape, its redacted parameters, duration,
+    database, route and the query plan SQLite chose. Plans are captured with
+    EXPLAIN QUERY PLAN on the same connection, at most once per shape every
+    `explain_interval` seconds. `worst()` aggregates the entries by shape.
+
+    The buffer is per process. When `directory` is set (several gunicorn
+    workers), every worker also appends its entries to `<directory>/<pid>.jsonl`,
+    and `recent()`, `worst()` and `stats()` merge the last `maxsize` entries of
+    every worker, including workers that have exited. `clear()` applies to all
+    of them.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.1,
+        maxsize: int = 500,
+        explain: bool = True,
+        explain_interval: float = 300.0,
+        directory: str | None = None,
+    ):
+        self.threshold = threshold
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self.directory = directory
+        self._entries: deque[dict] = deque(maxlen=maxsize)
+        self._plans: dict[str, tuple[float, list[str]]] = {}
+        self.recorded = 0
+        # Lines in this worker's file; it is rewritten from the buffer when it
+        # reaches twice `maxsize`. Statements can finish on threadpool threads.
+        self._written = 0
+        self._lock = threading.Lock()
+
+    def _plan(self, conn, statement: str, shape: str, parameters) -> list[str] | None:
+        cached = self._plans.get(shape)
+        if cached is not None and time.monotonic() - cached[0] < self.explain_interval:
+            return cached[1]
+        if not self.explain or not statement.lstrip().upper().startswith(_EXPLAINABLE):
+            return None
+        try:
+            explain_cursor = conn.connection.cursor()
+            try:
+                explain_cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+                plan = format_query_plan(explain_cursor.fetchall())
+            finally:
+                explain_cursor.close()
+        except Exception as e:
+            logger.debug("EXPLAIN QUERY PLAN failed for %s: %s", shape, e)
+            return None
+        self._plans[shape] = (time.monotonic(), plan)
+        return plan
+
+    def record(self, conn, database: str, statement: str, parameters, duration: float, executemany: bool):
+        """Adds a statement that ran for `duration` seconds on `conn`, a SQLAlchemy connection."""
+        shape = normalize_statement(statement)
+        plan = None if executemany else self._plan(conn, statement, shape, parameters)
+        route = route_label(current_scope.get())
+        self._entries.append({
+            "shape": shape,
+            "database": database,
+            "route": route,
+            "parameters": None if executemany else redact_parameters(parameters),
+            "duration_ms": round(duration * 1000, 3),
+            "plan": plan,
+            "at": datetime.utcnow(),
+        })
+        self.recorded += 1
+        if self.directory:
+            try:
+                self._append(self._entries[-1])
+            except OSError as e:
+                logger.debug("Writing slow query to %s failed: %s", self.directory, e)
+        logger.warning("Slow query (%.0f ms) on %s for %s: %s", duration * 1000, database, route, shape[:200])
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"{pid}.jsonl")
+
+    def _append(self, entry: dict):
+        with self._lock:
+            if self._written >= 2 * self._entries.maxlen:
+                path = self._path(os.getpid())
+                with open(f"{path}.tmp", "w") as f:
+                    f.writelines(json.dumps(buffered, default=str) + "\n" for buffered in list(self._entries))
+                os.replace(f"{path}.tmp", path)
+                self._written = len(self._entries)
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(os.getpid()), "a") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+            self._written += 1
+
+    def _cleared_at(self) -> datetime | None:
+        try:
+            with open(os.path.join(self.directory, "cleared")) as f:
+                return datetime.fromisoformat(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _all_entries(self) -> tuple[list[dict], int]:
+        """(entries of every worker oldest first, number of workers) when `directory` is set, else this worker's."""
+        entries = list(self._entries)
+        if not self.directory:
+            return entries, 1
+        workers = 1
+        own = self._path(os.getpid())
+        for path in glob.glob(os.path.join(self.directory, "*.jsonl")):
+            if path == own:
+                continue
+            try:
+                with open(path) as f:
+                    lines = f.readlines()[-self._entries.maxlen:]
+            except OSError:
+                continue  # removed by clear()
+            workers += 1
+            for line in lines:
+                try:
+                    entry = json.loads(line)
+                    entry["at"] = datetime.fromisoformat(entry["at"])
+                except (ValueError, KeyError):
+                    continue  # the line another worker is writing
+                entries.append(entry)
+        cleared_at = self._cleared_at()
+        if cleared_at is not None:
+            entries = [entry for entry in entries if entry["at"] > cleared_at]
+        entries.sort(key=lambda entry: entry["at"])
+        return entries, workers
+
+    def recent(self, limit: int = 50) -> list[dict]:
+        return self._all_entries()[0][-limit:][::-1]
+
+    def worst(self, limit: int = 20, sort: str = "total") -> list[dict]:
+        """The buffered statements grouped by database and shape, worst first by total, max or count."""
+        groups: dict[tuple[str, str], dict] = {}
+        for entry in self._all_entries()[0]:
+            group = groups.get((entry["database"], entry["shape"]))
+            if group is None:
+                group = groups[(entry["database"], entry["shape"])] = {
+                    "shape": entry["shape"],
+                    "database": entry["database"],
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "routes": {},
+                    "plan": None,
+                    "parameters": None,
+                    "last_seen": entry["at"],
+                }
+            group["count"] += 1
+            group["total_ms"] += entry["duration_ms"]
+            if entry["duration_ms"] >= group["max_ms"]:
+                # The slowest execution's parameters are the most useful example
+                group["max_ms"] = entry["duration_ms"]
+                group["parameters"] = entry["parameters"]
+            group["routes"][entry["route"]] = group["routes"].get(entry["route"], 0) + 1
+            group["plan"] = entry["plan"] or group["plan"]
+            group["last_seen"] = entry["at"]
+
+        for group in groups.values():
+            group["total_ms"] = round(group["total_ms"], 3)
+            group["mean_ms"] = round(group["total_ms"] / group["count"], 3)
+            group["full_scan"] = is_full_scan(group["plan"]) if group["plan"] else None
+        key = {"total": "total_ms", "max": "max_ms", "count": "count"}[sort]
+        return sorted(groups.values(), key=lambda group: group[key], reverse=True)[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._plans.clear()
+            if not self.directory:
+                return
+            # Other workers still hold their entries in memory, so those from
+            # before this point are filtered out when merging rather than deleted
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, "cleared")
+            with open(f"{path}.tmp", "w") as f:
+                f.write(datetime.utcnow().isoformat())
+            os.replace(f"{path}.tmp", path)
+            for path in glob.glob(os.path.join(self.directory, "*.jsonl")):
+                if not process_alive(int(os.path.basename(path).split(".")[0])):
+                    os.remove(path)
+
+    def stats(self) -> dict:
+        entries, workers = self._all_entries()
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "recorded": self.recorded,
+            "buffered": len(entries),
+            "maxsize": self._entries.maxlen,
+            "workers": workers,
+            "pid": os.getpid(),
+        }
+
+
+def instrument_engine(engine, database: str, log: SlowQueryLog):
+    """Checks the duration of every statement run on a sync engine (or an async engine's `sync_engine`)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["slow_query_start"].pop()
+        if duration >= log.threshold:
+            log.record(conn, database, statement, parameters, duration, executemany)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("slow_query_start"):
+            conn.info["slow_query_start"].pop()
+
+
+slow_query_log = SlowQueryLog(
+    threshold=settings.SLOW_QUERY_THRESHOLD_MS / 1000,
+    maxsize=settings.SLOW_QUERY_LOG_SIZE,
+    explain=settings.SLOW_QUERY_EXPLAIN,
+    directory=os.path.join(settings.METRICS_DIR, "slow-queries") if settings.METRICS_DIR else None,
+)
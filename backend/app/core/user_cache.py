@@ -0,0 +1,28 @@
+from dataclasses import dataclass
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.generations import generations
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """The subset of a user that authenticated requests need."""
+    id: int
+    email: str
+    is_admin: bool
+
+
+# Maps a verified token subject (the user's email) to a UserSnapshot
+user_cache = TTLCache(
+    maxsize=settings.USER_CACHE_MAXSIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+    generation=generations.channel("user"),
+)
+
+
+def invalidate_user(*emails: str):
+    """Drops these users here and, through the "user" generation, every other worker's whole user cache."""
+    for email in emails:
+        user_cache.invalidate(email)
+    generations.bump("user")
@@ -1,8 +1,16 @@
+from collections import Counter
+from datetime import datetime
+from typing import AsyncIterator
+
+from sqlalchemy import and_, case, delete, insert, literal, or_, true, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select, func, desc
 
 from . import models, schemas
-from .core.security import get_password_hash
+from .core.security import get_password_hash_async
+from .core.generations import generations
+from .core.user_cache import invalidate_user
 
 
 async def get_user(db: AsyncSession, user_id: int) -> models.User | None:
@@ -16,13 +24,14 @@ async def get_user_by_email(db: AsyncSession, email: str) -> models.User | None:
 
 
 async def create_user(db: AsyncSession, user: schemas.UserCreate) -> models.User:
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     db_user = models.User(
         email=user.email, hashed_password=hashed_password, is_admin=user.is_admin
     )
     db.add(db_user)
     await db.commit()
     await db.refresh(db_user)
+    generations.bump("analytics_stats")
     return db_user
 
 
@@ -31,12 +40,24 @@ async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100) -> list[m
     return result.scalars().all()
 
 
+async def get_users_after(
+    db: AsyncSession, after_id: int | None = None, limit: int = 100
+) -> list[models.User]:
+    """Keyset page of users ordered by id, starting after `after_id`."""
+    query = select(models.User).order_by(models.User.id).limit(limit)
+    if after_id is not None:
+        query = query.where(models.User.id > after_id)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
 async def update_user(
     db: AsyncSession, db_user: models.User, user_in: schemas.UserUpdate
 ) -> models.User:
+    previous_email = db_user.email
     update_data = user_in.model_dump(exclude_unset=True)
     if "password" in update_data and update_data["password"]:
-        hashed_password = get_password_hash(update_data["password"])
+        hashed_password = await get_password_hash_async(update_data["password"])
         db_user.hashed_password = hashed_password
         del update_data["password"]
 
@@ -46,6 +67,8 @@ async def update_user(
     db.add(db_user)
     await db.commit()
     await db.refresh(db_user)
+    invalidate_user(previous_email, db_user.email)
+    generations.bump("analytics_stats")
     return db_user
 
 
@@ -54,19 +77,60 @@ async def delete_user(db: AsyncSession, user_id: int):
     if db_user:
         await db.delete(db_user)
         await db.commit()
+        invalidate_user(db_user.email)
+        generations.bump("analytics_stats")
     return db_user
 
 
+async def increment_addon_usage_daily(db: AsyncSession, rows: list[dict]):
+    """
+    Adds a batch of usage events to the daily rollup in the current transaction.
+    Each row is a dict with `user_id`, `addon` and `created_at`.
+    """
+    counts = Counter(
+        (row["created_at"].date().isoformat(), row["user_id"], row.get("addon", "unknown"))
+        for row in rows
+    )
+    stmt = sqlite_insert(models.AddonUsageDaily).values(
+        [
+            {"day": day, "user_id": user_id, "addon": addon, "count": count}
+            for (day, user_id, addon), count in counts.items()
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["day", "user_id", "addon"],
+        set_={"count": models.AddonUsageDaily.count + stmt.excluded.count},
+    )
+    await db.execute(stmt)
+
+
 async def create_addon_usage_log(
-    db: AsyncSession, user: models.User
+    db: AsyncSession, user: models.User, addon: str = "unknown"
 ) -> models.AddonUsageLog:
-    db_log = models.AddonUsageLog(user_id=user.id)
+    db_log = models.AddonUsageLog(user_id=user.id, addon=addon)
     db.add(db_log)
+    await increment_addon_usage_daily(
+        db, [{"user_id": db_log.user_id, "addon": addon, "created_at": db_log.created_at}]
+    )
     await db.commit()
     await db.refresh(db_log)
     return db_log
 
 
+async def create_addon_usage_logs(db: AsyncSession, rows: list[dict]) -> int:
+    """
+    Inserts a batch of usage events as a single multi-row INSERT, updates the
+    daily rollup and commits once. Each row is a dict with `user_id`, `addon`
+    and `created_at`.
+    """
+    if not rows:
+        return 0
+    await db.execute(insert(models.AddonUsageLog).values(rows))
+    await increment_addon_usage_daily(db, rows)
+    await db.commit()
+    return len(rows)
+
+
 async def get_addon_usage_logs(
     db: AsyncSession, skip: int = 0, limit: int = 100
 ) -> list[models.AddonUsageLog]:
@@ -74,38 +138,400 @@ async def get_addon_usage_logs(
     return result.scalars().all()
 
 
+async def get_addon_usage_logs_after(
+    db: AsyncSession,
+    after: tuple[datetime, int] | None = None,
+    limit: int = 100,
+    user_id: int | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> list[models.AddonUsageLog]:
+    """
+    Keyset page of usage logs ordered by (created_at, id), starting after the
+    `after` key. Optional filters by user and a [since, until) time range.
+    """
+    log = models.AddonUsageLog
+    query = select(log).order_by(log.created_at, log.id).limit(limit)
+    if after is not None:
+        query = query.where(tuple_(log.created_at, log.id) > tuple(after))
+    if user_id is not None:
+        query = query.where(log.user_id == user_id)
+    if since is not None:
+        query = query.where(log.created_at >= since)
+    if until is not None:
+        query = query.where(log.created_at < until)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+async def stream_addon_usage_log_rows(
+    db: AsyncSession,
+    batch_size: int = 5000,
+    user_id: int | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> AsyncIterator[list[tuple]]:
+    """
+    Yields usage logs as lists of plain (id, user_id, addon, created_at) tuples,
+    `batch_size` rows at a time, from a server-side cursor in (created_at, id)
+    order. No ORM objects are built, so memory stays flat however many rows match.
+    """
+    log = models.AddonUsageLog
+    query = (
+        select(log.id, log.user_id, log.addon, log.created_at)
+        .order_by(log.created_at, log.id)
+        .execution_options(yield_per=batch_size)
+    )
+    if user_id is not None:
+        query = query.where(log.user_id == user_id)
+    if since is not None:
+        query = query.where(log.created_at >= since)
+    if until is not None:
+        query = query.where(log.created_at < until)
+    result = await db.stream(query)
+    async for partition in result.partitions():
+        yield partition
+
+
 async def get_total_users(db: AsyncSession) -> int:
     result = await db.execute(select(func.count(models.User.id)))
     return result.scalar_one()
 
 
 async def get_total_addon_usage(db: AsyncSession) -> int:
-    result = await db.execute(select(func.count(models.AddonUsageLog.id)))
+    result = await db.execute(
+        select(func.coalesce(func.sum(models.AddonUsageDaily.count), 0))
+    )
     return result.scalar_one()
 
 
 async def get_addon_usage_by_day(db: AsyncSession, limit: int = 30) -> list:
+    # Walks the rollup's (day, ...) primary key backwards, so only the
+    # requested days are read regardless of how much history exists.
     result = await db.execute(
         select(
-            func.date(models.AddonUsageLog.created_at).label("date"),
-            func.count(models.AddonUsageLog.id).label("count"),
+            models.AddonUsageDaily.day.label("date"),
+            func.sum(models.AddonUsageDaily.count).label("count"),
         )
-        .group_by(func.date(models.AddonUsageLog.created_at))
-        .order_by(desc("date"))
+        .group_by(models.AddonUsageDaily.day)
+        .order_by(desc(models.AddonUsageDaily.day))
         .limit(limit)
     )
     return result.mappings().all()
 
 
 async def get_most_active_users(db: AsyncSession, limit: int = 10) -> list:
+    # The rollup may live in the separate usage database, so the emails are
+    # looked up by id afterwards instead of joined
+    daily = models.AddonUsageDaily
+    result = await db.execute(
+        select(daily.user_id, func.sum(daily.count).label("count"))
+        .group_by(daily.user_id)
+        .order_by(desc("count"))
+        .limit(limit)
+    )
+    top = result.all()
+    result = await db.execute(
+        select(models.User.id, models.User.email).where(models.User.id.in_([row.user_id for row in top]))
+    )
+    emails = dict(result.all())
+    return [{"email": emails[row.user_id], "count": row.count} for row in top if row.user_id in emails]
+
+
+async def get_trakt_auth_by_user_id(
+    db: AsyncSession, user_id: int, not_expired_at: int | None = None
+) -> models.TraktUserAuth | None:
+    """A user's Trakt link, optionally only if its access token is still valid at the given Unix timestamp."""
+    query = select(models.TraktUserAuth).where(models.TraktUserAuth.user_id == user_id)
+    if not_expired_at is not None:
+        query = query.where(models.TraktUserAuth.expires_at > not_expired_at)
+    result = await db.execute(query)
+    return result.scalar_one_or_none()
+
+
+async def claim_trakt_auths_expiring_before(
+    db: AsyncSession, expires_before: int, now: int, claim_until: int, limit: int = 100
+) -> list:
+    """
+    Claims up to `limit` Trakt tokens expiring before the given Unix timestamp,
+    soonest first, that no other worker holds a claim on at `now`. Returns the
+    claimed rows; refresh tokens are single-use, so only their claimant may
+    spend them.
+    """
+    auth = models.TraktUserAuth
+    due = (
+        select(auth.id)
+        .where(
+            auth.expires_at < expires_before,
+            or_(auth.refresh_claimed_until.is_(None), auth.refresh_claimed_until <= now),
+        )
+        .order_by(auth.expires_at)
+        .limit(limit)
+    )
+    result = await db.execute(
+        update(auth)
+        .where(auth.id.in_(due.scalar_subquery()))
+        .values(refresh_claimed_until=claim_until)
+        .returning(auth.id, auth.user_id, auth.refresh_token)
+    )
+    rows = result.all()
+    await db.commit()
+    return rows
+
+
+async def update_trakt_tokens(db: AsyncSession, rows: list[dict]):
+    """
+    Bulk-updates Trakt tokens by primary key in one executemany and releases
+    their refresh claims. Each row needs `id` plus the refreshed token fields.
+    """
+    if not rows:
+        return
+    await db.execute(update(models.TraktUserAuth), [{**row, "refresh_claimed_until": None} for row in rows])
+    await db.commit()
+
+
+async def claim_trakt_sync_candidates(
+    db: AsyncSession,
+    synced_before: datetime,
+    now: int,
+    claim_until: int,
+    limit: int = 100,
+    exclude_user_ids: set[int] | None = None,
+    user_id: int | None = None,
+) -> list:
+    """
+    Claims up to `limit` users with a usable Trakt token that have never been
+    synced or were last synced before `synced_before`, least recently synced
+    first, and that no other worker holds a claim on at `now`. Returns the
+    claimed users with their sync cursor. With `user_id`, claims that user
+    whenever they were last synced. save_trakt_sync releases the claim.
+    """
+    auth, state = models.TraktUserAuth, models.TraktSyncState
+    unclaimed = or_(state.claimed_until.is_(None), state.claimed_until <= now)
+    due = or_(state.synced_at.is_(None), state.synced_at < synced_before) if user_id is None else true()
+    candidates = (
+        select(auth.user_id, literal(claim_until))
+        .outerjoin(state, state.user_id == auth.user_id)
+        .where(auth.expires_at > now, unclaimed, due)
+        .order_by(state.synced_at.is_not(None), state.synced_at)
+        .limit(limit)
+    )
+    if user_id is not None:
+        candidates = candidates.where(auth.user_id == user_id)
+    if exclude_user_ids:
+        candidates = candidates.where(auth.user_id.not_in(exclude_user_ids))
+    # One statement, so two workers can't both claim a user between a read and a write;
+    # users without a state row yet get one holding just the claim
+    stmt = sqlite_insert(state).from_select(["user_id", "claimed_until"], candidates)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[state.user_id],
+        set_={"claimed_until": stmt.excluded.claimed_until},
+        where=and_(unclaimed, due),
+    ).returning(state.user_id)
+    claimed = (await db.execute(stmt)).scalars().all()
+    await db.commit()
+    if not claimed:
+        return []
+
     result = await db.execute(
         select(
-            models.User.email,
-            func.count(models.AddonUsageLog.id).label("count"),
+            auth.user_id,
+            auth.access_token,
+            state.movies_watched_at,
+            state.episodes_watched_at,
+            state.watchlist_updated_at,
         )
-        .join(models.User, models.AddonUsageLog.user_id == models.User.id)
-        .group_by(models.User.email)
-        .order_by(desc("count"))
+        .join(state, state.user_id == auth.user_id)
+        .where(auth.user_id.in_(claimed))
+        .order_by(state.synced_at.is_not(None), state.synced_at)
+    )
+    return result.all()
+
+
+async def save_trakt_sync(
+    db: AsyncSession,
+    state: dict,
+    history: list[dict] | None = None,
+    watchlist: list[dict] | None = None,
+    full: bool = False,
+):
+    """
+    Stores one user's sync in a single transaction: new history rows (plays
+    already stored are skipped), the full watchlist if it was fetched, and the
+    new cursor, releasing the user's sync claim. `state` is a TraktSyncState
+    row as a dict. With `full`, the user's stored history is replaced rather
+    than added to.
+    """
+    state = {**state, "claimed_until": None}
+    user_id = state["user_id"]
+    if full:
+        await db.execute(delete(models.TraktHistory).where(models.TraktHistory.user_id == user_id))
+    # Chunked to stay under SQLite's bound-parameter limit
+    for start in range(0, len(history or ()), 1000):
+        await db.execute(
+            sqlite_insert(models.TraktHistory).values(history[start:start + 1000]).on_conflict_do_nothing()
+        )
+    if watchlist is not None:
+        await db.execute(delete(models.TraktWatchlist).where(models.TraktWatchlist.user_id == user_id))
+        for start in range(0, len(watchlist), 1000):
+            await db.execute(insert(models.TraktWatchlist).values(watchlist[start:start + 1000]))
+    stmt = sqlite_insert(models.TraktSyncState).values(state)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[models.TraktSyncState.user_id],
+        set_={key: stmt.excluded[key] for key in state if key != "user_id"},
+    ))
+    await db.commit()
+
+
+async def get_next_up_episodes(db: AsyncSession, since: datetime, limit: int = 100) -> list:
+    """
+    The episode after each user's most recently watched episode of every show
+    they watched since `since`, as (imdb_id, season, episode) of the watched
+    episode plus how many users are at that point, most shared first.
+    """
+    history = models.TraktHistory
+    # SQLite returns the other columns from the row holding max(watched_at)
+    latest = (
+        select(
+            history.imdb_id,
+            history.season,
+            history.episode,
+            func.max(history.watched_at).label("watched_at"),
+        )
+        .where(
+            history.media_type == "episode",
+            history.watched_at >= since,
+            history.imdb_id.is_not(None),
+        )
+        .group_by(history.user_id, history.show_trakt_id)
+        .subquery()
+    )
+    result = await db.execute(
+        select(
+            latest.c.imdb_id,
+            latest.c.season,
+            latest.c.episode,
+            func.count().label("viewers"),
+        )
+        .group_by(latest.c.imdb_id, latest.c.season, latest.c.episode)
+        .order_by(desc("viewers"), desc(func.max(latest.c.watched_at)))
         .limit(limit)
     )
-    return result.mappings().all()
+    return result.all()
+
+
+async def get_recent_watchlist_items(db: AsyncSession, since: datetime, limit: int = 100) -> list:
+    """Movies and shows added to any watchlist since `since`, most listed first."""
+    watchlist = models.TraktWatchlist
+    result = await db.execute(
+        select(
+            watchlist.media_type,
+            watchlist.imdb_id,
+            func.count().label("viewers"),
+        )
+        .where(
+            watchlist.listed_at >= since,
+            watchlist.media_type.in_(["movie", "show"]),
+            watchlist.imdb_id.is_not(None),
+        )
+        .group_by(watchlist.media_type, watchlist.imdb_id)
+        .order_by(desc("viewers"), desc(func.max(watchlist.listed_at)))
+        .limit(limit)
+    )
+    return result.all()
+
+
+async def claim_comet_warms(db: AsyncSession, rows: list[dict], rewarm_before: datetime) -> set[str]:
+    """
+    Records that these media IDs are being warmed, unless they were already
+    warmed after `rewarm_before`. Returns the media IDs claimed, so concurrent
+    warmers in other workers never warm the same ID twice.
+    """
+    if not rows:
+        return set()
+    warm = models.CometWarm
+    stmt = sqlite_insert(warm).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[warm.media_id],
+        set_={"warmed_at": stmt.excluded.warmed_at, "ok": False},
+        where=warm.warmed_at < rewarm_before,
+    ).returning(warm.media_id)
+    result = await db.execute(stmt)
+    claimed = set(result.scalars().all())
+    await db.commit()
+    return claimed
+
+
+async def mark_comet_warms_ok(db: AsyncSession, media_ids: list[str]):
+    if not media_ids:
+        return
+    await db.execute(
+        update(models.CometWarm).where(models.CometWarm.media_id.in_(media_ids)).values(ok=True)
+    )
+    await db.commit()
+
+
+async def get_comet_warm_hit_rate(db: AsyncSession, since: datetime) -> dict:
+    """
+    Of the media IDs successfully warmed since `since`, how many somebody
+    played afterwards according to synced Trakt history.
+    """
+    warm, history = models.CometWarm, models.TraktHistory
+    played = (
+        select(history.history_id)
+        .where(
+            history.imdb_id == warm.imdb_id,
+            or_(
+                and_(warm.season.is_(None), history.media_type == "movie"),
+                and_(history.season == warm.season, history.episode == warm.episode),
+            ),
+            history.watched_at >= warm.warmed_at,
+        )
+        .exists()
+    )
+    result = await db.execute(
+        select(
+            func.count().label("warmed"),
+            func.coalesce(func.sum(case((played, 1), else_=0)), 0).label("played"),
+        )
+        .where(warm.warmed_at >= since, warm.ok.is_(True))
+    )
+    return dict(result.mappings().one())
+
+
+async def get_torbox_availability(
+    db: AsyncSession, info_hashes: list[str], cached_since: datetime, uncached_since: datetime
+) -> list[models.TorboxAvailability]:
+    """
+    Stored TorBox answers for these hashes that are still fresh: positive
+    answers checked after `cached_since`, negative ones after `uncached_since`.
+    """
+    availability = models.TorboxAvailability
+    rows = []
+    # Chunked to stay under SQLite's bound-parameter limit
+    for start in range(0, len(info_hashes), 1000):
+        result = await db.execute(
+            select(availability).where(
+                availability.info_hash.in_(info_hashes[start:start + 1000]),
+                or_(
+                    and_(availability.cached.is_(True), availability.checked_at >= cached_since),
+                    and_(availability.cached.is_(False), availability.checked_at >= uncached_since),
+                ),
+            )
+        )
+        rows.extend(result.scalars().all())
+    return rows
+
+
+async def upsert_torbox_availability(db: AsyncSession, rows: list[dict]):
+    """Inserts or replaces TorBox answers. Each row is a TorboxAvailability as a dict."""
+    if not rows:
+        return
+    availability = models.TorboxAvailability
+    for start in range(0, len(rows), 1000):
+        stmt = sqlite_insert(availability).values(rows[start:start + 1000])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[availability.info_hash],
+            set_={key: stmt.excluded[key] for key in ("cached", "name", "size", "checked_at")},
+        ))
+    await db.commit()
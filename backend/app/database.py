@@ -1,26 +1,200 @@
+from dataclasses import dataclass, replace
+
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlmodel import create_engine, Session, SQLModel
 
-DATABASE_URL = "sqlite:///./database.db"
+from app import models
+from app.core.config import settings
+from app.core import metrics, profiling, slow_queries
+
+# Tables kept in the usage database when USAGE_DATABASE_PATH is set
+USAGE_MODELS = (models.AddonUsageLog, models.AddonUsageDaily)
+USAGE_TABLES = tuple(model.__table__ for model in USAGE_MODELS)
+
+
+@dataclass(frozen=True)
+class SQLiteProfile:
+    """Connection pragmas and pool settings applied to every SQLite engine."""
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    mmap_size: int = 256 * 1024 * 1024
+    cache_size: int = -64000  # negative values are KiB
+    busy_timeout: int = 5000  # milliseconds
+    temp_store: str = "MEMORY"
+    pool_size: int = 5
+    max_overflow: int = 10
+    echo: bool = False
+
+
+PROFILES = {
+    # What the app used before profiles existed: rollback journal, SQLite defaults, SQL logging,
+    # and the 5 s lock wait Python's sqlite3 module applies by default
+    "legacy": SQLiteProfile(
+        journal_mode="DELETE", synchronous="FULL", mmap_size=0, cache_size=-2000,
+        busy_timeout=5000, temp_store="DEFAULT", echo=True,
+    ),
+    # WAL with full fsync on every commit
+    "safe": SQLiteProfile(synchronous="FULL"),
+    # WAL with fsync only at checkpoints; commits survive app crashes but not power loss
+    "fast": SQLiteProfile(),
+}
+
+
+def profile_from_settings(name: str | None = None) -> SQLiteProfile:
+    name = name or settings.DATABASE_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown database profile {name!r}")
+    overrides = {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "cache_size": settings.SQLITE_CACHE_SIZE,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        "temp_store": settings.SQLITE_TEMP_STORE,
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+        "echo": settings.DATABASE_ECHO,
+    }
+    return replace(
+        PROFILES[name],
+        **{name: value for name, value in overrides.items() if value is not None},
+    )
+
+
+def apply_sqlite_pragmas(engine, profile: SQLiteProfile, read_only: bool = False):
+    """Registers a connect hook on a sync engine that applies the profile's pragmas."""
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={profile.journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={profile.synchronous}")
+        cursor.execute(f"PRAGMA mmap_size={int(profile.mmap_size)}")
+        cursor.execute(f"PRAGMA cache_size={int(profile.cache_size)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(profile.busy_timeout)}")
+        cursor.execute(f"PRAGMA temp_store={profile.temp_store}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+def create_sqlite_engine(url: str, profile: SQLiteProfile):
+    engine = create_engine(
+        url,
+        echo=profile.echo,
+        pool_size=profile.pool_size,
+        max_overflow=profile.max_overflow,
+        connect_args={"check_same_thread": False},
+    )
+    apply_sqlite_pragmas(engine, profile)
+    return engine
+
+
+def create_async_sqlite_engine(url: str, profile: SQLiteProfile, read_only: bool = False):
+    engine = create_async_engine(
+        url,
+        echo=profile.echo,
+        pool_size=profile.pool_size,
+        max_overflow=profile.max_overflow,
+        connect_args={"check_same_thread": False},
+    )
+    apply_sqlite_pragmas(engine.sync_engine, profile, read_only=read_only)
+    return engine
+
 
-engine = create_engine(DATABASE_URL, echo=True, connect_args={"check_same_thread": False})
+engine_profile = profile_from_settings()
+
+DATABASE_URL = f"sqlite:///{settings.DATABASE_PATH}"
+
+engine = create_sqlite_engine(DATABASE_URL, engine_profile)
 
 # Async Database Setup
-ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./database.db"  # Using aiosqlite for async
-async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=True, connect_args={"check_same_thread": False})
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{settings.DATABASE_PATH}"  # Using aiosqlite for async
+async_engine = create_async_sqlite_engine(ASYNC_DATABASE_URL, engine_profile)
+
+# Separate pool for read-only work such as analytics, so long aggregate queries
+# don't hold connections that request handlers need for writes
+async_read_engine = create_async_sqlite_engine(ASYNC_DATABASE_URL, engine_profile, read_only=True)
+
+# Comet's scrape cache, which Comet owns and writes. Opened read-only (no
+# journal or WAL writes from us) with a small pool so we never hold its locks.
+COMET_DATABASE_URL = f"sqlite+aiosqlite:///file:{settings.COMET_DATABASE_PATH}?mode=ro&uri=true"
+comet_read_engine = create_async_engine(
+    COMET_DATABASE_URL, pool_size=2, max_overflow=0, connect_args={"check_same_thread": False}
+)
+
+
+# Addon usage events and their rollup, optionally in a database file of their
+# own so that heavy logging doesn't hold the writer lock that logins, user
+# edits and Trakt syncs need. Sessions route the usage models to these
+# engines; a commit touching both databases commits each one separately.
+if settings.USAGE_DATABASE_PATH:
+    usage_profile = profile_from_settings(settings.USAGE_DATABASE_PROFILE)
+    USAGE_DATABASE_URL = f"sqlite:///{settings.USAGE_DATABASE_PATH}"
+    ASYNC_USAGE_DATABASE_URL = f"sqlite+aiosqlite:///{settings.USAGE_DATABASE_PATH}"
+    usage_engine = create_sqlite_engine(USAGE_DATABASE_URL, usage_profile)
+    async_usage_engine = create_async_sqlite_engine(ASYNC_USAGE_DATABASE_URL, usage_profile)
+    async_usage_read_engine = create_async_sqlite_engine(ASYNC_USAGE_DATABASE_URL, usage_profile, read_only=True)
+else:
+    USAGE_DATABASE_URL = DATABASE_URL
+    usage_engine, async_usage_engine, async_usage_read_engine = engine, async_engine, async_read_engine
+
+
+@event.listens_for(comet_read_engine.sync_engine, "connect")
+def set_comet_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout={int(engine_profile.busy_timeout)}")
+    cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+_instrumented_engines = {
+    "main": (engine, async_engine.sync_engine),
+    "read": (async_read_engine.sync_engine,),
+    "comet": (comet_read_engine.sync_engine,),
+}
+if settings.USAGE_DATABASE_PATH:
+    _instrumented_engines["usage"] = (usage_engine, async_usage_engine.sync_engine)
+    _instrumented_engines["usage_read"] = (async_usage_read_engine.sync_engine,)
+for database, sync_engines in _instrumented_engines.items():
+    for sync_engine in sync_engines:
+        if settings.METRICS_ENABLED:
+            metrics.instrument_engine(sync_engine, database)
+        if settings.SLOW_QUERY_ENABLED:
+            slow_queries.instrument_engine(sync_engine, database, slow_queries.slow_query_log)
+        if settings.PROFILING_ENABLED:
+            profiling.track_engine(sync_engine)
+
 
 AsyncSessionLocal = sessionmaker(
-    bind=async_engine, class_=AsyncSession, expire_on_commit=False
+    bind=async_engine,
+    binds={model: async_usage_engine for model in USAGE_MODELS},
+    class_=AsyncSession,
+    expire_on_commit=False,
+)
+
+AsyncReadSessionLocal = sessionmaker(
+    bind=async_read_engine,
+    binds={model: async_usage_read_engine for model in USAGE_MODELS},
+    class_=AsyncSession,
+    expire_on_commit=False,
 )
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    if usage_engine is not engine:
+        SQLModel.metadata.create_all(usage_engine, tables=USAGE_TABLES)
 
 def get_db():
-    with Session(engine) as session:
+    with Session(engine, binds={model: usage_engine for model in USAGE_MODELS}) as session:
         yield session
 
 async def get_async_db() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
+
+async def get_async_read_db() -> AsyncSession:
+    async with AsyncReadSessionLocal() as session:
+        yield session
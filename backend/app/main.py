@@ -1,13 +1,59 @@
-from fastapi import FastAPI, Depends, HTTPException
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlmodel import Session
+from app.core.security import PasswordHashingBusy
 from app.database import engine
-from app.api.v1.routers import user_router, auth_router, addon_router, analytics_router
+from app.api.v1.routers import user_router, auth_router, addon_router, analytics_router, metrics_router
+from app.api.v1.routers.auth_router import get_admin_from_request
+from app.core.config import settings
+from app.core.metrics import MetricsMiddleware, metrics
+from app.core.profiling import ProfilingMiddleware
+from app.services.addon_health import addon_health
+from app.services.comet_warmer import comet_warmer
+from app.services.stream_proxy import stream_proxy
+from app.services.torbox import torbox_checker
+from app.services.trakt_client import trakt_client
+from app.services.trakt_sync import trakt_sync_engine
+from app.services.trakt_tokens import trakt_token_refresher
+from app.services.usage_log_buffer import usage_log_buffer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await metrics.start()
+    await usage_log_buffer.start()
+    if settings.ADDON_HEALTH_ENABLED:
+        await addon_health.start()
+    await stream_proxy.start()
+    await torbox_checker.start()
+    await trakt_client.start()
+    if settings.TRAKT_TOKEN_REFRESH_ENABLED:
+        await trakt_token_refresher.start()
+    if settings.TRAKT_SYNC_ENABLED:
+        await trakt_sync_engine.start()
+    if settings.COMET_WARM_ENABLED:
+        await comet_warmer.start()
+    yield
+    await comet_warmer.stop()
+    await trakt_sync_engine.stop()
+    await trakt_token_refresher.stop()
+    await trakt_client.aclose()
+    await torbox_checker.stop()
+    await stream_proxy.stop()
+    await addon_health.stop()
+    # Flush buffered usage events before the worker exits
+    await usage_log_buffer.stop()
+    await metrics.stop()
+
 
 app = FastAPI(
     title="Stremio Manager API",
     description="Manages Stremio, Trakt, and Debrid integration for users.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -17,8 +63,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
+if settings.PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        authorize=get_admin_from_request,
+        interval=settings.PROFILING_SAMPLE_INTERVAL_MS / 1000,
+    )
+
+# Outermost, so request latency includes the other middleware
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(PasswordHashingBusy)
+async def password_hashing_busy_handler(request: Request, exc: PasswordHashingBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many concurrent password operations, try again shortly"},
+        headers={"Retry-After": "1"},
+    )
+
 # @app.on_event("startup")
 # def on_startup():
 #     create_db_and_tables() # Alembic now handles table creation
@@ -27,6 +93,8 @@ app.include_router(auth_router.router, prefix="/api/v1/auth", tags=["auth"])
 app.include_router(addon_router.router, prefix="/api/v1", tags=["addons"])
 app.include_router(user_router.router, prefix="/api/v1/users", tags=["users"])
 app.include_router(analytics_router.router, prefix="/api/v1", tags=["analytics"])
+if settings.METRICS_ENABLED:
+    app.include_router(metrics_router.router, tags=["metrics"])
 
 @app.get("/")
 async def root():
@@ -1,15 +1,20 @@
 from typing import Optional, List
 from datetime import datetime
+from sqlalchemy import BigInteger, Column, Computed, Index, Integer
 from sqlmodel import Field, SQLModel, Relationship
 
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     email: str = Field(unique=True, index=True)
     hashed_password: str
-    is_admin: bool = Field(default=False)
+    is_admin: bool = Field(default=False, sa_column_kwargs={"server_default": "0"})
 
     trakt_auth: Optional["TraktUserAuth"] = Relationship(back_populates="user", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
     usage_logs: List["AddonUsageLog"] = Relationship(back_populates="user", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+    usage_daily: List["AddonUsageDaily"] = Relationship(back_populates="user", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+    trakt_sync_state: Optional["TraktSyncState"] = Relationship(back_populates="user", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+    trakt_history: List["TraktHistory"] = Relationship(back_populates="user", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+    trakt_watchlist: List["TraktWatchlist"] = Relationship(back_populates="user", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
 
 
 class TraktUserAuth(SQLModel, table=True):
@@ -22,13 +27,116 @@ class TraktUserAuth(SQLModel, table=True):
     expires_in: int
     scope: str
     created_at: int # Unix timestamp of when the token was issued
+    # Generated by SQLite from the two columns above; indexed so the refresher
+    # can find tokens close to expiry without scanning the table
+    expires_at: Optional[int] = Field(
+        default=None,
+        sa_column=Column(Integer, Computed("created_at + expires_in"), index=True),
+    )
+    # Unix timestamp until which one worker owns refreshing this token
+    refresh_claimed_until: Optional[int] = None
 
     user: Optional["User"] = Relationship(back_populates="trakt_auth")
 
 
 class AddonUsageLog(SQLModel, table=True):
+    # Keyset pagination walks (created_at, id), optionally within one user
+    __table_args__ = (
+        Index("ix_addonusagelog_created_at_id", "created_at", "id"),
+        Index("ix_addonusagelog_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="user.id", index=True)
+    user_id: int = Field(foreign_key="user.id")
+    addon: str = Field(default="unknown", sa_column_kwargs={"server_default": "unknown"})
     created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
 
     user: Optional["User"] = Relationship(back_populates="usage_logs")
+
+
+class AddonUsageDaily(SQLModel, table=True):
+    """Per-day usage counts, kept in step with AddonUsageLog as events are written."""
+    day: str = Field(primary_key=True)  # ISO date, same as SQLite's date(created_at)
+    user_id: int = Field(foreign_key="user.id", primary_key=True, index=True)
+    addon: str = Field(primary_key=True)
+    count: int = Field(default=0)
+
+    user: Optional["User"] = Relationship(back_populates="usage_daily")
+
+
+class TraktSyncState(SQLModel, table=True):
+    """
+    Per-user sync cursor: the `sync/last_activities` timestamps (as Trakt sent
+    them) that the local history and watchlist rows are current with.
+    """
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    movies_watched_at: Optional[str] = None
+    episodes_watched_at: Optional[str] = None
+    watchlist_updated_at: Optional[str] = None
+    synced_at: Optional[datetime] = Field(default=None, index=True)
+    error: Optional[str] = None
+    # Unix time until which a worker owns this user's sync; see crud.claim_trakt_sync_candidates
+    claimed_until: Optional[int] = None
+
+    user: Optional["User"] = Relationship(back_populates="trakt_sync_state")
+
+
+class TraktHistory(SQLModel, table=True):
+    """One watched movie or episode from a user's Trakt history."""
+    __table_args__ = (
+        # Recent history, and next-up lookups within a show
+        Index("ix_trakthistory_user_id_watched_at", "user_id", "watched_at"),
+        Index("ix_trakthistory_user_id_show_trakt_id_season_episode", "user_id", "show_trakt_id", "season", "episode"),
+        # Whether anyone played a media ID after it was warmed
+        Index("ix_trakthistory_imdb_id_season_episode_watched_at", "imdb_id", "season", "episode", "watched_at"),
+    )
+
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    history_id: int = Field(primary_key=True)  # Trakt's id for the play
+    media_type: str  # "movie" or "episode"
+    trakt_id: int  # the movie or episode
+    imdb_id: Optional[str] = None  # the movie, or the episode's show
+    show_trakt_id: Optional[int] = None
+    season: Optional[int] = None
+    episode: Optional[int] = None
+    watched_at: datetime
+
+    user: Optional["User"] = Relationship(back_populates="trakt_history")
+
+
+class TraktWatchlist(SQLModel, table=True):
+    """One item on a user's Trakt watchlist."""
+    __table_args__ = (
+        Index("ix_traktwatchlist_user_id_listed_at", "user_id", "listed_at"),
+    )
+
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    media_type: str = Field(primary_key=True)  # "movie", "show", "season" or "episode"
+    trakt_id: int = Field(primary_key=True)
+    imdb_id: Optional[str] = None  # the item, or its show for seasons and episodes
+    title: Optional[str] = None
+    year: Optional[int] = None
+    rank: Optional[int] = None
+    listed_at: datetime
+
+    user: Optional["User"] = Relationship(back_populates="trakt_watchlist")
+
+
+class CometWarm(SQLModel, table=True):
+    """A media ID the cache warmer asked Comet to scrape ahead of anyone playing it."""
+    media_id: str = Field(primary_key=True)  # Stremio ID, e.g. tt0944947:1:2
+    media_type: str  # "movie" or "series"
+    imdb_id: str
+    season: Optional[int] = None
+    episode: Optional[int] = None
+    warmed_at: datetime = Field(index=True)
+    ok: bool = Field(default=False)  # whether Comet answered the request
+
+
+class TorboxAvailability(SQLModel, table=True):
+    """Whether TorBox had a torrent cached when we last asked, shared by all users."""
+    info_hash: str = Field(primary_key=True)  # lowercase hex
+    cached: bool
+    name: Optional[str] = None
+    size: Optional[int] = Field(default=None, sa_column=Column(BigInteger))
+    checked_at: datetime
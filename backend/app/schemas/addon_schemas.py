@@ -1,5 +1,6 @@
 from datetime import datetime
-from pydantic import BaseModel, HttpUrl
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field, HttpUrl
 
 
 class TorrentioInstallationUrlResponse(BaseModel):
@@ -13,7 +14,43 @@ class AIOStreamsInstallationUrlResponse(BaseModel):
 class AddonUsageLog(BaseModel):
     id: int
     user_id: int
+    addon: str
     created_at: datetime
 
     class Config:
         from_attributes = True
+
+
+class StreamProxyInstallationUrlResponse(BaseModel):
+    installation_url: str # Stremio URLs are custom scheme, not HttpUrl
+
+
+class StremioStreamsResponse(BaseModel):
+    streams: List[Dict[str, Any]]
+    cacheMaxAge: int
+
+
+class AddonHealthStatus(BaseModel):
+    name: str
+    manifest_url: str
+    healthy: bool
+    circuit: str
+    status_code: Optional[int] = None
+    latency_ms: Optional[float] = None
+    error: Optional[str] = None
+    checked_at: datetime
+
+
+class TorboxCheckRequest(BaseModel):
+    hashes: List[str] = Field(min_length=1, max_length=1000)
+
+
+class TorboxHashAvailability(BaseModel):
+    cached: Optional[bool] = None  # None if TorBox couldn't be asked
+    name: Optional[str] = None
+    size: Optional[int] = None
+    from_cache: bool
+
+
+class TorboxCheckResponse(BaseModel):
+    results: Dict[str, TorboxHashAvailability]
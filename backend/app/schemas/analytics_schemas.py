@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import List, Dict
+from datetime import datetime
+from typing import Any, List, Dict, Optional
 
 class UsageByDay(BaseModel):
     date: str
@@ -14,3 +15,112 @@ class AnalyticsStats(BaseModel):
     total_addon_usage: int
     usage_by_day: List[UsageByDay]
     most_active_users: List[ActiveUser]
+
+class CometTableAges(BaseModel):
+    buckets: Dict[str, int]  # rows younger than 1h, 1d, 7d and 30d (cumulative)
+    older: int
+    stale: int
+    oldest_age_seconds: Optional[int] = None
+
+class CometDebridCoverage(BaseModel):
+    unique_torrents: int
+    with_debrid_availability: int
+    ratio: Optional[float] = None
+
+class CometTopMedia(BaseModel):
+    media_id: str
+    torrents: int
+    last_scraped: Optional[int] = None
+
+class CometStats(BaseModel):
+    size_bytes: int
+    free_bytes: int
+    row_counts: Dict[str, int]
+    ages: Dict[str, CometTableAges]
+    debrid_coverage: Optional[CometDebridCoverage] = None
+    top_media: List[CometTopMedia]
+
+class UsageQueueStats(BaseModel):
+    queue_depth: int
+    enqueued: int
+    written: int
+    dropped: int
+    failed: int
+    batches: int
+
+class CacheStats(BaseModel):
+    size: int
+    hits: int
+    misses: int
+    maxsize: Optional[int] = None
+    evictions: int = 0
+    stale_hits: int = 0
+    refreshes: int = 0
+    generation_resets: int = 0
+
+class TraktEndpointStats(BaseModel):
+    requests: int
+    errors: int
+    not_modified: int
+    avg_ms: float
+    total_ms: float
+    max_ms: float
+
+class StreamUpstreamStats(BaseModel):
+    requests: int
+    errors: int
+    timeouts: int
+    avg_ms: float
+
+class StreamProxyStats(BaseModel):
+    coalesced: int
+    upstreams: Dict[str, StreamUpstreamStats]
+
+class CometWarmerStats(BaseModel):
+    predicted: int
+    already_cached: int
+    warmed: int
+    failed: int
+    # From CometWarm/TraktHistory over the last 7 days, across all workers
+    warmed_last_7_days: int
+    played_last_7_days: int
+    hit_rate: Optional[float] = None
+
+class TorboxCheckerStats(BaseModel):
+    requests: int
+    failed_requests: int
+    cache_hits: int
+    cache_misses: int
+
+class TraktSyncStats(BaseModel):
+    synced: int
+    unchanged: int
+    failed: int
+    history_rows: int
+
+class TraktClientStats(BaseModel):
+    rate_limited: int
+    coalesced: int
+    endpoints: Dict[str, TraktEndpointStats]
+
+class SlowQuery(BaseModel):
+    shape: str
+    database: str
+    count: int
+    total_ms: float
+    mean_ms: float
+    max_ms: float
+    routes: Dict[str, int]
+    parameters: Optional[Any] = None  # redacted, from the slowest execution
+    plan: Optional[List[str]] = None
+    full_scan: Optional[bool] = None
+    last_seen: datetime
+
+class SlowQueryReport(BaseModel):
+    threshold_ms: float
+    recorded: int
+    buffered: int
+    maxsize: int
+    workers: int
+    pid: int
+    queries: List[SlowQuery]
@@ -31,3 +31,9 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: str | None = None
+
+
+class TraktSyncResult(BaseModel):
+    user_id: int
+    history_rows: int
+    watchlist_items: Optional[int] = None  # None when the watchlist was unchanged
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.config import settings
+from app.services.addon_profiles import addon_profiles, aiostreams_addons
+
+logger = logging.getLogger(__name__)
+
+
+def probe_targets() -> list[dict[str, str]]:
+    """Every external addon manifest we hand out, as {"name", "manifestUrl"} dicts."""
+    return [
+        *aiostreams_addons(),
+        {"name": "Torrentio", "manifestUrl": f"{settings.TORRENTIO_BASE_URL.rstrip('/')}/manifest.json"},
+    ]
+
+
+class AddonHealthProber:
+    """
+    Periodically fetches every configured addon manifest concurrently through
+    one pooled HTTP client and keeps the latest status and latency per addon.
+
+    Each addon has a circuit breaker. Addons whose circuit is open are not
+    probed again until the reset timeout passes, and (when enabled) are left
+    out of generated installation URLs until a probe succeeds.
+    """
+
+    def __init__(
+        self,
+        targets=probe_targets,
+        interval: float = 60.0,
+        timeout: float = 5.0,
+        failure_threshold: int = 3,
+        reset_timeout: float = 300.0,
+        exclude_unhealthy: bool = True,
+    ):
+        self.targets = targets
+        self.interval = interval
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.exclude_unhealthy = exclude_unhealthy
+
+        self._client: httpx.AsyncClient | None = None
+        self._task: asyncio.Task | None = None
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._statuses: dict[str, dict] = {}
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            follow_redirects=True,
+        )
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception:
+                logger.exception("Addon health probe round failed")
+            await asyncio.sleep(self.interval)
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        if name not in self._breakers:
+            self._breakers[name] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return self._breakers[name]
+
+    async def probe_all(self):
+        await asyncio.gather(*(self.probe(target["name"], target["manifestUrl"]) for target in self.targets()))
+        if self.exclude_unhealthy:
+            addon_profiles.set_excluded_addons(self.unavailable())
+
+    async def probe(self, name: str, manifest_url: str):
+        breaker = self.breaker(name)
+        status = {
+            "name": name,
+            "manifest_url": manifest_url,
+            "healthy": False,
+            "status_code": None,
+            "latency_ms": None,
+            "error": None,
+            "checked_at": datetime.now(timezone.utc),
+        }
+        if not breaker.allow():
+            previous = self._statuses.get(name, status)
+            self._statuses[name] = {**previous, "circuit": breaker.state}
+            return
+
+        start = time.perf_counter()
+        try:
+            response = await self._client.get(manifest_url)
+            status["status_code"] = response.status_code
+            response.raise_for_status()
+            if "id" not in response.json():
+                raise ValueError("Response is not a Stremio manifest")
+            status["healthy"] = True
+            breaker.record_success()
+        except Exception as e:
+            status["error"] = str(e) or type(e).__name__
+            breaker.record_failure()
+        status["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        status["circuit"] = breaker.state
+        self._statuses[name] = status
+
+    def is_available(self, name: str) -> bool:
+        return self.breaker(name).allow()
+
+    def unavailable(self) -> frozenset[str]:
+        # Half-open addons stay excluded until a probe succeeds
+        return frozenset(
+            name for name, breaker in self._breakers.items() if breaker.state != CircuitBreaker.CLOSED
+        )
+
+    def statuses(self) -> list[dict]:
+        return [self._statuses[target["name"]] for target in self.targets() if target["name"] in self._statuses]
+
+
+addon_health = AddonHealthProber(
+    interval=settings.ADDON_HEALTH_INTERVAL_SECONDS,
+    timeout=settings.ADDON_HEALTH_TIMEOUT_SECONDS,
+    failure_threshold=settings.ADDON_HEALTH_FAILURE_THRESHOLD,
+    reset_timeout=settings.ADDON_HEALTH_RESET_SECONDS,
+    exclude_unhealthy=settings.ADDON_HEALTH_EXCLUDE_UNHEALTHY,
+)
@@ -0,0 +1,113 @@
+import base64
+import json
+from dataclasses import dataclass
+from typing import Callable
+from urllib.parse import urlparse
+
+from app.core.config import settings
+from app.core.generations import generations
+from app.core.http_cache import make_etag
+
+
+@dataclass(frozen=True)
+class AddonProfile:
+    """
+    How to build one addon's Stremio installation URL. `settings_keys` lists
+    every setting `build` reads, so the registry knows when to rebuild. `build`
+    receives the names of addons that are currently excluded as unhealthy.
+    """
+    name: str
+    settings_keys: tuple[str, ...]
+    build: Callable[[frozenset[str]], str]
+
+
+@dataclass(frozen=True)
+class CompiledInstallationUrl:
+    installation_url: str
+    body: bytes  # serialized `{"installation_url": ...}` response
+    etag: str
+
+
+class AddonProfileRegistry:
+    """
+    Compiles each profile's installation URL once and memoizes it until one of
+    the settings it depends on, the profile definitions themselves, or the set
+    of excluded addons change, or any worker bumps the "addon_profiles" generation.
+    """
+
+    def __init__(self):
+        self._profiles: dict[str, AddonProfile] = {}
+        self._compiled: dict[str, tuple[tuple, CompiledInstallationUrl]] = {}
+        self._revision = 0
+        self.excluded_addons: frozenset[str] = frozenset()
+
+    def register(self, profile: AddonProfile):
+        self._profiles[profile.name] = profile
+        self._revision += 1
+
+    def set_excluded_addons(self, names: frozenset[str]):
+        """Leaves these addons out of generated URLs, e.g. while they are unhealthy."""
+        self.excluded_addons = frozenset(names)
+
+    def version(self, name: str) -> tuple:
+        profile = self._profiles[name]
+        return (
+            self._revision,
+            generations.value("addon_profiles"),
+            self.excluded_addons,
+            *(getattr(settings, key) for key in profile.settings_keys),
+        )
+
+    def get(self, name: str) -> CompiledInstallationUrl:
+        version = self.version(name)
+        cached = self._compiled.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        installation_url = self._profiles[name].build(self.excluded_addons)
+        body = json.dumps({"installation_url": installation_url}).encode()
+        compiled = CompiledInstallationUrl(installation_url=installation_url, body=body, etag=make_etag(body))
+        self._compiled[name] = (version, compiled)
+        return compiled
+
+
+def build_torrentio_installation_url(excluded: frozenset[str]) -> str:
+    hostname = urlparse(settings.TORRENTIO_BASE_URL).netloc
+    # Format: stremio://<hostname>/<config>/manifest.json
+    return f"stremio://{hostname}/torbox={settings.TORBOX_API_KEY}/manifest.json"
+
+
+def aiostreams_addons() -> list[dict[str, str]]:
+    """The addons bundled into the AIOStreams configuration, in priority order."""
+    return [
+        # Our self-hosted Comet instance
+        {"name": "Comet (Self-Hosted)", "manifestUrl": settings.COMET_MANIFEST_URL},
+        # AIOLists for curated content
+        {"name": "AIOLists", "manifestUrl": "https://aiolists.dexter21767.workers.dev/manifest.json"},
+        # OpenSubtitles for subtitles
+        {"name": "OpenSubtitles", "manifestUrl": "https://opensubtitlesv3-pro.dexter21767.com/manifest.json"},
+        # USA TV for live TV streams
+        {"name": "USA TV", "manifestUrl": "https://usa-tv.dexter21767.workers.dev/manifest.json"},
+    ]
+
+
+def build_aiostreams_installation_url(excluded: frozenset[str]) -> str:
+    addons = [addon for addon in aiostreams_addons() if addon["name"] not in excluded]
+    # Never hand out an empty bundle; if everything looks down, include everything
+    config = {"addons": addons or aiostreams_addons()}
+    # The AIOStreams config travels base64-encoded in the manifest path
+    encoded_config = base64.b64encode(json.dumps(config).encode()).decode()
+    return f"stremio://{settings.AIOSTREAMS_HOST}/{encoded_config}/manifest.json"
+
+
+addon_profiles = AddonProfileRegistry()
+addon_profiles.register(AddonProfile(
+    name="torrentio",
+    settings_keys=("TORRENTIO_BASE_URL", "TORBOX_API_KEY"),
+    build=build_torrentio_installation_url,
+))
+addon_profiles.register(AddonProfile(
+    name="aiostreams",
+    settings_keys=("COMET_MANIFEST_URL", "AIOSTREAMS_HOST"),
+    build=build_aiostreams_installation_url,
+))
@@ -0,0 +1,135 @@
+import time
+
+from sqlalchemy import bindparam, text
+
+from app.database import comet_read_engine
+
+
+def parse_media_id(media_id: str) -> tuple[str, int | None, int | None]:
+    """Splits a Stremio ID (`tt...` or `tt...:season:episode`) into its parts."""
+    imdb_id, _, rest = media_id.partition(":")
+    if not rest:
+        return imdb_id, None, None
+    season, _, episode = rest.partition(":")
+    return imdb_id, int(season), int(episode)
+
+
+# Each lookup repeats the WHERE clause of one of Comet's partial indexes on
+# torrents so SQLite can use it instead of scanning the table
+_SERIES_TORRENTS = text(
+    "SELECT DISTINCT media_id, season, episode FROM torrents "
+    "WHERE media_id IN :imdb_ids AND season IS NOT NULL AND episode IS NOT NULL"
+).bindparams(bindparam("imdb_ids", expanding=True))
+_MOVIE_TORRENTS = text(
+    "SELECT DISTINCT media_id FROM torrents "
+    "WHERE media_id IN :imdb_ids AND season IS NULL AND episode IS NULL"
+).bindparams(bindparam("imdb_ids", expanding=True))
+_FIRST_SEARCHES = text(
+    "SELECT media_id FROM first_searches WHERE media_id IN :media_ids"
+).bindparams(bindparam("media_ids", expanding=True))
+
+
+async def get_cached_media_ids(media_ids: list[str]) -> set[str]:
+    """
+    The subset of these Stremio IDs Comet already has results for: it has
+    searched them before or holds torrents for that movie or episode.
+    """
+    if not media_ids:
+        return set()
+    parsed = {media_id: parse_media_id(media_id) for media_id in media_ids}
+    series_imdb_ids = sorted({imdb for imdb, season, _ in parsed.values() if season is not None})
+    movie_imdb_ids = sorted({imdb for imdb, season, _ in parsed.values() if season is None})
+
+    async with comet_read_engine.connect() as conn:
+        cached = set((await conn.execute(_FIRST_SEARCHES, {"media_ids": list(parsed)})).scalars())
+        if series_imdb_ids:
+            episodes = await conn.execute(_SERIES_TORRENTS, {"imdb_ids": series_imdb_ids})
+            cached.update(f"{imdb}:{season}:{episode}" for imdb, season, episode in episodes)
+        if movie_imdb_ids:
+            cached.update((await conn.execute(_MOVIE_TORRENTS, {"imdb_ids": movie_imdb_ids})).scalars())
+    return cached & set(parsed)
+
+
+# Tables Comet keeps cached results in, and the ones with a `timestamp` column
+COMET_TABLES = (
+    "torrents", "debrid_availability", "download_links_cache", "metadata_cache",
+    "first_searches", "ongoing_searches", "scrape_locks", "active_connections",
+)
+TIMESTAMPED_TABLES = ("torrents", "debrid_availability", "download_links_cache", "metadata_cache", "first_searches")
+
+AGE_BUCKETS = (("1h", 3600), ("1d", 86400), ("7d", 7 * 86400), ("30d", 30 * 86400))
+
+
+async def get_comet_stats(stale_after: int, top_media_limit: int = 20) -> dict:
+    """
+    Aggregate statistics over Comet's cache database: file size, row counts,
+    age distribution per table, how many cached torrents have debrid
+    availability recorded, and the media IDs with the most torrents.
+
+    Everything is aggregated inside SQLite, so memory use doesn't grow with
+    the size of Comet's cache.
+    """
+    now = int(time.time())
+    # The driver runs each SELECT in its own implicit read transaction, so
+    # Comet's writers are only ever waiting on one statement at a time
+    async with comet_read_engine.connect() as conn:
+        existing = set((await conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))).scalars())
+        page_size = (await conn.execute(text("PRAGMA page_size"))).scalar()
+        page_count = (await conn.execute(text("PRAGMA page_count"))).scalar()
+        freelist_count = (await conn.execute(text("PRAGMA freelist_count"))).scalar()
+
+        row_counts = {}
+        for table in COMET_TABLES:
+            if table in existing:
+                row_counts[table] = (await conn.execute(text(f"SELECT count(*) FROM {table}"))).scalar()
+
+        # One pass per table: rows younger than each bucket's limit, plus stale rows
+        bucket_columns = ", ".join(
+            f"coalesce(sum(timestamp >= {now - seconds}), 0) AS age_{name}" for name, seconds in AGE_BUCKETS
+        )
+        ages = {}
+        for table in TIMESTAMPED_TABLES:
+            if table not in existing:
+                continue
+            row = (await conn.execute(text(
+                f"SELECT count(*) AS total, {bucket_columns}, "
+                f"coalesce(sum(timestamp < {now - stale_after}), 0) AS stale, min(timestamp) AS oldest "
+                f"FROM {table}"
+            ))).mappings().one()
+            ages[table] = {
+                "buckets": {name: row[f"age_{name}"] for name, _ in AGE_BUCKETS},
+                "older": row["total"] - row[f"age_{AGE_BUCKETS[-1][0]}"],
+                "stale": row["stale"],
+                "oldest_age_seconds": now - row["oldest"] if row["oldest"] is not None else None,
+            }
+
+        debrid_coverage = None
+        top_media = []
+        if "torrents" in existing:
+            if "debrid_availability" in existing:
+                # SQLite builds a temporary index over the IN subquery once
+                coverage = (await conn.execute(text(
+                    "SELECT count(*) AS torrents, coalesce(sum(info_hash IN "
+                    "(SELECT info_hash FROM debrid_availability)), 0) AS available "
+                    "FROM (SELECT DISTINCT info_hash FROM torrents)"
+                ))).mappings().one()
+                debrid_coverage = {
+                    "unique_torrents": coverage["torrents"],
+                    "with_debrid_availability": coverage["available"],
+                    "ratio": round(coverage["available"] / coverage["torrents"], 4) if coverage["torrents"] else None,
+                }
+            top_media = [
+                dict(row) for row in (await conn.execute(text(
+                    "SELECT media_id, count(*) AS torrents, max(timestamp) AS last_scraped "
+                    "FROM torrents GROUP BY media_id ORDER BY torrents DESC LIMIT :limit"
+                ), {"limit": top_media_limit})).mappings()
+            ]
+
+    return {
+        "size_bytes": page_size * page_count,
+        "free_bytes": page_size * freelist_count,
+        "row_counts": row_counts,
+        "ages": ages,
+        "debrid_coverage": debrid_coverage,
+        "top_media": top_media,
+    }
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import crud
+from app.core.config import settings
+from app.database import AsyncSessionLocal
+from app.services.addon_health import addon_health
+from app.services.comet_cache import get_cached_media_ids, parse_media_id
+
+logger = logging.getLogger(__name__)
+
+COMET_ADDON_NAME = "Comet (Self-Hosted)"
+
+
+class CometCacheWarmer:
+    """
+    Background task that fills Comet's cache before users press play.
+
+    Every `interval` seconds it predicts likely next plays from the synced
+    Trakt tables (the episode after each user's latest watched episode, and
+    movies/shows recently added to watchlists), drops the ones Comet already
+    has in its cache database, and requests the rest from Comet's stream
+    endpoint with at most `concurrency` requests in flight.
+
+    Warms are recorded in CometWarm, which keeps other workers from warming
+    the same ID and lets `hit_rate()` count how many warmed IDs were played.
+    """
+
+    def __init__(
+        self,
+        interval: float = 1800.0,
+        concurrency: int = 2,
+        max_per_run: int = 200,
+        lookback_days: int = 30,
+        timeout: float = 60.0,
+        rewarm_after: int = 7 * 86400,
+        session_factory=AsyncSessionLocal,
+        cached_media_ids=get_cached_media_ids,
+    ):
+        self.interval = interval
+        self.concurrency = concurrency
+        self.max_per_run = max_per_run
+        self.lookback_days = lookback_days
+        self.timeout = timeout
+        self.rewarm_after = rewarm_after
+        self.session_factory = session_factory
+        self.cached_media_ids = cached_media_ids
+
+        self._client: httpx.AsyncClient | None = None
+        self._task: asyncio.Task | None = None
+
+        self.predicted = 0
+        self.already_cached = 0
+        self.warmed = 0
+        self.failed = 0
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout),
+            limits=httpx.Limits(max_connections=self.concurrency),
+            follow_redirects=True,
+        )
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Comet cache warming run failed")
+            await asyncio.sleep(self.interval)
+
+    async def predict(self) -> list[tuple[str, str]]:
+        """Likely next plays as (media_type, Stremio ID), most widely shared first."""
+        since = datetime.utcnow() - timedelta(days=self.lookback_days)
+        async with self.session_factory() as db:
+            next_up = await crud.get_next_up_episodes(db, since, limit=self.max_per_run)
+            watchlist = await crud.get_recent_watchlist_items(db, since, limit=self.max_per_run)
+
+        candidates = [
+            (row.viewers, "series", f"{row.imdb_id}:{row.season}:{row.episode + 1}") for row in next_up
+        ] + [
+            (row.viewers, "movie", row.imdb_id) if row.media_type == "movie"
+            else (row.viewers, "series", f"{row.imdb_id}:1:1")
+            for row in watchlist
+        ]
+        candidates.sort(key=lambda candidate: -candidate[0])
+        predictions = list({media_id: (media_type, media_id) for _, media_type, media_id in candidates}.values())
+        return predictions[:self.max_per_run]
+
+    async def run_once(self) -> int:
+        """Warms every predicted ID Comet doesn't have yet. Returns how many were warmed."""
+        if settings.ADDON_HEALTH_ENABLED and not addon_health.is_available(COMET_ADDON_NAME):
+            logger.info("Skipping Comet cache warming while Comet is unhealthy")
+            return 0
+
+        predictions = await self.predict()
+        self.predicted += len(predictions)
+        try:
+            cached = await self.cached_media_ids([media_id for _, media_id in predictions])
+        except SQLAlchemyError as e:
+            # Without Comet's database we can't tell what's cached; warming everything would hammer it
+            logger.warning("Can't read Comet's cache database, skipping warming: %s", e)
+            return 0
+        self.already_cached += len(cached)
+
+        now = datetime.utcnow()
+        rows = []
+        for media_type, media_id in predictions:
+            if media_id in cached:
+                continue
+            imdb_id, season, episode = parse_media_id(media_id)
+            rows.append({
+                "media_id": media_id,
+                "media_type": media_type,
+                "imdb_id": imdb_id,
+                "season": season,
+                "episode": episode,
+                "warmed_at": now,
+                "ok": False,
+            })
+        async with self.session_factory() as db:
+            claimed = await crud.claim_comet_warms(db, rows, now - timedelta(seconds=self.rewarm_after))
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def warm(media_type: str, media_id: str) -> str | None:
+            async with semaphore:
+                return media_id if await self.warm(media_type, media_id) else None
+
+        results = await asyncio.gather(*(
+            warm(row["media_type"], row["media_id"]) for row in rows if row["media_id"] in claimed
+        ))
+        warmed = [media_id for media_id in results if media_id]
+        async with self.session_factory() as db:
+            await crud.mark_comet_warms_ok(db, warmed)
+        return len(warmed)
+
+    async def warm(self, media_type: str, media_id: str) -> bool:
+        base_url = settings.COMET_MANIFEST_URL.removesuffix("/manifest.json")
+        try:
+            response = await self._client.get(f"{base_url}/stream/{media_type}/{media_id}.json")
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            self.failed += 1
+            logger.warning("Warming %s on Comet failed: %s", media_id, type(e).__name__)
+            return False
+        self.warmed += 1
+        return True
+
+    async def hit_rate(self, days: int = 7) -> dict:
+        """How many IDs warmed in the last `days` days were played afterwards."""
+        async with self.session_factory() as db:
+            result = await crud.get_comet_warm_hit_rate(db, datetime.utcnow() - timedelta(days=days))
+        return {**result, "hit_rate": round(result["played"] / result["warmed"], 4) if result["warmed"] else None}
+
+    def stats(self) -> dict:
+        return {
+            "predicted": self.predicted,
+            "already_cached": self.already_cached,
+            "warmed": self.warmed,
+            "failed": self.failed,
+        }
+
+
+comet_warmer = CometCacheWarmer(
+    interval=settings.COMET_WARM_INTERVAL_SECONDS,
+    concurrency=settings.COMET_WARM_CONCURRENCY,
+    max_per_run=settings.COMET_WARM_MAX_PER_RUN,
+    lookback_days=settings.COMET_WARM_LOOKBACK_DAYS,
+    timeout=settings.COMET_WARM_TIMEOUT_SECONDS,
+    rewarm_after=settings.COMET_WARM_REWARM_SECONDS,
+)
@@ -0,0 +1,205 @@
+import asyncio
+import json
+import logging
+import re
+import time
+
+import httpx
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.services.addon_health import addon_health
+
+logger = logging.getLogger(__name__)
+
+_INFO_HASH = re.compile(r"(?<![0-9a-fA-F])[0-9a-fA-F]{40}(?![0-9a-fA-F])")
+
+
+STREAM_PROXY_MANIFEST = {
+    "id": "org.stremiomanager.streams",
+    "version": "1.0.0",
+    "name": "Stremio Manager Streams",
+    "description": "Streams from our Comet instance and Torrentio, merged and cached.",
+    "resources": ["stream"],
+    "types": ["movie", "series"],
+    "idPrefixes": ["tt"],
+    "catalogs": [],
+}
+
+
+def stream_upstreams() -> list[dict]:
+    """The addons stream lookups fan out to, in priority order, with their timeouts."""
+    return [
+        {
+            "name": "Comet (Self-Hosted)",
+            "manifestUrl": settings.COMET_MANIFEST_URL,
+            "timeout": settings.STREAM_PROXY_COMET_TIMEOUT_SECONDS,
+        },
+        {
+            # Same name as the health prober's target so its circuit breaker applies
+            "name": "Torrentio",
+            "manifestUrl": f"{settings.TORRENTIO_BASE_URL.rstrip('/')}/torbox={settings.TORBOX_API_KEY}/manifest.json",
+            "timeout": settings.STREAM_PROXY_TIMEOUT_SECONDS,
+        },
+    ]
+
+
+def stream_key(stream: dict) -> str | None:
+    """
+    Identity of a stream for de-duplication: its torrent info hash (and file
+    index) when the addon reports one or embeds one in a debrid URL,
+    otherwise its URL.
+    """
+    if not isinstance(stream, dict):
+        return None
+    info_hash = stream.get("infoHash")
+    if not isinstance(info_hash, str):
+        info_hash = None
+    if not info_hash and isinstance(stream.get("url"), str):
+        match = _INFO_HASH.search(stream["url"])
+        info_hash = match.group(0) if match else None
+    if info_hash:
+        return f"{info_hash.lower()}:{stream.get('fileIdx', '')}"
+    for field in ("url", "externalUrl", "ytId"):
+        if stream.get(field):
+            return str(stream[field])
+    return None
+
+
+def merge_streams(results: list[list[dict]]) -> list[dict]:
+    """
+    Concatenates per-upstream stream lists in priority order, keeping the first
+    copy of each stream. Entries that aren't objects are dropped.
+    """
+    seen: set[str] = set()
+    merged = []
+    for streams in results:
+        for stream in streams:
+            if not isinstance(stream, dict):
+                continue
+            key = stream_key(stream)
+            if key is not None:
+                if key in seen:
+                    continue
+                seen.add(key)
+            merged.append(stream)
+    return merged
+
+
+class StreamProxy:
+    """
+    Resolves Stremio stream requests by querying every upstream addon
+    concurrently, each with its own timeout, and merging the answers.
+
+    Merged results are cached per media ID for `ttl` seconds in a bounded LRU
+    cache, and concurrent lookups for the same ID share one upstream fetch.
+    Upstreams whose health circuit is open are skipped. Results where every
+    upstream failed are not cached.
+    """
+
+    def __init__(self, upstreams=stream_upstreams, ttl: float = 900.0, maxsize: int = 5000):
+        self.upstreams = upstreams
+        self.ttl = ttl
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+        self._client: httpx.AsyncClient | None = None
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._upstream_stats: dict[str, dict] = {}
+
+        self.coalesced = 0
+
+    async def start(self):
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            follow_redirects=True,
+        )
+
+    async def stop(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get_streams(self, media_type: str, media_id: str) -> bytes:
+        """Returns the serialized `{"streams": [...]}` response for a media ID."""
+        key = f"{media_type}/{media_id}"
+        body = self.cache.get(key)
+        if body is not None:
+            return body
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.create_task(self._resolve(key, media_type, media_id))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _resolve(self, key: str, media_type: str, media_id: str) -> bytes:
+        upstreams = [
+            upstream for upstream in self.upstreams()
+            if not settings.ADDON_HEALTH_ENABLED or addon_health.is_available(upstream["name"])
+        ]
+        results = await asyncio.gather(*(self._fetch(upstream, media_type, media_id) for upstream in upstreams))
+        streams = merge_streams([result for result in results if result is not None])
+        body = json.dumps({"streams": streams, "cacheMaxAge": int(self.ttl)}).encode()
+        if any(result is not None for result in results):
+            self.cache.set(key, body)
+        return body
+
+    async def _fetch(self, upstream: dict, media_type: str, media_id: str) -> list[dict] | None:
+        if self._client is None:
+            raise RuntimeError("StreamProxy used before start()")
+        base_url = upstream["manifestUrl"].removesuffix("/manifest.json")
+        stats = self._stats(upstream["name"])
+        start = time.perf_counter()
+        try:
+            response = await self._client.get(
+                f"{base_url}/stream/{media_type}/{media_id}.json", timeout=upstream["timeout"]
+            )
+            response.raise_for_status()
+            streams = response.json().get("streams", [])
+            if not isinstance(streams, list):
+                raise ValueError("streams is not a list")
+            return streams
+        except httpx.TimeoutException:
+            stats["timeouts"] += 1
+        except httpx.HTTPStatusError as e:
+            # Not logging the exception itself: its message has the URL, which can carry an API key
+            stats["errors"] += 1
+            logger.warning("Stream lookup for %s on %s returned %s", media_id, upstream["name"], e.response.status_code)
+        except (httpx.HTTPError, ValueError, AttributeError) as e:
+            stats["errors"] += 1
+            logger.warning("Stream lookup for %s on %s failed: %s", media_id, upstream["name"], type(e).__name__)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            stats["requests"] += 1
+            stats["total_ms"] += elapsed_ms
+        return None
+
+    def _stats(self, name: str) -> dict:
+        if name not in self._upstream_stats:
+            self._upstream_stats[name] = {"requests": 0, "errors": 0, "timeouts": 0, "total_ms": 0.0}
+        return self._upstream_stats[name]
+
+    def stats(self) -> dict:
+        return {
+            "coalesced": self.coalesced,
+            "upstreams": {
+                name: {
+                    "requests": values["requests"],
+                    "errors": values["errors"],
+                    "timeouts": values["timeouts"],
+                    "avg_ms": round(values["total_ms"] / values["requests"], 2) if values["requests"] else 0.0,
+                }
+                for name, values in self._upstream_stats.items()
+            },
+        }
+
+
+stream_proxy = StreamProxy(
+    ttl=settings.STREAM_PROXY_CACHE_TTL_SECONDS,
+    maxsize=settings.STREAM_PROXY_CACHE_MAXSIZE,
+)
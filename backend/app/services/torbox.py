@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta
+
+import httpx
+
+from app import crud
+from app.core.config import settings
+from app.core.rate_limit import TokenBucket
+from app.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+_INFO_HASH = re.compile(r"^[0-9a-f]{40}$")
+
+
+class TorboxAvailabilityChecker:
+    """
+    Answers "is this torrent cached on TorBox?" for many info hashes at once.
+
+    Hashes with a fresh answer in the TorboxAvailability table are served from
+    there. The rest are split into batches of `batch_size` and sent to
+    TorBox's checkcached endpoint with at most `concurrency` requests in
+    flight, all drawing from one token bucket for the shared API key. Answers
+    are stored for every caller; hashes whose batch failed are reported as
+    unknown and not stored.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        batch_size: int = 100,
+        rate: float = 5.0,
+        concurrency: int = 4,
+        ttl: int = 6 * 3600,
+        negative_ttl: int = 3600,
+        session_factory=AsyncSessionLocal,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.session_factory = session_factory
+
+        self._client: httpx.AsyncClient | None = None
+        self._bucket = TokenBucket(rate=rate, capacity=max(1.0, rate))
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+        self.requests = 0
+        self.failed_requests = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    async def start(self):
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(15.0),
+            limits=httpx.Limits(max_connections=self.concurrency),
+            headers={"Authorization": f"Bearer {self.api_key}"},
+        )
+
+    async def stop(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def normalize(info_hashes: list[str]) -> list[str]:
+        """Lowercases and de-duplicates hashes, preserving order. Raises ValueError on anything that isn't a v1 info hash."""
+        normalized = list(dict.fromkeys(info_hash.strip().lower() for info_hash in info_hashes))
+        invalid = [info_hash for info_hash in normalized if not _INFO_HASH.match(info_hash)]
+        if invalid:
+            raise ValueError(f"Invalid info hashes: {', '.join(invalid[:5])}")
+        return normalized
+
+    async def check(self, info_hashes: list[str]) -> dict[str, dict]:
+        """
+        Returns {info_hash: {"cached", "name", "size", "from_cache"}} for every
+        requested hash; "cached" is None when TorBox couldn't be asked.
+        """
+        info_hashes = self.normalize(info_hashes)
+        now = datetime.utcnow()
+        async with self.session_factory() as db:
+            stored = await crud.get_torbox_availability(
+                db,
+                info_hashes,
+                cached_since=now - timedelta(seconds=self.ttl),
+                uncached_since=now - timedelta(seconds=self.negative_ttl),
+            )
+        results = {
+            row.info_hash: {"cached": row.cached, "name": row.name, "size": row.size, "from_cache": True}
+            for row in stored
+        }
+        missing = [info_hash for info_hash in info_hashes if info_hash not in results]
+        self.cache_hits += len(results)
+        self.cache_misses += len(missing)
+
+        batches = [missing[start:start + self.batch_size] for start in range(0, len(missing), self.batch_size)]
+        answers = await asyncio.gather(*(self._check_batch(batch) for batch in batches))
+
+        rows = []
+        for batch, answer in zip(batches, answers):
+            for info_hash in batch:
+                if answer is None:
+                    results[info_hash] = {"cached": None, "name": None, "size": None, "from_cache": False}
+                    continue
+                item = answer.get(info_hash, {})
+                row = {
+                    "info_hash": info_hash,
+                    "cached": info_hash in answer,
+                    "name": item.get("name"),
+                    "size": item.get("size"),
+                    "checked_at": now,
+                }
+                rows.append(row)
+                results[info_hash] = {"cached": row["cached"], "name": row["name"], "size": row["size"], "from_cache": False}
+        async with self.session_factory() as db:
+            await crud.upsert_torbox_availability(db, rows)
+
+        return {info_hash: results[info_hash] for info_hash in info_hashes}
+
+    async def _check_batch(self, batch: list[str]) -> dict[str, dict] | None:
+        """The cached hashes of one batch, keyed by lowercase hash, or None if the request failed."""
+        if self._client is None:
+            raise RuntimeError("TorboxAvailabilityChecker used before start()")
+        async with self._semaphore:
+            await self._bucket.acquire()
+            self.requests += 1
+            try:
+                response = await self._client.post(
+                    "/torrents/checkcached",
+                    params={"format": "object", "list_files": "false"},
+                    json={"hashes": batch},
+                )
+                response.raise_for_status()
+                data = response.json().get("data") or {}
+                if isinstance(data, list):
+                    data = {item["hash"]: item for item in data if isinstance(item, dict)}
+                # A cached hash may come back without details (e.g. a bare `true`)
+                return {info_hash.lower(): item if isinstance(item, dict) else {} for info_hash, item in data.items()}
+            except (httpx.HTTPError, ValueError, AttributeError, KeyError, TypeError) as e:
+                # The exception text can include the request URL but never the key, which travels in a header
+                self.failed_requests += 1
+                logger.warning("TorBox checkcached for %d hashes failed: %s", len(batch), e)
+                return None
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "failed_requests": self.failed_requests,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
+
+
+torbox_checker = TorboxAvailabilityChecker(
+    base_url=settings.TORBOX_API_URL,
+    api_key=settings.TORBOX_API_KEY,
+    batch_size=settings.TORBOX_CHECKCACHED_BATCH_SIZE,
+    rate=settings.TORBOX_RATE_LIMIT_PER_SECOND,
+    concurrency=settings.TORBOX_CONCURRENCY,
+    ttl=settings.TORBOX_CACHE_TTL_SECONDS,
+    negative_ttl=settings.TORBOX_NEGATIVE_CACHE_TTL_SECONDS,
+)
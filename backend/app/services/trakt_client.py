@@ -0,0 +1,335 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any
+
+import httpx
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.rate_limit import SharedTokenBucket, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+# Failures that happen before any of the request reaches Trakt
+_NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _retry_after(value: str | None, default: float) -> float:
+    """Seconds to wait per a Retry-After header, which holds either seconds or an HTTP-date."""
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+@dataclass
+class TraktResponse:
+    status_code: int
+    headers: dict[str, str]
+    data: Any
+    from_cache: bool = False
+
+
+class TraktClient:
+    """
+    Shared, lifespan-managed client for the Trakt API.
+
+    - one pooled keep-alive connection pool for every caller
+    - token buckets for Trakt's limits: app-wide for GETs, shared by every
+      worker through `rate_limit_path`, and per user for writes; 429s are retried after Retry-After, 5xx/network errors with
+      exponential backoff. Requests that must not reach Trakt twice (e.g.
+      spending a single-use refresh token) pass retry=False and are then only
+      retried after a 429 or a failure to connect
+    - an on-disk cache for GET responses that revalidates with
+      If-None-Match/If-Modified-Since and serves the stored body on 304;
+      entries unused for cache_max_age seconds and the least recently used
+      beyond cache_max_entries are pruned
+    - identical GETs already in flight are coalesced into one request
+    - per-endpoint request counts and latency
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        client_id: str,
+        cache_dir: str | None,
+        cache_max_entries: int = 10000,
+        cache_max_age: float = 30 * 86400,
+        max_connections: int = 10,
+        timeout: float = 10.0,
+        max_retries: int = 3,
+        get_rate: float = 1000 / 300,
+        get_burst: int = 50,
+        write_rate: float = 1.0,
+        rate_limit_path: str | None = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.client_id = client_id
+        self.cache_dir = cache_dir
+        self.cache_max_entries = cache_max_entries
+        self.cache_max_age = cache_max_age
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.write_rate = write_rate
+
+        self._client: httpx.AsyncClient | None = None
+        self._get_bucket = SharedTokenBucket(rate=get_rate, capacity=get_burst, path=rate_limit_path)
+        # A write bucket refills within a second, so one idle for a minute can go
+        self._write_buckets = TTLCache(maxsize=10000, ttl=60)
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._endpoints: dict[str, dict] = {}
+        self._cache_writes = 0
+
+        self.rate_limited = 0
+        self.coalesced = 0
+
+    async def start(self):
+        if self._client is not None:
+            return
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            await asyncio.to_thread(self._prune_cache)
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(self.timeout),
+            limits=httpx.Limits(
+                max_connections=self.max_connections, max_keepalive_connections=self.max_connections
+            ),
+            headers={
+                "Content-Type": "application/json",
+                "trakt-api-version": "2",
+                "trakt-api-key": self.client_id,
+            },
+        )
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get(self, path: str, params: dict | None = None, access_token: str | None = None) -> TraktResponse:
+        key = self._cache_key(path, params, access_token)
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.create_task(self._cached_get(key, path, params, access_token))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def post(
+        self,
+        path: str,
+        json: Any = None,
+        access_token: str | None = None,
+        retry: bool = True,
+        user_id: int | None = None,
+    ) -> TraktResponse:
+        """
+        `user_id` keys the write rate limit for `access_token`'s user; without
+        it the token itself does, which a refresh then resets.
+        """
+        response = await self._send(
+            "POST", path, json=json, access_token=access_token, retry=retry, user_id=user_id
+        )
+        return TraktResponse(response.status_code, dict(response.headers), self._json(response))
+
+    async def _cached_get(self, key: str, path: str, params: dict | None, access_token: str | None) -> TraktResponse:
+        cached = await asyncio.to_thread(self._read_cache, key)
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        response = await self._send("GET", path, params=params, headers=headers, access_token=access_token)
+        if response.status_code == 304 and cached:
+            self._endpoint_stats(path)["not_modified"] += 1
+            return TraktResponse(200, cached["headers"], cached["data"], from_cache=True)
+
+        result = TraktResponse(response.status_code, dict(response.headers), self._json(response))
+        if response.status_code == 200 and ("etag" in response.headers or "last-modified" in response.headers):
+            await asyncio.to_thread(self._write_cache, key, {
+                "etag": response.headers.get("etag"),
+                "last_modified": response.headers.get("last-modified"),
+                # Pagination headers are part of the answer for list endpoints
+                "headers": {k: v for k, v in response.headers.items() if k.lower().startswith("x-pagination")},
+                "data": result.data,
+            })
+        return result
+
+    async def _send(self, method: str, path: str, headers: dict | None = None,
+                    access_token: str | None = None, retry: bool = True, user_id: int | None = None,
+                    **kwargs) -> httpx.Response:
+        if self._client is None:
+            raise RuntimeError("TraktClient used before start()")
+        headers = dict(headers or {})
+        if access_token:
+            headers["Authorization"] = f"Bearer {access_token}"
+        stats = self._endpoint_stats(path)
+
+        for attempt in range(self.max_retries + 1):
+            await self._bucket(method, access_token, user_id).acquire()
+            start = time.perf_counter()
+            try:
+                response = await self._client.request(method, path, headers=headers, **kwargs)
+            except httpx.HTTPError as e:
+                stats["errors"] += 1
+                if attempt == self.max_retries or not (retry or isinstance(e, _NOT_SENT)):
+                    raise
+                logger.warning("Trakt %s %s failed: %s", method, path, e)
+                await asyncio.sleep(2 ** attempt)
+                continue
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                stats["requests"] += 1
+                stats["total_ms"] += elapsed_ms
+                stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+            if response.status_code == 429:
+                self.rate_limited += 1
+                delay = _retry_after(response.headers.get("Retry-After"), 2 ** attempt)
+            elif response.status_code >= 500:
+                stats["errors"] += 1
+                if not retry:
+                    return response
+                delay = 2 ** attempt
+            else:
+                return response
+            if attempt == self.max_retries:
+                return response
+            await asyncio.sleep(delay)
+
+    def _bucket(self, method: str, access_token: str | None, user_id: int | None = None) -> TokenBucket:
+        # Trakt's write limit is per user; unauthenticated calls (e.g. token
+        # refreshes) only count against the app-wide budget
+        if method == "GET" or not access_token:
+            return self._get_bucket
+        key = user_id if user_id is not None else access_token
+        bucket = self._write_buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rate=self.write_rate, capacity=1)
+            self._write_buckets.set(key, bucket)
+        return bucket
+
+    @staticmethod
+    def _json(response: httpx.Response) -> Any:
+        if not response.content:
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            return response.text
+
+    def _endpoint_stats(self, path: str) -> dict:
+        endpoint = _ID_SEGMENT.sub("/:id", path.split("?", 1)[0])
+        if endpoint not in self._endpoints:
+            self._endpoints[endpoint] = {"requests": 0, "errors": 0, "not_modified": 0, "total_ms": 0.0, "max_ms": 0.0}
+        return self._endpoints[endpoint]
+
+    @staticmethod
+    def _cache_key(path: str, params: dict | None, access_token: str | None) -> str:
+        # Responses are per user, so the token is part of the key (hashed, never stored)
+        raw = json.dumps([path, sorted((params or {}).items()), access_token or ""], default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _read_cache(self, key: str) -> dict | None:
+        if not self.cache_dir:
+            return None
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            os.utime(path)  # the modification time tracks the last use, for pruning
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, key: str, entry: dict):
+        if not self.cache_dir:
+            return
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+        # Every worker prunes after its own share of writes, so the directory
+        # overshoots cache_max_entries by at most a tenth per worker
+        self._cache_writes += 1
+        if self._cache_writes >= max(1, self.cache_max_entries // 10):
+            self._cache_writes = 0
+            self._prune_cache()
+
+    def _prune_cache(self):
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                try:
+                    entries.append((entry.stat().st_mtime, entry.name, entry.path))
+                except OSError:
+                    continue  # removed by another worker meanwhile
+        cutoff = time.time() - self.cache_max_age
+        kept = 0
+        for mtime, name, path in sorted(entries, reverse=True):
+            # Temporary files are only removed once stale, another worker may be writing them
+            if name.endswith(".json") and kept < self.cache_max_entries and mtime >= cutoff:
+                kept += 1
+            elif name.endswith(".json") or mtime < cutoff:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self) -> dict:
+        return {
+            "rate_limited": self.rate_limited,
+            "coalesced": self.coalesced,
+            "endpoints": {
+                endpoint: {
+                    **values,
+                    "avg_ms": round(values["total_ms"] / values["requests"], 2) if values["requests"] else 0.0,
+                    "total_ms": round(values["total_ms"], 2),
+                    "max_ms": round(values["max_ms"], 2),
+                }
+                for endpoint, values in self._endpoints.items()
+            },
+        }
+
+
+trakt_client = TraktClient(
+    base_url=settings.TRAKT_API_URL,
+    client_id=settings.TRAKT_CLIENT_ID,
+    cache_dir=settings.TRAKT_CACHE_DIR,
+    cache_max_entries=settings.TRAKT_CACHE_MAX_ENTRIES,
+    cache_max_age=settings.TRAKT_CACHE_MAX_AGE_DAYS * 86400,
+    max_connections=settings.TRAKT_MAX_CONNECTIONS,
+    timeout=settings.TRAKT_TIMEOUT_SECONDS,
+    max_retries=settings.TRAKT_MAX_RETRIES,
+    get_rate=settings.TRAKT_GET_LIMIT_PER_5_MINUTES / 300,
+    get_burst=settings.TRAKT_GET_BURST,
+    write_rate=settings.TRAKT_WRITE_LIMIT_PER_SECOND,
+    rate_limit_path=settings.TRAKT_RATE_LIMIT_PATH or f"{settings.DATABASE_PATH}-trakt-rate-limit",
+)
@@ -0,0 +1,271 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from app import crud
+from app.core.config import settings
+from app.database import AsyncSessionLocal
+from app.services.trakt_client import TraktClient, trakt_client
+
+logger = logging.getLogger(__name__)
+
+
+class TraktSyncError(Exception):
+    """Trakt answered a sync request with something other than 200."""
+
+
+class TraktSyncInProgress(Exception):
+    """Another worker is syncing this user right now."""
+
+
+def parse_trakt_datetime(value: str) -> datetime:
+    """Trakt timestamps are ISO 8601 in UTC; stored naive like the rest of the database."""
+    return datetime.fromisoformat(value).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def history_row(user_id: int, item: dict) -> dict:
+    row = {
+        "user_id": user_id,
+        "history_id": item["id"],
+        "media_type": item["type"],
+        "watched_at": parse_trakt_datetime(item["watched_at"]),
+        "show_trakt_id": None,
+        "season": None,
+        "episode": None,
+    }
+    if item["type"] == "movie":
+        ids = item["movie"]["ids"]
+        row.update(trakt_id=ids["trakt"], imdb_id=ids.get("imdb"))
+    else:
+        show_ids = item["show"]["ids"]
+        row.update(
+            trakt_id=item["episode"]["ids"]["trakt"],
+            imdb_id=show_ids.get("imdb"),
+            show_trakt_id=show_ids["trakt"],
+            season=item["episode"]["season"],
+            episode=item["episode"]["number"],
+        )
+    return row
+
+
+def watchlist_row(user_id: int, item: dict) -> dict:
+    media_type = item["type"]
+    media = item[media_type]
+    # Seasons and episodes are played through their show
+    parent = item.get("show", media)
+    return {
+        "user_id": user_id,
+        "media_type": media_type,
+        "trakt_id": media["ids"]["trakt"],
+        "imdb_id": media["ids"].get("imdb") or parent["ids"].get("imdb"),
+        "title": media.get("title") or parent.get("title"),
+        "year": parent.get("year"),
+        "rank": item.get("rank"),
+        "listed_at": parse_trakt_datetime(item["listed_at"]),
+    }
+
+
+class TraktSyncEngine:
+    """
+    Keeps a local copy of each linked user's Trakt history and watchlist.
+
+    Every `interval` seconds it claims batches of the users not synced within
+    that time and syncs up to `concurrency` of them at once. Every worker runs
+    the engine, so a batch is claimed for `lease` seconds and other workers
+    skip those users; saving a sync releases its claim, and users whose sync
+    failed without being recorded are picked up after the lease. A sync first asks Trakt for
+    `sync/last_activities` and compares it with the user's stored cursor:
+    only history types whose timestamp moved are fetched, starting from the
+    previous timestamp, and the watchlist is only re-fetched when it changed.
+    The new rows and cursor are written in one transaction.
+
+    Plays that are removed or backdated before the cursor are only picked up
+    by a full sync (`sync_user(user_id, full=True)`).
+    """
+
+    def __init__(
+        self,
+        client: TraktClient = trakt_client,
+        interval: float = 900.0,
+        batch_size: int = 50,
+        concurrency: int = 4,
+        page_size: int = 500,
+        lease: int = 900,
+        session_factory=AsyncSessionLocal,
+    ):
+        self.client = client
+        self.interval = interval
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.lease = lease
+        self.session_factory = session_factory
+
+        self._task: asyncio.Task | None = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+        self.synced = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.history_rows = 0
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Trakt sync run failed")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> int:
+        """Syncs every user that is due. Returns how many were synced."""
+        synced_before = datetime.utcnow() - timedelta(seconds=self.interval)
+        attempted: set[int] = set()
+        synced = 0
+
+        while True:
+            now = int(time.time())
+            async with self.session_factory() as db:
+                due = await crud.claim_trakt_sync_candidates(
+                    db, synced_before, now, claim_until=now + self.lease,
+                    limit=self.batch_size, exclude_user_ids=attempted,
+                )
+            if not due:
+                break
+            attempted.update(row.user_id for row in due)
+            results = await asyncio.gather(*(self._sync_guarded(row) for row in due))
+            synced += sum(1 for result in results if result is not None)
+
+        return synced
+
+    async def sync_user(self, user_id: int, full: bool = False) -> dict | None:
+        """
+        Syncs one user now, regardless of when they were last synced. Returns
+        None if the user has no usable Trakt token and raises
+        TraktSyncInProgress if another worker is syncing them; Trakt errors propagate.
+        """
+        now = int(time.time())
+        async with self.session_factory() as db:
+            rows = await crud.claim_trakt_sync_candidates(
+                db, datetime.utcnow(), now, claim_until=now + self.lease, user_id=user_id
+            )
+            if not rows:
+                if await crud.get_trakt_auth_by_user_id(db, user_id, not_expired_at=now) is not None:
+                    raise TraktSyncInProgress(f"User {user_id} is already being synced")
+                return None
+        async with self._semaphore:
+            return await self._sync(rows[0], full=full)
+
+    async def _sync_guarded(self, row) -> dict | None:
+        async with self._semaphore:
+            try:
+                return await self._sync(row)
+            except (httpx.HTTPError, TraktSyncError, KeyError, ValueError) as e:
+                self.failed += 1
+                logger.warning("Trakt sync for user %s failed: %s", row.user_id, e)
+                # Record the attempt so the user waits a full interval before the next one
+                async with self.session_factory() as db:
+                    await crud.save_trakt_sync(db, {
+                        "user_id": row.user_id,
+                        "synced_at": datetime.utcnow(),
+                        "error": str(e) or type(e).__name__,
+                    })
+                return None
+
+    async def _sync(self, row, full: bool = False) -> dict:
+        activities = await self._get(row.access_token, "/sync/last_activities")
+        movies_at = activities["movies"]["watched_at"]
+        episodes_at = activities["episodes"]["watched_at"]
+        watchlist_at = activities["watchlist"]["updated_at"]
+
+        history = []
+        if full or movies_at != row.movies_watched_at:
+            history += await self._fetch_history(row, "movies", None if full else row.movies_watched_at)
+        if full or episodes_at != row.episodes_watched_at:
+            history += await self._fetch_history(row, "episodes", None if full else row.episodes_watched_at)
+
+        watchlist = None
+        if full or watchlist_at != row.watchlist_updated_at:
+            items = await self._get_all_pages(row.access_token, "/sync/watchlist", {})
+            watchlist = [watchlist_row(row.user_id, item) for item in items if item["type"] in item]
+
+        state = {
+            "user_id": row.user_id,
+            "movies_watched_at": movies_at,
+            "episodes_watched_at": episodes_at,
+            "watchlist_updated_at": watchlist_at,
+            "synced_at": datetime.utcnow(),
+            "error": None,
+        }
+        async with self.session_factory() as db:
+            await crud.save_trakt_sync(db, state, history=history, watchlist=watchlist, full=full)
+
+        if history or watchlist is not None:
+            self.synced += 1
+        else:
+            self.unchanged += 1
+        self.history_rows += len(history)
+        return {
+            "user_id": row.user_id,
+            "history_rows": len(history),
+            "watchlist_items": len(watchlist) if watchlist is not None else None,
+        }
+
+    async def _fetch_history(self, row, media_type: str, start_at: str | None) -> list[dict]:
+        # start_at is inclusive; plays already stored are skipped on insert
+        params = {"start_at": start_at} if start_at else {}
+        items = await self._get_all_pages(row.access_token, f"/sync/history/{media_type}", params)
+        return [history_row(row.user_id, item) for item in items]
+
+    async def _get_all_pages(self, access_token: str, path: str, params: dict) -> list:
+        items, page, page_count = [], 1, 1
+        while page <= page_count:
+            response = await self.client.get(
+                path, params={**params, "page": page, "limit": self.page_size}, access_token=access_token
+            )
+            if response.status_code != 200:
+                raise TraktSyncError(f"GET {path} returned {response.status_code}")
+            items += response.data
+            page_count = int(response.headers.get("x-pagination-page-count", page))
+            page += 1
+        return items
+
+    async def _get(self, access_token: str, path: str):
+        response = await self.client.get(path, access_token=access_token)
+        if response.status_code != 200:
+            raise TraktSyncError(f"GET {path} returned {response.status_code}")
+        return response.data
+
+    def stats(self) -> dict:
+        return {
+            "synced": self.synced,
+            "unchanged": self.unchanged,
+            "failed": self.failed,
+            "history_rows": self.history_rows,
+        }
+
+
+trakt_sync_engine = TraktSyncEngine(
+    interval=settings.TRAKT_SYNC_INTERVAL_SECONDS,
+    batch_size=settings.TRAKT_SYNC_BATCH_SIZE,
+    concurrency=settings.TRAKT_SYNC_CONCURRENCY,
+    page_size=settings.TRAKT_SYNC_PAGE_SIZE,
+    lease=settings.TRAKT_SYNC_LEASE_SECONDS,
+)
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+
+import httpx
+
+from app import crud
+from app.core.config import settings
+from app.database import AsyncSessionLocal
+from app.services.trakt_client import trakt_client
+
+logger = logging.getLogger(__name__)
+
+
+class TraktTokenRefresher:
+    """
+    Background scheduler that refreshes Trakt tokens before they expire.
+
+    Every `interval` seconds it claims batches of tokens expiring within
+    `refresh_window` seconds (via the indexed `expires_at` column), refreshes
+    each batch with at most `concurrency` requests in flight over the shared
+    Trakt client (which applies rate limits and backoff), and writes each
+    batch's new tokens back with a single bulk UPDATE.
+
+    Every worker runs the scheduler, so a batch is claimed for `lease` seconds
+    before any refresh token in it is spent; the other workers skip it. Tokens
+    that failed stay claimed until the lease runs out and are retried then.
+    """
+
+    def __init__(
+        self,
+        interval: float = 600.0,
+        refresh_window: int = 6 * 3600,
+        batch_size: int = 50,
+        concurrency: int = 4,
+        lease: int = 300,
+        session_factory=AsyncSessionLocal,
+    ):
+        self.interval = interval
+        self.refresh_window = refresh_window
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.lease = lease
+        self.session_factory = session_factory
+
+        self._task: asyncio.Task | None = None
+
+        self.refreshed = 0
+        self.failed = 0
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Trakt token refresh run failed")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> int:
+        """Refreshes every token that is due. Returns how many were refreshed."""
+        expires_before = int(time.time()) + self.refresh_window
+        semaphore = asyncio.Semaphore(self.concurrency)
+        refreshed = 0
+
+        while True:
+            now = int(time.time())
+            async with self.session_factory() as db:
+                due = await crud.claim_trakt_auths_expiring_before(
+                    db, expires_before, now=now, claim_until=now + self.lease, limit=self.batch_size
+                )
+            if not due:
+                break
+
+            async def refresh(row):
+                async with semaphore:
+                    try:
+                        return await self.refresh_token(row.id, row.refresh_token)
+                    except Exception:
+                        # Never lose the rest of the batch: its tokens may already be rotated at Trakt
+                        logger.exception("Trakt token refresh for auth %s failed", row.id)
+                        return None
+
+            results = [result for result in await asyncio.gather(*(refresh(row) for row in due)) if result]
+            async with self.session_factory() as db:
+                await crud.update_trakt_tokens(db, results)
+            refreshed += len(results)
+            self.refreshed += len(results)
+            self.failed += len(due) - len(results)
+
+        return refreshed
+
+    async def refresh_token(self, auth_id: int, refresh_token: str) -> dict | None:
+        """
+        Exchanges one refresh token. Returns the update row for TraktUserAuth,
+        or None if Trakt rejected it or the client ran out of retries.
+        """
+        payload = {
+            "refresh_token": refresh_token,
+            "client_id": settings.TRAKT_CLIENT_ID,
+            "client_secret": settings.TRAKT_CLIENT_SECRET,
+            "redirect_uri": settings.TRAKT_REDIRECT_URI,
+            "grant_type": "refresh_token",
+        }
+        try:
+            # Refresh tokens are single-use: once Trakt may have seen this one, a
+            # retry could only be rejected, so the client only retries 429s and
+            # failures to connect. Anything else is retried after the lease.
+            response = await trakt_client.post("/oauth/token", json=payload, retry=False)
+        except httpx.HTTPError as e:
+            logger.warning("Trakt token refresh for auth %s failed: %s", auth_id, e)
+            return None
+        if response.status_code != 200:
+            # 400/401 mean the refresh token was revoked or already used
+            logger.warning("Trakt rejected token refresh for auth %s with %s", auth_id, response.status_code)
+            return None
+
+        token_data = response.data
+        try:
+            scope = token_data.get("scope", "")
+            return {
+                "id": auth_id,
+                "access_token": token_data["access_token"],
+                "refresh_token": token_data["refresh_token"],
+                "token_type": token_data.get("token_type", "bearer"),
+                "expires_in": int(token_data["expires_in"]),
+                "created_at": int(token_data.get("created_at", time.time())),
+                "scope": " ".join(scope) if isinstance(scope, list) else str(scope),
+            }
+        except (AttributeError, KeyError, TypeError, ValueError):
+            logger.error("Trakt returned an unusable token response for auth %s", auth_id)
+            return None
+
+    def stats(self) -> dict:
+        return {"refreshed": self.refreshed, "failed": self.failed}
+
+
+trakt_token_refresher = TraktTokenRefresher(
+    interval=settings.TRAKT_TOKEN_REFRESH_INTERVAL_SECONDS,
+    refresh_window=settings.TRAKT_TOKEN_REFRESH_WINDOW_SECONDS,
+    batch_size=settings.TRAKT_TOKEN_REFRESH_BATCH_SIZE,
+    concurrency=settings.TRAKT_TOKEN_REFRESH_CONCURRENCY,
+    lease=settings.TRAKT_TOKEN_REFRESH_LEASE_SECONDS,
+)
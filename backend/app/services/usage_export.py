@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator
+
+from app import crud
+from app.core.config import settings
+from app.database import AsyncReadSessionLocal
+
+CSV_HEADER = ("id", "user_id", "addon", "created_at")
+
+
+def rows_to_ndjson(rows: list[tuple]) -> bytes:
+    return "".join(
+        '{"id":%d,"user_id":%d,"addon":%s,"created_at":"%s"}\n'
+        % (log_id, user_id, json.dumps(addon), created_at.isoformat())
+        for log_id, user_id, addon, created_at in rows
+    ).encode()
+
+
+def rows_to_csv(rows: list[tuple], header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(CSV_HEADER)
+    writer.writerows(
+        (log_id, user_id, addon, created_at.isoformat())
+        for log_id, user_id, addon, created_at in rows
+    )
+    return buffer.getvalue().encode()
+
+
+async def export_usage_logs(
+    format: str = "ndjson",
+    gzip: bool = False,
+    user_id: int | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    Streams usage logs as NDJSON or CSV chunks, one chunk per database batch,
+    optionally gzip-compressed on the fly.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None  # wbits=31 -> gzip container
+    if format == "csv":
+        # Send the header even when nothing matches
+        chunk = rows_to_csv([], header=True)
+        yield compressor.compress(chunk) if compressor else chunk
+
+    async with AsyncReadSessionLocal() as db:
+        async for rows in crud.stream_addon_usage_log_rows(
+            db, batch_size=settings.USAGE_EXPORT_BATCH_SIZE, user_id=user_id, since=since, until=until
+        ):
+            chunk = rows_to_csv(rows) if format == "csv" else rows_to_ndjson(rows)
+            if compressor:
+                chunk = compressor.compress(chunk)
+                if not chunk:
+                    continue
+            yield chunk
+
+    if compressor:
+        yield compressor.flush()
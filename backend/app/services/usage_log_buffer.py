@@ -0,0 +1,116 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from app import crud
+from app.core.config import settings
+from app.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class UsageLogBuffer:
+    """
+    In-process write-behind buffer for addon usage events.
+
+    Request handlers call `record()`, which only appends to an in-memory list.
+    A background task writes the buffered events as one multi-row INSERT per
+    batch whenever `batch_size` events are pending or `flush_interval` seconds
+    have passed, and drains whatever is left on shutdown.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        maxsize: int = 10000,
+        session_factory=AsyncSessionLocal,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.maxsize = maxsize
+        self.session_factory = session_factory
+
+        self._pending: list[dict] = []
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def record(self, user_id: int, addon: str = "unknown") -> bool:
+        """
+        Buffers a usage event for `user_id`. Returns False if the buffer is full
+        and the event was dropped.
+        """
+        if len(self._pending) >= self.maxsize:
+            self.dropped += 1
+            return False
+        self._pending.append({"user_id": user_id, "addon": addon, "created_at": datetime.utcnow()})
+        self.enqueued += 1
+        if self._wakeup is not None and len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        self._wakeup = None
+        # Catch anything recorded while the last batch was being written.
+        await self.flush()
+
+    async def flush(self):
+        """Writes all currently buffered events to the database."""
+        while self._pending:
+            batch = self._pending[: self.batch_size]
+            del self._pending[: self.batch_size]
+            try:
+                async with self.session_factory() as db:
+                    await crud.create_addon_usage_logs(db, batch)
+            except Exception:
+                self.failed += len(batch)
+                logger.exception("Failed to write %d addon usage events", len(batch))
+                continue
+            self.written += len(batch)
+            self.batches += 1
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": len(self._pending),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+
+usage_log_buffer = UsageLogBuffer(
+    batch_size=settings.USAGE_LOG_BATCH_SIZE,
+    flush_interval=settings.USAGE_LOG_FLUSH_INTERVAL_SECONDS,
+    maxsize=settings.USAGE_LOG_QUEUE_MAXSIZE,
+)
@@ -0,0 +1,94 @@
+"""
+Measures per-request authentication overhead with the user lookup cache on and off.
+
+Runs /api/v1/users/me in-process through an ASGI transport against a throwaway
+SQLite database, so the numbers only include the app itself (JWT decode, the
+user lookup and serialization), not network or server overhead.
+
+Usage: python scripts/bench_auth_cache.py [--requests 2000] [--users 1000]
+"""
+import os
+import sys
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, '..'))
+sys.path.append(BACKEND_DIR)
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from app import models
+from app.core.config import settings
+from app.core.security import create_access_token, get_password_hash
+from app.core.user_cache import user_cache
+from app.database import get_async_db
+from app.main import app
+
+
+async def run(client: AsyncClient, headers: dict, requests: int) -> list[float]:
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.get("/api/v1/users/me", headers=headers)
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+    return timings
+
+
+def report(label: str, timings: list[float]):
+    timings = sorted(timings)
+    p = lambda q: timings[min(len(timings) - 1, int(q * len(timings)))] * 1000
+    print(
+        f"{label:<10} mean={statistics.mean(timings) * 1000:.3f}ms "
+        f"p50={p(0.50):.3f}ms p95={p(0.95):.3f}ms p99={p(0.99):.3f}ms "
+        f"rps={len(timings) / sum(timings):.0f}"
+    )
+
+
+async def main(requests: int, users: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp}/bench.db")
+        session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+            hashed_password = get_password_hash("password")
+            await conn.execute(
+                insert(models.User),
+                [{"email": f"user{i}@example.com", "hashed_password": hashed_password, "is_admin": False}
+                 for i in range(users)],
+            )
+
+        async def override_get_async_db():
+            async with session_factory() as session:
+                yield session
+
+        app.dependency_overrides[get_async_db] = override_get_async_db
+        token = create_access_token({"sub": f"user{users // 2}@example.com"})
+        headers = {"Authorization": f"Bearer {token}"}
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+            for enabled in (False, True):
+                settings.USER_CACHE_ENABLED = enabled
+                user_cache.clear()
+                await run(client, headers, 50)  # warm up
+                report("cache on" if enabled else "cache off", await run(client, headers, requests))
+        print(f"user cache: {user_cache.stats()}")
+
+        app.dependency_overrides.clear()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.users))
@@ -0,0 +1,283 @@
+"""
+Microbenchmarks for the crud and auth hot paths, with a regression check.
+
+Each function runs against fixture databases of several sizes (number of
+usage log rows), generated once with scripts/seed.py's dataset generator and
+reused from --fixtures-dir on later runs. Per benchmark the median, p95 and
+calls/s are reported.
+
+With --save-baseline the results are written to --baseline. Otherwise, if
+the baseline file exists, each median is compared with it and the script
+exits with status 1 when any benchmark is more than --threshold slower.
+
+Benchmarks: get_user_by_email, create_addon_usage_log, get_addon_usage_by_day,
+get_most_active_users, create_access_token, decode_access_token
+
+Usage: python scripts/bench_hotpaths.py [--sizes 1k,1m,10m] [--only get_user_by_email,...]
+                                        [--baseline FILE] [--save-baseline] [--threshold 0.2]
+"""
+import os
+import sys
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, '..'))
+sys.path.append(BACKEND_DIR)
+
+from jose import jwt
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from app import crud, models
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.database import create_async_sqlite_engine, create_sqlite_engine, engine_profile
+from seed import generate_dataset
+
+# Log rows -> sample users in the fixture
+FIXTURE_USERS = {1_000: 100, 1_000_000: 10_000, 10_000_000: 100_000}
+FIXTURE_DAYS = 365
+FIXTURE_SEED = 42
+# Bump when the schema or the generator changes so stale fixtures aren't reused
+FIXTURE_VERSION = 1
+
+BENCHMARKS = (
+    "get_user_by_email",
+    "create_addon_usage_log",
+    "get_addon_usage_by_day",
+    "get_most_active_users",
+    "create_access_token",
+    "decode_access_token",
+)
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * multiplier)
+
+
+def size_label(size: int) -> str:
+    if size >= 1_000_000 and size % 1_000_000 == 0:
+        return f"{size // 1_000_000}m"
+    if size >= 1_000 and size % 1_000 == 0:
+        return f"{size // 1_000}k"
+    return str(size)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def fixture_path(fixtures_dir: str, size: int) -> str:
+    path = os.path.join(fixtures_dir, f"hotpaths-v{FIXTURE_VERSION}-{size_label(size)}-seed{FIXTURE_SEED}.db")
+    if os.path.exists(path):
+        return path
+    os.makedirs(fixtures_dir, exist_ok=True)
+    users = FIXTURE_USERS.get(size, max(100, size // 100))
+    print(f"Generating {size_label(size)} fixture ({users} users) at {path}...")
+    partial = f"{path}.partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    engine = create_sqlite_engine(f"sqlite:///{partial}", replace(engine_profile, echo=False))
+    SQLModel.metadata.create_all(engine)
+    engine.dispose()
+    generate_dataset(partial, users=users, events=size, days=FIXTURE_DAYS, seed=FIXTURE_SEED)
+    os.replace(partial, path)
+    return path
+
+
+async def measure(func, min_time: float, min_calls: int, max_calls: int, warmup: int = 3) -> list[float]:
+    """Calls `func` (sync or async) until both `min_time` and `min_calls` are reached; returns per-call seconds."""
+    is_async = asyncio.iscoroutinefunction(func)
+    for _ in range(warmup):
+        await func() if is_async else func()
+    timings = []
+    deadline = time.perf_counter() + min_time
+    while len(timings) < max_calls and (len(timings) < min_calls or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        await func() if is_async else func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings: list[float]) -> dict:
+    ordered = sorted(timings)
+    return {
+        "calls": len(timings),
+        "median_us": round(statistics.median(timings) * 1e6, 2),
+        "p95_us": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1e6, 2),
+        "calls_per_s": round(len(timings) / sum(timings), 1),
+    }
+
+
+async def run_size(db_path: str, only: set[str], args) -> dict[str, dict]:
+    engine = create_async_sqlite_engine(f"sqlite+aiosqlite:///{db_path}", replace(engine_profile, echo=False))
+    session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    rng = random.Random(args.seed)
+
+    async with session_factory() as db:
+        emails = list((await db.execute(text("SELECT email FROM user ORDER BY id"))).scalars())
+        user = await crud.get_user_by_email(db, emails[0])
+        max_log_id = (await db.execute(text("SELECT coalesce(max(id), 0) FROM addonusagelog"))).scalar_one()
+        daily_before = list((await db.execute(
+            text("SELECT day, count FROM addonusagedaily WHERE user_id = :user_id AND addon = 'bench'"),
+            {"user_id": user.id},
+        )).all())
+
+    async def get_user_by_email():
+        async with session_factory() as db:
+            await crud.get_user_by_email(db, rng.choice(emails))
+
+    async def create_addon_usage_log():
+        async with session_factory() as db:
+            await crud.create_addon_usage_log(db, user, addon="bench")
+
+    async def get_addon_usage_by_day():
+        async with session_factory() as db:
+            await crud.get_addon_usage_by_day(db, limit=30)
+
+    async def get_most_active_users():
+        async with session_factory() as db:
+            await crud.get_most_active_users(db, limit=10)
+
+    token = create_access_token({"sub": emails[0]}, expires_delta=timedelta(minutes=30))
+
+    def create_token():
+        create_access_token({"sub": rng.choice(emails)}, expires_delta=timedelta(minutes=30))
+
+    def decode_access_token():
+        jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+    functions = {
+        "get_user_by_email": get_user_by_email,
+        "create_addon_usage_log": create_addon_usage_log,
+        "get_addon_usage_by_day": get_addon_usage_by_day,
+        "get_most_active_users": get_most_active_users,
+        "create_access_token": create_token,
+        "decode_access_token": decode_access_token,
+    }
+    results = {}
+    try:
+        for name, func in functions.items():
+            if name in only:
+                results[name] = summarize(await measure(func, args.min_time, args.min_calls, args.max_calls))
+    finally:
+        # Undo the benchmark's writes so the fixture stays the same size across runs
+        async with session_factory() as db:
+            await db.execute(text("DELETE FROM addonusagelog WHERE id > :max_id"), {"max_id": max_log_id})
+            await db.execute(
+                text("DELETE FROM addonusagedaily WHERE user_id = :user_id AND addon = 'bench'"), {"user_id": user.id}
+            )
+            for day, count in daily_before:
+                db.add(models.AddonUsageDaily(day=day, user_id=user.id, addon="bench", count=count))
+            await db.commit()
+        await engine.dispose()
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for key, row in sorted(results.items()):
+        base = baseline.get("results", {}).get(key)
+        if base is None:
+            row["change"] = None
+            continue
+        change = row["median_us"] / base["median_us"] - 1
+        row["change"] = round(change, 4)
+        if change > threshold:
+            regressions.append(f"{key}: {base['median_us']}us -> {row['median_us']}us ({change:+.0%})")
+    return regressions
+
+
+def print_table(results: dict):
+    print(f"{'benchmark':<34}{'calls':>8}{'median us':>12}{'p95 us':>12}{'calls/s':>12}{'vs base':>10}")
+    for key, row in results.items():
+        change = f"{row['change']:+.1%}" if row.get("change") is not None else "-"
+        print(
+            f"{key:<34}{row['calls']:>8}{row['median_us']:>12}{row['p95_us']:>12}{row['calls_per_s']:>12}{change:>10}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1k,1m,10m", help="Fixture sizes in usage log rows")
+    parser.add_argument("--only", help=f"Comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument(
+        "--fixtures-dir", default=os.path.join(tempfile.gettempdir(), "stremio-manager-bench"),
+        help="Where generated fixture databases are kept between runs",
+    )
+    parser.add_argument("--baseline", default="bench_hotpaths_baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="Write results to --baseline instead of comparing")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed median slowdown, 0.2 = 20%%")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Seconds to run each benchmark for at least")
+    parser.add_argument("--min-calls", type=int, default=5)
+    parser.add_argument("--max-calls", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Also write this run's JSON report to this file")
+    args = parser.parse_args()
+
+    only = set(args.only.split(",")) if args.only else set(BENCHMARKS)
+    unknown = only - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = {}
+    for size in map(parse_size, args.sizes.split(",")):
+        db_path = fixture_path(args.fixtures_dir, size)
+        for name, row in asyncio.run(run_size(db_path, only, args)).items():
+            results[f"{size_label(size)}/{name}"] = row
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "fixture_version": FIXTURE_VERSION,
+            "threshold": args.threshold,
+        },
+        "results": results,
+    }
+
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("fixture_version") != FIXTURE_VERSION:
+            print(f"Baseline {args.baseline} was recorded on other fixtures; not comparing.")
+        else:
+            regressions = compare(results, baseline, args.threshold)
+
+    print_table(results)
+    if args.save_baseline:
+        print(f"Baseline written to {args.baseline}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Measures /api/v1/users/me latency while concurrent logins hammer /api/v1/auth/token.
+
+Runs both scenarios in-process through an ASGI transport so that everything
+shares one event loop, exactly like a single uvicorn worker:
+
+  inline  - bcrypt runs directly on the event loop (the old behaviour)
+  pooled  - bcrypt runs on the bounded password hashing pool
+
+Usage: python scripts/bench_login_storm.py [--seconds 5] [--login-concurrency 16]
+"""
+import os
+import sys
+import argparse
+import asyncio
+import tempfile
+import time
+from collections import Counter
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, '..'))
+sys.path.append(BACKEND_DIR)
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from app import models
+from app.api.v1.routers import auth_router
+from app.core import security
+from app.database import get_async_db
+from app.main import app
+
+
+async def inline_verify_password(plain_password, hashed_password):
+    return security.verify_password(plain_password, hashed_password)
+
+
+def percentile(timings: list[float], q: float) -> float:
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(q * len(timings)))] * 1000
+
+
+async def scenario(client: AsyncClient, headers: dict, seconds: float, login_concurrency: int):
+    deadline = time.perf_counter() + seconds
+    me_timings: list[float] = []
+    login_statuses: Counter = Counter()
+
+    async def login_loop():
+        while time.perf_counter() < deadline:
+            response = await client.post(
+                "/api/v1/auth/token", data={"username": "user@example.com", "password": "password"}
+            )
+            login_statuses[response.status_code] += 1
+
+    async def me_loop():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.get("/api/v1/users/me", headers=headers)
+            me_timings.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.text
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(me_loop(), *(login_loop() for _ in range(login_concurrency)))
+    return me_timings, login_statuses
+
+
+async def main(seconds: float, login_concurrency: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp}/bench.db")
+        session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+            await conn.execute(
+                insert(models.User),
+                [{"email": "user@example.com", "hashed_password": security.get_password_hash("password"),
+                  "is_admin": False}],
+            )
+
+        async def override_get_async_db():
+            async with session_factory() as session:
+                yield session
+
+        app.dependency_overrides[get_async_db] = override_get_async_db
+        headers = {"Authorization": f"Bearer {security.create_access_token({'sub': 'user@example.com'})}"}
+        pooled_verify_password = auth_router.verify_password_async
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+            for label, verify in (("inline", inline_verify_password), ("pooled", pooled_verify_password)):
+                auth_router.verify_password_async = verify
+                me_timings, login_statuses = await scenario(client, headers, seconds, login_concurrency)
+                print(
+                    f"{label:<7} /users/me n={len(me_timings)} p50={percentile(me_timings, 0.50):.1f}ms "
+                    f"p99={percentile(me_timings, 0.99):.1f}ms max={max(me_timings) * 1000:.1f}ms "
+                    f"logins={dict(login_statuses)}"
+                )
+
+        auth_router.verify_password_async = pooled_verify_password
+        app.dependency_overrides.clear()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--login-concurrency", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(main(args.seconds, args.login_concurrency))
@@ -0,0 +1,117 @@
+"""
+Compares write and read throughput of the SQLite engine profiles in app.database.
+
+For each profile a fresh database is created and seeded, then several worker
+processes (like gunicorn workers) run concurrently for a fixed time: writers
+insert one usage log per transaction, readers run the usage-by-day aggregate.
+
+Usage: python scripts/bench_sqlite_profiles.py [--seconds 5] [--writers 4] [--readers 4]
+                                               [--profiles legacy,safe,fast]
+"""
+import os
+import sys
+import argparse
+import asyncio
+import multiprocessing
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, '..'))
+sys.path.append(BACKEND_DIR)
+
+from dataclasses import replace
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from app import crud, models
+from app.database import PROFILES, create_async_sqlite_engine
+
+SEED_USERS = 100
+SEED_LOGS = 50000
+# Rows per INSERT, within SQLite's limit on bound parameters
+SEED_BATCH = 5000
+
+
+async def seed(db_path: str, profile_name: str):
+    engine = create_async_sqlite_engine(f"sqlite+aiosqlite:///{db_path}", replace(PROFILES[profile_name], echo=False))
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.execute(
+            insert(models.User),
+            [{"email": f"user{i}@example.com", "hashed_password": "x", "is_admin": False} for i in range(SEED_USERS)],
+        )
+    # Seeded like the app writes usage, so the daily rollup the readers
+    # aggregate holds the same events as the log
+    now = datetime.utcnow()
+    rows = [{"user_id": 1 + i % SEED_USERS, "created_at": now - timedelta(minutes=i)} for i in range(SEED_LOGS)]
+    session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as db:
+        for start in range(0, SEED_LOGS, SEED_BATCH):
+            await crud.create_addon_usage_logs(db, rows[start:start + SEED_BATCH])
+    await engine.dispose()
+
+
+async def work(role: str, db_path: str, profile_name: str, seconds: float) -> tuple[int, int]:
+    profile = replace(PROFILES[profile_name], echo=False)
+    engine = create_async_sqlite_engine(f"sqlite+aiosqlite:///{db_path}", profile, read_only=role == "reader")
+    session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    operations = errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            async with session_factory() as db:
+                if role == "writer":
+                    await crud.create_addon_usage_logs(db, [{"user_id": 1, "created_at": datetime.utcnow()}])
+                else:
+                    await crud.get_addon_usage_by_day(db)
+            operations += 1
+        except Exception:
+            errors += 1
+    await engine.dispose()
+    return operations, errors
+
+
+def worker(role: str, db_path: str, profile_name: str, seconds: float, results):
+    results.put((role, *asyncio.run(work(role, db_path, profile_name, seconds))))
+
+
+def run_profile(profile_name: str, seconds: float, writers: int, readers: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        asyncio.run(seed(db_path, profile_name))
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=worker, args=(role, db_path, profile_name, seconds, results))
+            for role in ["writer"] * writers + ["reader"] * readers
+        ]
+        for process in processes:
+            process.start()
+        totals = {"writer": [0, 0], "reader": [0, 0]}
+        for _ in processes:
+            role, operations, errors = results.get()
+            totals[role][0] += operations
+            totals[role][1] += errors
+        for process in processes:
+            process.join()
+
+    print(
+        f"{profile_name:<8} writes/s={totals['writer'][0] / seconds:>8.0f} (errors {totals['writer'][1]})  "
+        f"reads/s={totals['reader'][0] / seconds:>8.0f} (errors {totals['reader'][1]})"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    args = parser.parse_args()
+    for name in args.profiles.split(","):
+        run_profile(name, args.seconds, args.writers, args.readers)
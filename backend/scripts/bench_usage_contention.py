@@ -0,0 +1,170 @@
+"""
+Measures how usage logging slows down user reads and writes, with the usage
+tables in the main database ("shared", the default) and in a database file
+of their own ("split", USAGE_DATABASE_PATH).
+
+For each layout fresh databases are created and seeded, then worker
+processes (like gunicorn workers) run concurrently for a fixed time:
+loggers write usage events in transactions of --batch-size events, editors
+update a user row (an admin edit or password change) and look users up by
+email (a login), timing each operation. Every worker routes the usage models
+to the usage engine the same way app.database does.
+
+Usage: python scripts/bench_usage_contention.py [--seconds 5] [--loggers 4] [--editors 2]
+                                                [--batch-size 1] [--layouts shared,split]
+"""
+import os
+import sys
+import argparse
+import asyncio
+import multiprocessing
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, '..'))
+sys.path.append(BACKEND_DIR)
+
+from dataclasses import replace
+
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from app import crud, models
+from app.database import PROFILES, USAGE_MODELS, USAGE_TABLES, create_async_sqlite_engine
+
+SEED_USERS = 1000
+SEED_LOGS = 200000
+LAYOUTS = ("shared", "split")
+
+
+def database_paths(tmp: str, layout: str) -> tuple[str, str]:
+    main = os.path.join(tmp, "main.db")
+    return main, main if layout == "shared" else os.path.join(tmp, "usage.db")
+
+
+def engines(main_path: str, usage_path: str, profile_name: str):
+    profile = replace(PROFILES[profile_name], echo=False)
+    main = create_async_sqlite_engine(f"sqlite+aiosqlite:///{main_path}", profile)
+    usage = main if usage_path == main_path else create_async_sqlite_engine(f"sqlite+aiosqlite:///{usage_path}", profile)
+    return main, usage
+
+
+async def seed(main_path: str, usage_path: str, profile_name: str):
+    main, usage = engines(main_path, usage_path, profile_name)
+    async with main.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.execute(
+            insert(models.User),
+            [{"email": f"user{i}@example.com", "hashed_password": "x", "is_admin": False} for i in range(SEED_USERS)],
+        )
+    if usage is not main:
+        async with usage.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all, tables=USAGE_TABLES)
+    session_factory = sessionmaker(
+        bind=main, binds={model: usage for model in USAGE_MODELS}, class_=AsyncSession, expire_on_commit=False
+    )
+    now = datetime.utcnow()
+    async with session_factory() as db:
+        for offset in range(0, SEED_LOGS, 5000):
+            await crud.create_addon_usage_logs(
+                db,
+                [{"user_id": 1 + i % SEED_USERS, "created_at": now - timedelta(seconds=i)} for i in range(offset, offset + 5000)],
+            )
+    await main.dispose()
+    await usage.dispose()
+
+
+async def work(role: str, index: int, main_path: str, usage_path: str, profile_name: str, seconds: float, batch_size: int):
+    main, usage = engines(main_path, usage_path, profile_name)
+    session_factory = sessionmaker(
+        bind=main, binds={model: usage for model in USAGE_MODELS}, class_=AsyncSession, expire_on_commit=False
+    )
+    timings: dict[str, list[float]] = {"log": [], "edit": [], "lookup": []}
+    errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        user_id = 1 + (index * 7919 + len(timings["edit"])) % SEED_USERS
+        try:
+            async with session_factory() as db:
+                if role == "logger":
+                    start = time.perf_counter()
+                    await crud.create_addon_usage_logs(
+                        db, [{"user_id": user_id, "addon": "torrentio", "created_at": datetime.utcnow()}] * batch_size
+                    )
+                    timings["log"].append(time.perf_counter() - start)
+                else:
+                    start = time.perf_counter()
+                    await db.execute(
+                        update(models.User).where(models.User.id == user_id).values(hashed_password=f"x{time.time()}")
+                    )
+                    await db.commit()
+                    timings["edit"].append(time.perf_counter() - start)
+                    start = time.perf_counter()
+                    await crud.get_user_by_email(db, f"user{user_id - 1}@example.com")
+                    timings["lookup"].append(time.perf_counter() - start)
+                    await asyncio.sleep(0.005)
+        except Exception:
+            errors += 1
+    await main.dispose()
+    await usage.dispose()
+    return timings, errors
+
+
+def worker(role: str, index: int, main_path: str, usage_path: str, profile_name: str, seconds: float, batch_size: int, results):
+    results.put(asyncio.run(work(role, index, main_path, usage_path, profile_name, seconds, batch_size)))
+
+
+def percentile(timings: list[float], q: float) -> float:
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(q * len(timings)))] * 1000 if timings else float("nan")
+
+
+def run_layout(layout: str, profile_name: str, seconds: float, loggers: int, editors: int, batch_size: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        main_path, usage_path = database_paths(tmp, layout)
+        asyncio.run(seed(main_path, usage_path, profile_name))
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=worker, args=(role, index, main_path, usage_path, profile_name, seconds, batch_size, results)
+            )
+            for index, role in enumerate(["logger"] * loggers + ["editor"] * editors)
+        ]
+        for process in processes:
+            process.start()
+        totals: dict[str, list[float]] = {"log": [], "edit": [], "lookup": []}
+        errors = 0
+        for _ in processes:
+            timings, worker_errors = results.get()
+            for name, values in timings.items():
+                totals[name].extend(values)
+            errors += worker_errors
+        for process in processes:
+            process.join()
+
+    print(
+        f"{layout:<7} events/s={len(totals['log']) * batch_size / seconds:>8.0f}  "
+        f"edits/s={len(totals['edit']) / seconds:>6.0f}  "
+        f"edit p50/p95/p99/max={percentile(totals['edit'], 0.5):.2f}/{percentile(totals['edit'], 0.95):.2f}/"
+        f"{percentile(totals['edit'], 0.99):.2f}/{max(totals['edit'], default=0) * 1000:.2f} ms  "
+        f"lookup p50/p99={percentile(totals['lookup'], 0.5):.2f}/{percentile(totals['lookup'], 0.99):.2f} ms  "
+        f"errors={errors}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--loggers", type=int, default=4)
+    parser.add_argument("--editors", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=1, help="usage events per transaction")
+    parser.add_argument("--profile", default="fast", choices=list(PROFILES))
+    parser.add_argument("--layouts", default=",".join(LAYOUTS))
+    args = parser.parse_args()
+    for layout in args.layouts.split(","):
+        run_layout(layout, args.profile, args.seconds, args.loggers, args.editors, args.batch_size)
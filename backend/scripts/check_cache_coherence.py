@@ -0,0 +1,153 @@
+"""
+Checks that a write handled by one gunicorn worker invalidates the in-process
+caches of all the others.
+
+Starts gunicorn with several uvicorn workers on a throwaway database holding
+two admins, warms every worker's user and analytics caches with the first
+admin's token, then has the second admin demote the first and create a user.
+Every following request (each on a new connection, so they spread over the
+workers) must see the change straight away rather than after the cache TTL:
+the demoted admin gets 403 and /analytics/stats counts the new user.
+
+Usage: python scripts/check_cache_coherence.py [--workers 4] [--requests 40]
+"""
+import os
+import sys
+import argparse
+import socket
+import subprocess
+import tempfile
+import time
+from collections import Counter
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, '..'))
+sys.path.append(BACKEND_DIR)
+
+import httpx
+from sqlalchemy import create_engine, insert
+from sqlmodel import SQLModel
+
+from app import models
+from app.core import security
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def create_database(path: str):
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    hashed = security.get_password_hash("password")
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"email": "admin1@example.com", "hashed_password": hashed, "is_admin": True},
+            {"email": "admin2@example.com", "hashed_password": hashed, "is_admin": True},
+        ])
+    engine.dispose()
+
+
+def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {process.returncode}")
+        try:
+            httpx.get(f"{base_url}/docs", timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn did not start in time")
+
+
+def login(base_url: str, email: str) -> dict:
+    response = httpx.post(f"{base_url}/api/v1/auth/token", data={"username": email, "password": "password"})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def fan_out(base_url: str, path: str, headers: dict, requests: int) -> list[httpx.Response]:
+    # A fresh connection per request lets the kernel hand each one to any worker
+    return [
+        httpx.get(f"{base_url}{path}", headers={**headers, "Connection": "close"}, timeout=10.0)
+        for _ in range(requests)
+    ]
+
+
+def run(workers: int, requests: int) -> bool:
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, "coherence.db")
+        create_database(database)
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        env = {
+            **os.environ,
+            "DATABASE_PATH": database,
+            "CACHE_GENERATIONS_PATH": os.path.join(tmp, "coherence.db-generations"),
+            # Long enough that only invalidation, not expiry, can explain a fresh answer
+            "USER_CACHE_TTL_SECONDS": "600",
+            "ANALYTICS_STATS_TTL_SECONDS": "600",
+            "METRICS_DIR": os.path.join(tmp, "metrics"),
+            "ADDON_HEALTH_ENABLED": "false",
+            "TRAKT_SYNC_ENABLED": "false",
+            "TRAKT_TOKEN_REFRESH_ENABLED": "false",
+            "COMET_WARM_ENABLED": "false",
+        }
+        process = subprocess.Popen(
+            ["gunicorn", "-w", str(workers), "-k", "uvicorn.workers.UvicornWorker", "app.main:app",
+             "--bind", f"127.0.0.1:{port}", "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env,
+        )
+        try:
+            wait_until_ready(base_url, process)
+            admin1 = login(base_url, "admin1@example.com")
+            admin2 = login(base_url, "admin2@example.com")
+
+            warm = fan_out(base_url, "/api/v1/users/", admin1, requests)
+            warm += fan_out(base_url, "/api/v1/analytics/stats", admin1, requests)
+            if any(response.status_code != 200 for response in warm):
+                print(f"Warm-up failed: {Counter(response.status_code for response in warm)}")
+                return False
+
+            admin1_id = next(user["id"] for user in warm[0].json() if user["email"] == "admin1@example.com")
+            httpx.put(
+                f"{base_url}/api/v1/users/{admin1_id}", json={"is_admin": False}, headers=admin2
+            ).raise_for_status()
+            httpx.post(
+                f"{base_url}/api/v1/users/",
+                json={"email": "new@example.com", "password": "password", "is_admin": False},
+                headers=admin2,
+            ).raise_for_status()
+
+            demoted = Counter(
+                response.status_code for response in fan_out(base_url, "/api/v1/users/", admin1, requests)
+            )
+            totals = Counter(
+                response.json()["total_users"]
+                for response in fan_out(base_url, "/api/v1/analytics/stats", admin2, requests)
+            )
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    print(f"Demoted admin, status codes over {requests} requests: {dict(demoted)} (expected only 403)")
+    print(f"/analytics/stats total_users over {requests} requests: {dict(totals)} (expected only 3)")
+    return set(demoted) == {403} and set(totals) == {3}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=40, help="requests per phase, spread over the workers")
+    args = parser.parse_args()
+
+    ok = run(args.workers, args.requests)
+    print("OK" if ok else "FAILED: a worker served a stale cache entry")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+End-to-end load generator for the API.
+
+Runs `--concurrency` workers for `--duration` seconds. Each worker repeatedly
+picks an operation from the scenario mix (weighted, seeded) and records its
+latency and status. Results per operation and in total (requests, errors,
+throughput, p50/p95/p99/max latency) are printed as a table and written as
+JSON with --output, so runs can be diffed across commits.
+
+Targets:
+  in-process (default)  app.main:app through an ASGI transport, with its lifespan, on
+                        one event loop like a single uvicorn worker. Uses a fresh
+                        database in a temporary directory unless --database is given,
+                        and disables background jobs that call external services.
+  --base-url URL        a running server, e.g. uvicorn or gunicorn on localhost
+
+The login user is created in in-process mode; against a server it must exist
+(scripts/seed.py creates admin@example.com / adminpassword).
+
+Scenarios (--scenario), or give weights directly with --mix "me=3,stats=1":
+  mixed        every operation
+  browse       what users do: installation URLs and /users/me, occasional logins
+  admin        analytics and usage log pages
+  login-storm  mostly logins, with /users/me alongside
+
+Usage: python scripts/loadtest.py [--scenario mixed] [--concurrency 32] [--duration 30] [--output run.json]
+"""
+import os
+import sys
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, '..'))
+sys.path.append(BACKEND_DIR)
+
+import httpx
+
+# name -> (method, path, needs admin)
+OPERATIONS = {
+    "login": ("POST", "/api/v1/auth/token", False),
+    "me": ("GET", "/api/v1/users/me", False),
+    "torrentio_url": ("GET", "/api/v1/addons/torrentio/installation-url", False),
+    "aiostreams_url": ("GET", "/api/v1/addons/aiostreams/installation-url", False),
+    "stats": ("GET", "/api/v1/analytics/stats", True),
+    "usage_logs": ("GET", "/api/v1/addons/torrentio/usage-logs?limit=100", True),
+}
+
+SCENARIOS = {
+    "mixed": {"login": 10, "me": 30, "torrentio_url": 20, "aiostreams_url": 20, "stats": 10, "usage_logs": 10},
+    "browse": {"me": 40, "torrentio_url": 25, "aiostreams_url": 25, "login": 5, "stats": 5},
+    "admin": {"stats": 40, "usage_logs": 40, "me": 20},
+    "login-storm": {"login": 70, "me": 30},
+}
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation {name!r}, expected one of {', '.join(OPERATIONS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def percentile(timings: list[float], q: float) -> float:
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(q * len(timings)))] * 1000
+
+
+def summarize(timings: list[float], statuses: Counter, seconds: float) -> dict:
+    errors = sum(count for status, count in statuses.items() if not 200 <= status < 400)
+    return {
+        "requests": len(timings),
+        "errors": errors,
+        "rps": round(len(timings) / seconds, 1),
+        "p50_ms": round(percentile(timings, 0.50), 2) if timings else None,
+        "p95_ms": round(percentile(timings, 0.95), 2) if timings else None,
+        "p99_ms": round(percentile(timings, 0.99), 2) if timings else None,
+        "max_ms": round(max(timings) * 1000, 2) if timings else None,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str) -> dict:
+    response = await client.post("/api/v1/auth/token", data={"username": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run_load(client: httpx.AsyncClient, args, mix: dict[str, float]) -> dict:
+    headers = await login(client, args.email, args.password)
+    names, weights = list(mix), list(mix.values())
+    timings: dict[str, list[float]] = defaultdict(list)
+    statuses: dict[str, Counter] = defaultdict(Counter)
+
+    start = time.perf_counter()
+    measure_from = start + args.warmup
+    deadline = measure_from + args.duration
+
+    async def worker(worker_id: int):
+        rng = random.Random(args.seed + worker_id)
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                return
+            name = rng.choices(names, weights)[0]
+            method, path, _ = OPERATIONS[name]
+            if name == "login":
+                request = client.post(path, data={"username": args.email, "password": args.password})
+            else:
+                request = client.request(method, path, headers=headers)
+            try:
+                response = await request
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 599  # connection-level failure
+            if now >= measure_from:
+                timings[name].append(time.perf_counter() - now)
+                statuses[name][status] += 1
+
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+
+    all_timings = [timing for route_timings in timings.values() for timing in route_timings]
+    all_statuses = sum(statuses.values(), Counter())
+    return {
+        "routes": {name: summarize(timings[name], statuses[name], args.duration) for name in sorted(timings)},
+        "total": summarize(all_timings, all_statuses, args.duration),
+    }
+
+
+async def run_in_process(args, mix: dict[str, float]) -> dict:
+    # Settings are read at import time, so configure them before importing the app
+    tmp = None
+    if args.database:
+        os.environ["DATABASE_PATH"] = args.database
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_PATH"] = os.path.join(tmp.name, "loadtest.db")
+    for name in ("ADDON_HEALTH_ENABLED", "TRAKT_TOKEN_REFRESH_ENABLED", "TRAKT_SYNC_ENABLED", "COMET_WARM_ENABLED"):
+        os.environ.setdefault(name, "false")
+
+    from sqlalchemy import insert, select
+    from sqlmodel import SQLModel
+
+    from app import models
+    from app.core.security import get_password_hash
+    from app.database import async_engine
+    from app.main import app
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        existing = (await conn.execute(select(models.User.id).where(models.User.email == args.email))).first()
+        if existing is None:
+            await conn.execute(insert(models.User), [{
+                "email": args.email, "hashed_password": get_password_hash(args.password), "is_admin": True,
+            }])
+
+    try:
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+                return await run_load(client, args, mix)
+    finally:
+        await async_engine.dispose()
+        if tmp is not None:
+            tmp.cleanup()
+
+
+async def run_against_server(args, mix: dict[str, float]) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30.0) as client:
+        return await run_load(client, args, mix)
+
+
+def print_table(result: dict):
+    print(f"{'operation':<16}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, row in [*result["routes"].items(), ("TOTAL", result["total"])]:
+        print(
+            f"{name:<16}{row['requests']:>10}{row['errors']:>8}{row['rps']:>10}"
+            f"{row['p50_ms'] or 0:>10}{row['p95_ms'] or 0:>10}{row['p99_ms'] or 0:>10}{row['max_ms'] or 0:>10}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Target a running server instead of the in-process app")
+    parser.add_argument("--database", help="In-process only: database file to use instead of a temporary one")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--mix", type=parse_mix, help="Operation weights, overrides --scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of load before measuring")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--email", default="admin@example.com")
+    parser.add_argument("--password", default="adminpassword")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    mix = args.mix or SCENARIOS[args.scenario]
+    started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    runner = run_against_server if args.base_url else run_in_process
+    result = asyncio.run(runner(args, mix))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "started_at": started_at,
+            "target": args.base_url or "in-process",
+            "scenario": "custom" if args.mix else args.scenario,
+            "mix": mix,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "seed": args.seed,
+        },
+        **result,
+    }
+    print_table(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
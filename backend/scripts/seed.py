@@ -1,73 +1,258 @@
+"""
+Seeds the database with an admin user and a synthetic, reproducible dataset.
+
+Users are bulk-inserted with one precomputed password hash shared by all of
+them. Usage events are generated day by day from a seeded distribution:
+user activity follows a power law (a few heavy users, a long tail), and
+volume follows a weekly and time-of-day pattern. Events are written with
+executemany in large transactions under pragmas tuned for bulk loading,
+the daily rollup is updated as each day is written, and the usage log's
+secondary indexes are rebuilt once at the end, or when the load fails.
+
+Run migrations first (alembic upgrade head, plus alembic -n usage upgrade head
+with a separate usage database) and stop the app while seeding. The load runs
+in WAL mode with synchronous=OFF, so a crash can lose the last transactions
+but not corrupt the database; the previous journal mode is restored
+afterwards. If seeding is killed before the indexes are rebuilt, running it
+again restores them. Usage events go to USAGE_DATABASE_PATH when it is set,
+attached to the same connection.
+
+Usage: python scripts/seed.py [--users 100] [--events 10000] [--days 30] [--seed 42]
+       python scripts/seed.py --users 100000 --events 50000000 --days 365
+"""
 import os
 import sys
-import asyncio
+import argparse
 import random
+import sqlite3
+import time
+from collections import Counter
 from datetime import datetime, timedelta
+from itertools import accumulate
 
 # Add the 'backend' directory to sys.path so 'app' can be imported
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 BACKEND_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, '..'))
 sys.path.append(BACKEND_DIR)
 
-from app.database import async_engine, AsyncSessionLocal
-from app.crud import get_user_by_email, create_user, delete_user
 from app import models
-from app.schemas import UserCreate
-from sqlmodel import select
+from app.core.config import settings
+from app.core.security import get_password_hash
 
 # Define the initial user details
 INITIAL_USER_EMAIL = "admin@example.com"
 INITIAL_USER_PASSWORD = "adminpassword"
+SAMPLE_USER_PASSWORD = "password123"
+
+ADDONS = (("aiostreams", 0.55), ("torrentio", 0.45))
+# Relative activity per hour of day (UTC) and per weekday (Monday first)
+HOUR_WEIGHTS = (3, 2, 1, 1, 1, 1, 1, 2, 3, 4, 4, 5, 6, 6, 6, 7, 8, 10, 13, 16, 18, 17, 12, 6)
+WEEKDAY_WEIGHTS = (0.9, 0.85, 0.9, 0.95, 1.15, 1.3, 1.25)
+# The usage log's secondary indexes as {name: columns}, as the model declares them
+USAGE_LOG_INDEXES = {
+    index.name: ", ".join(column.name for column in index.columns)
+    for index in models.AddonUsageLog.__table__.indexes
+}
+
+
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-262144")  # 256 MiB
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
 
-async def seed_initial_user(db: AsyncSessionLocal):
+def create_usage_log_indexes(conn: sqlite3.Connection, schema: str = "main"):
+    for name, columns in USAGE_LOG_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.{name} ON addonusagelog ({columns})")
+
+
+def seed_initial_user(conn: sqlite3.Connection):
     print("Seeding initial user...")
-    user = await get_user_by_email(db=db, email=INITIAL_USER_EMAIL)
-    if user:
-        print(f"User {INITIAL_USER_EMAIL} already exists. Deleting and recreating...")
-        await delete_user(db=db, user=user)
-        print(f"User {INITIAL_USER_EMAIL} deleted.")
-    
-    user_in = UserCreate(email=INITIAL_USER_EMAIL, password=INITIAL_USER_PASSWORD, is_admin=True)
-    await create_user(db=db, user=user_in)
-    print(f"User {INITIAL_USER_EMAIL} created successfully.")
-
-async def seed_sample_data(db: AsyncSessionLocal):
-    print("Seeding sample users and usage data...")
-    sample_users_data = [
-        {"email": "alice@example.com", "password": "password123"},
-        {"email": "bob@example.com", "password": "password123"},
-        {"email": "charlie@example.com", "password": "password123"},
-    ]
-
-    for user_data in sample_users_data:
-        user = await get_user_by_email(db=db, email=user_data['email'])
-        if not user:
-            user_in = UserCreate(email=user_data['email'], password=user_data['password'])
-            await create_user(db=db, user=user_in)
-            print(f"Created sample user: {user_data['email']}")
-
-    # Generate sample usage logs
-    result = await db.execute(select(models.User))
-    all_users = result.scalars().all()
-    if not all_users:
-        return
-
-    print("Generating sample usage logs...")
-    for _ in range(150):
-        random_user = random.choice(all_users)
-        random_timestamp = datetime.utcnow() - timedelta(days=random.randint(0, 29), hours=random.randint(0, 23))
-        log_entry = models.AddonUsageLog(user_id=random_user.id, created_at=random_timestamp)
-        db.add(log_entry)
-    
-    await db.commit()
-    print("Sample data seeding complete.")
-
-async def main():
-    print("Starting database seeding...")
-    async with AsyncSessionLocal() as db:
-        await seed_initial_user(db)
-        await seed_sample_data(db)
+    conn.execute(
+        "INSERT INTO user (email, hashed_password, is_admin) VALUES (?, ?, 1) "
+        "ON CONFLICT (email) DO UPDATE SET hashed_password = excluded.hashed_password, is_admin = 1",
+        (INITIAL_USER_EMAIL, get_password_hash(INITIAL_USER_PASSWORD)),
+    )
+    print(f"User {INITIAL_USER_EMAIL} ready.")
+
+
+def seed_users(conn: sqlite3.Connection, count: int, batch_size: int) -> list[int]:
+    """Inserts user0..user{count-1}@example.com (existing ones are kept) and returns their ids."""
+    shared_hash = get_password_hash(SAMPLE_USER_PASSWORD)
+    start = time.perf_counter()
+    conn.execute("BEGIN")
+    for offset in range(0, count, batch_size):
+        conn.executemany(
+            "INSERT OR IGNORE INTO user (email, hashed_password, is_admin) VALUES (?, ?, 0)",
+            ((f"user{i}@example.com", shared_hash) for i in range(offset, min(count, offset + batch_size))),
+        )
+    conn.execute("COMMIT")
+    elapsed = time.perf_counter() - start
+    print(f"Users: {count} in {elapsed:.2f}s ({count / elapsed:,.0f} rows/s)")
+    return [row[0] for row in conn.execute("SELECT id FROM user WHERE email LIKE 'user%@example.com' ORDER BY id")]
+
+
+def day_weights(days: list[datetime]) -> list[float]:
+    return [WEEKDAY_WEIGHTS[day.weekday()] for day in days]
+
+
+def generate_day(rng: random.Random, day: datetime, count: int, user_ids: list[int], user_cum_weights: list[float]):
+    """One day of events as (user_id, addon, created_at) tuples in time order, created_at in SQLAlchemy's SQLite format."""
+    users = rng.choices(user_ids, cum_weights=user_cum_weights, k=count)
+    addons = rng.choices([name for name, _ in ADDONS], weights=[weight for _, weight in ADDONS], k=count)
+    hours = rng.choices(range(24), weights=HOUR_WEIGHTS, k=count)
+    # Microseconds into the day; formatted by hand, strftime per row dominates the load otherwise
+    offsets = sorted(hour * 3_600_000_000 + int(rng.random() * 3_600_000_000) for hour in hours)
+    date = day.date().isoformat()
+    timestamps = []
+    for offset in offsets:
+        seconds, micros = divmod(offset, 1_000_000)
+        minutes, second = divmod(seconds, 60)
+        hour, minute = divmod(minutes, 60)
+        timestamps.append(f"{date} {hour:02d}:{minute:02d}:{second:02d}.{micros:06d}")
+    return list(zip(users, addons, timestamps))
+
+
+def seed_usage_events(
+    conn: sqlite3.Connection,
+    user_ids: list[int],
+    events: int,
+    days: int,
+    rng: random.Random,
+    alpha: float,
+    commit_every: int,
+    schema: str = "main",
+):
+    # Power-law activity: the user at rank r is 1/r^alpha as active as the top user
+    ranks = list(range(1, len(user_ids) + 1))
+    rng.shuffle(ranks)
+    user_cum_weights = list(accumulate(1 / rank ** alpha for rank in ranks))
+
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    day_list = [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+    weights = day_weights(day_list)
+    total_weight = sum(weights)
+    # Largest-remainder split so the per-day counts add up to exactly `events`
+    shares = [events * weight / total_weight for weight in weights]
+    counts = [int(share) for share in shares]
+    for index in sorted(range(days), key=lambda i: shares[i] - counts[i], reverse=True)[:events - sum(counts)]:
+        counts[index] += 1
+
+    # Rebuilding the secondary indexes once beats maintaining them row by row,
+    # unless the table already holds more rows than we're about to add
+    existing = conn.execute(f"SELECT coalesce(max(id), 0) FROM {schema}.addonusagelog").fetchone()[0]
+    if events > existing:
+        for name in USAGE_LOG_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {schema}.{name}")
+
+    start = time.perf_counter()
+    written = pending = 0
+    try:
+        conn.execute("BEGIN")
+        for day, count in zip(day_list, counts):
+            rows = generate_day(rng, day, count, user_ids, user_cum_weights)
+            conn.executemany(f"INSERT INTO {schema}.addonusagelog (user_id, addon, created_at) VALUES (?, ?, ?)", rows)
+            rollup = Counter((user_id, addon) for user_id, addon, _ in rows)
+            conn.executemany(
+                f"INSERT INTO {schema}.addonusagedaily (day, user_id, addon, count) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (day, user_id, addon) DO UPDATE SET count = count + excluded.count",
+                ((day.date().isoformat(), user_id, addon, n) for (user_id, addon), n in rollup.items()),
+            )
+            written += count
+            pending += count
+            if pending >= commit_every:
+                conn.execute("COMMIT")
+                conn.execute("BEGIN")
+                pending = 0
+                elapsed = time.perf_counter() - start
+                print(f"  {written:,} events ({written / elapsed:,.0f} rows/s)")
+        conn.execute("COMMIT")
+    finally:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")  # keeps the days committed so far
+        load_elapsed = time.perf_counter() - start
+        index_start = time.perf_counter()
+        create_usage_log_indexes(conn, schema)
+        index_elapsed = time.perf_counter() - index_start
+    conn.execute(f"ANALYZE {schema}.addonusagelog")
+
+    total_elapsed = time.perf_counter() - start
+    print(
+        f"Usage events: {written:,} in {load_elapsed:.2f}s ({written / load_elapsed:,.0f} rows/s), "
+        f"indexes rebuilt in {index_elapsed:.2f}s, {written / total_elapsed:,.0f} rows/s overall"
+    )
+
+
+def generate_dataset(
+    path: str,
+    users: int,
+    events: int,
+    days: int = 30,
+    seed: int = 42,
+    alpha: float = 1.1,
+    commit_every: int = 1_000_000,
+    usage_path: str | None = None,
+):
+    """
+    Seeds the admin user, `users` sample users and `events` usage events into an
+    already migrated database, with the events in `usage_path` if given.
+    """
+    conn = connect(path)
+    schemas = ["main"]
+    if usage_path:
+        conn.execute("ATTACH DATABASE ? AS usage", (usage_path,))
+        conn.execute("PRAGMA usage.synchronous=OFF")
+        conn.execute("PRAGMA usage.cache_size=-262144")
+        schemas.append("usage")
+    usage_schema = schemas[-1]
+    if not (
+        conn.execute("SELECT 1 FROM main.sqlite_master WHERE name = 'user'").fetchone()
+        and conn.execute(f"SELECT 1 FROM {usage_schema}.sqlite_master WHERE name = 'addonusagedaily'").fetchone()
+    ):
+        conn.close()
+        raise RuntimeError("Tables are missing or out of date; run `alembic upgrade head` first.")
+    journal_modes = {schema: conn.execute(f"PRAGMA {schema}.journal_mode").fetchone()[0] for schema in schemas}
+    for schema in schemas:
+        conn.execute(f"PRAGMA {schema}.journal_mode=WAL")
+    try:
+        seed_initial_user(conn)
+        user_ids = seed_users(conn, users, batch_size=10000)
+        if user_ids and events:
+            seed_usage_events(
+                conn, user_ids, events, days, random.Random(seed), alpha, commit_every, schema=usage_schema
+            )
+        else:
+            create_usage_log_indexes(conn, usage_schema)  # in case an earlier run was killed while loading
+    finally:
+        for schema, journal_mode in journal_modes.items():
+            conn.execute(f"PRAGMA {schema}.journal_mode={journal_mode}")
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default=settings.DATABASE_PATH)
+    parser.add_argument("--usage-database", default=settings.USAGE_DATABASE_PATH)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--alpha", type=float, default=1.1, help="Power-law exponent for user activity")
+    parser.add_argument("--commit-every", type=int, default=1_000_000, help="Events per transaction")
+    args = parser.parse_args()
+
+    print(f"Starting database seeding of {args.database}...")
+    try:
+        generate_dataset(
+            args.database, args.users, args.events, args.days, args.seed, args.alpha, args.commit_every,
+            usage_path=args.usage_database,
+        )
+    except RuntimeError as e:
+        sys.exit(str(e))
     print("Database seeding finished.")
 
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -0,0 +1,248 @@
+"""
+Local stand-ins for the external services the backend talks to, for manual
+testing and benchmarks without touching the real ones.
+
+Addon manifests, where <mode> controls the behaviour:
+  GET /<mode>/manifest.json    ok -> valid manifest, fail -> 503, slow -> sleeps past timeouts
+  GET /<mode>[/<config>]/stream/<type>/<id>.json
+                               ten streams per ID; ok and ok2 share half of their info hashes
+
+Trakt API (TRAKT_API_URL=http://localhost:9000/trakt):
+  POST /trakt/oauth/token      issues new tokens; every 5th call is rate limited (429 + Retry-After),
+                               refresh tokens starting with "revoked" are rejected with 401
+  GET  /trakt/users/me         profile with ETag/Last-Modified; answers 304 to a matching If-None-Match
+  GET  /trakt/users/settings   settings with only Last-Modified; answers 304 to a matching If-Modified-Since
+  GET  /trakt/sync/last_activities, /trakt/sync/history/<movies|episodes>, /trakt/sync/watchlist
+                               one shared generated history (paginated, honours start_at) and watchlist
+  POST /trakt/stub/watch       appends ?count=N new episode plays and bumps last_activities
+  POST /trakt/stub/fail        the next ?count=N Trakt API requests answer ?status= (default 503), with
+                               ?retry_after= as their Retry-After header if given
+  GET  /trakt/stub/requests    how many requests each Trakt API path has received
+
+TorBox API (TORBOX_API_URL=http://localhost:9000/torbox):
+  POST /torbox/torrents/checkcached
+                               hashes starting with 0-7 are cached (those starting with 7 answered with a bare
+                               `true` rather than details); more than 100 hashes per request -> 400
+
+Usage: python scripts/stub_upstreams.py [--port 9000]
+Then point the backend at it, e.g. COMET_MANIFEST_URL=http://localhost:9000/ok/manifest.json
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import math
+import secrets
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from fastapi import Body, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+
+app = FastAPI(title="Stub upstreams")
+
+trakt_requests: Counter[str] = Counter()
+trakt_failures: list[tuple[int, str | None]] = []
+
+
+@app.middleware("http")
+async def trakt_failure_injection(request: Request, call_next):
+    path = request.url.path
+    if path.startswith("/trakt/") and not path.startswith("/trakt/stub/"):
+        trakt_requests[path] += 1
+        if trakt_failures:
+            status, retry_after = trakt_failures.pop(0)
+            headers = {"Retry-After": retry_after} if retry_after is not None else {}
+            return JSONResponse(status_code=status, content={}, headers=headers)
+    return await call_next(request)
+
+
+@app.get("/{mode}/manifest.json")
+async def manifest(mode: str):
+    if mode == "fail":
+        raise HTTPException(status_code=503, detail="Stub addon is down")
+    if mode == "slow":
+        await asyncio.sleep(30)
+    return {
+        "id": f"org.stub.{mode}",
+        "version": "1.0.0",
+        "name": f"Stub addon ({mode})",
+        "resources": ["stream"],
+        "types": ["movie", "series"],
+        "catalogs": [],
+    }
+
+
+@app.get("/{mode}/stream/{media_type}/{media_id}.json")
+@app.get("/{mode}/{config}/stream/{media_type}/{media_id}.json")
+async def streams(mode: str, media_type: str, media_id: str, config: str | None = None):
+    if mode == "fail":
+        raise HTTPException(status_code=503, detail="Stub addon is down")
+    await asyncio.sleep(30 if mode == "slow" else 0.1)
+    offset = 5 if mode == "ok2" else 0
+    return {
+        "streams": [
+            {
+                "name": f"Stub {mode}",
+                "title": f"{media_id} #{i}",
+                "infoHash": hashlib.sha1(f"{media_id}:{i}".encode()).hexdigest(),
+                "fileIdx": 0,
+            }
+            for i in range(offset, offset + 10)
+        ]
+    }
+
+
+token_requests = itertools.count(1)
+
+
+@app.post("/trakt/oauth/token")
+async def trakt_oauth_token(payload: dict = Body(...)):
+    if next(token_requests) % 5 == 0:
+        return JSONResponse(status_code=429, content={}, headers={"Retry-After": "1"})
+    if payload.get("grant_type") == "refresh_token" and payload.get("refresh_token", "").startswith("revoked"):
+        return JSONResponse(status_code=401, content={"error": "invalid_grant"})
+    return {
+        "access_token": secrets.token_hex(32),
+        "token_type": "bearer",
+        "expires_in": 86400,
+        "refresh_token": secrets.token_hex(32),
+        "scope": "public",
+        "created_at": int(time.time()),
+    }
+
+
+PROFILE_ETAG = '"stub-profile-1"'
+PROFILE_LAST_MODIFIED = "Sat, 17 Oct 2026 12:00:00 GMT"
+
+
+@app.get("/trakt/users/me")
+async def trakt_profile(request: Request):
+    await asyncio.sleep(0.2)  # long enough for concurrent callers to overlap
+    headers = {"ETag": PROFILE_ETAG, "Last-Modified": PROFILE_LAST_MODIFIED}
+    if request.headers.get("if-none-match") == PROFILE_ETAG:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content={"username": "stub", "private": False}, headers=headers)
+
+
+@app.get("/trakt/users/settings")
+async def trakt_settings(request: Request):
+    headers = {"Last-Modified": PROFILE_LAST_MODIFIED}
+    if request.headers.get("if-modified-since") == PROFILE_LAST_MODIFIED:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content={"user": {"username": "stub"}, "account": {"timezone": "UTC"}}, headers=headers)
+
+
+def trakt_time(value: datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+history_ids = itertools.count(1)
+history_start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+history: list[dict] = []
+
+
+def add_play(watched_at: datetime, movie: bool):
+    play_id = next(history_ids)
+    item = {"id": play_id, "watched_at": trakt_time(watched_at), "action": "watch"}
+    if movie:
+        item.update(type="movie", movie={"title": f"Movie {play_id}", "year": 2020, "ids": {"trakt": 100000 + play_id, "imdb": f"tt{9000000 + play_id}"}})
+    else:
+        show = play_id % 40
+        item.update(
+            type="episode",
+            episode={"season": 1 + play_id % 3, "number": 1 + play_id % 10, "ids": {"trakt": 200000 + play_id}},
+            show={"title": f"Show {show}", "year": 2019, "ids": {"trakt": 300 + show, "imdb": f"tt{8000000 + show}"}},
+        )
+    history.append(item)
+
+
+for i in range(1500):
+    add_play(history_start + timedelta(hours=i), movie=i % 5 == 0)
+
+watchlist = [
+    {"rank": i + 1, "id": 5000 + i, "listed_at": trakt_time(history_start + timedelta(days=i)), "type": "movie",
+     "movie": {"title": f"Listed {i}", "year": 2024, "ids": {"trakt": 400000 + i, "imdb": f"tt{7000000 + i}"}}}
+    for i in range(60)
+]
+
+
+def latest(media_type: str) -> str:
+    return max((item["watched_at"] for item in history if item["type"] == media_type), default=None)
+
+
+def paginate(items: list, page: int, limit: int) -> JSONResponse:
+    page_count = max(1, math.ceil(len(items) / limit))
+    return JSONResponse(
+        content=items[(page - 1) * limit:page * limit],
+        headers={"X-Pagination-Page": str(page), "X-Pagination-Page-Count": str(page_count), "X-Pagination-Item-Count": str(len(items))},
+    )
+
+
+@app.get("/trakt/sync/last_activities")
+async def trakt_last_activities():
+    return {
+        "movies": {"watched_at": latest("movie")},
+        "episodes": {"watched_at": latest("episode")},
+        "watchlist": {"updated_at": watchlist[-1]["listed_at"]},
+    }
+
+
+@app.get("/trakt/sync/history/{media_type}")
+async def trakt_history(media_type: str, start_at: str | None = None, page: int = 1, limit: int = 10):
+    items = [item for item in history if item["type"] == media_type.rstrip("s")]
+    if start_at:
+        items = [item for item in items if item["watched_at"] >= start_at]
+    items.sort(key=lambda item: item["watched_at"], reverse=True)
+    return paginate(items, page, limit)
+
+
+@app.get("/trakt/sync/watchlist")
+async def trakt_watchlist(page: int = 1, limit: int = 10):
+    return paginate(watchlist, page, limit)
+
+
+@app.post("/trakt/stub/watch")
+async def trakt_stub_watch(count: int = 1):
+    now = datetime.now(timezone.utc)
+    for i in range(count):
+        add_play(now + timedelta(seconds=i), movie=False)
+    return {"history": len(history)}
+
+
+@app.post("/trakt/stub/fail")
+async def trakt_stub_fail(count: int = 1, status: int = 503, retry_after: str | None = None):
+    trakt_failures.extend([(status, retry_after)] * count)
+    return {"pending": len(trakt_failures)}
+
+
+@app.get("/trakt/stub/requests")
+async def trakt_stub_requests():
+    return dict(trakt_requests)
+
+
+@app.post("/torbox/torrents/checkcached")
+async def torbox_checkcached(payload: dict = Body(...)):
+    hashes = payload.get("hashes", [])
+    if len(hashes) > 100:
+        return JSONResponse(status_code=400, content={"success": False, "error": "TOO_MANY_HASHES"})
+    await asyncio.sleep(0.05)
+    return {
+        "success": True,
+        "data": {
+            info_hash: True if info_hash[0] == "7"
+            else {"name": f"Torrent {info_hash[:8]}", "size": 1_500_000_000, "hash": info_hash}
+            for info_hash in hashes
+            if info_hash[0] in "01234567"
+        },
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9000)
+    args = parser.parse_args()
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
@@ -0,0 +1,54 @@
+import atexit
+import importlib.util
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+
+import pytest
+import uvicorn
+
+# Settings are read when app modules are first imported, so point everything
+# that touches the disk at a throwaway directory before any test imports them.
+TEST_DIR = tempfile.mkdtemp(prefix="stremio-manager-tests-")
+atexit.register(shutil.rmtree, TEST_DIR, ignore_errors=True)
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("TRAKT_CLIENT_ID", "test-client-id")
+os.environ.setdefault("TRAKT_CLIENT_SECRET", "test-client-secret")
+os.environ.setdefault("TORBOX_API_KEY", "test-torbox-key")
+os.environ["DATABASE_PATH"] = os.path.join(TEST_DIR, "database.db")
+os.environ["CACHE_GENERATIONS_PATH"] = os.path.join(TEST_DIR, "database.db-generations")
+os.environ["TRAKT_CACHE_DIR"] = os.path.join(TEST_DIR, "trakt_cache")
+for job in ("ADDON_HEALTH_ENABLED", "TRAKT_SYNC_ENABLED", "TRAKT_TOKEN_REFRESH_ENABLED", "COMET_WARM_ENABLED"):
+    os.environ[job] = "false"
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session")
+def stub_url():
+    """Base URL of scripts/stub_upstreams.py, served on a free local port for the whole session."""
+    spec = importlib.util.spec_from_file_location(
+        "stub_upstreams", os.path.join(BACKEND_DIR, "scripts", "stub_upstreams.py")
+    )
+    stub = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(stub)
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(stub.app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("The stub upstreams failed to start")
+        time.sleep(0.05)
+    yield f"http://127.0.0.1:{sock.getsockname()[1]}"
+    # Don't wait for requests to the slow addon that clients gave up on long ago
+    server.should_exit = server.force_exit = True
+    thread.join(timeout=10)
+    sock.close()
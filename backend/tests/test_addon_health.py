@@ -0,0 +1,93 @@
+import asyncio
+import base64
+import json
+
+from app.core.circuit_breaker import CircuitBreaker
+from app.services.addon_health import AddonHealthProber
+from app.services.addon_profiles import addon_profiles
+
+COMET = "Comet (Self-Hosted)"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_circuit_breaker_opens_half_opens_and_closes():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    clock.now = 10
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    # One failed trial call is enough to re-open it
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now = 20
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+
+def aiostreams_addon_names() -> list[str]:
+    installation_url = addon_profiles.get("aiostreams").installation_url
+    encoded_config = installation_url.split("/")[-2]
+    return [addon["name"] for addon in json.loads(base64.b64decode(encoded_config))["addons"]]
+
+
+def test_unhealthy_addons_are_left_out_until_a_probe_succeeds(stub_url):
+    target = {"name": COMET, "manifestUrl": f"{stub_url}/fail/manifest.json"}
+    prober = AddonHealthProber(
+        targets=lambda: [target], interval=3600, timeout=2, failure_threshold=2, reset_timeout=0.3
+    )
+
+    async def main():
+        await prober.start()
+        try:
+            # start() runs the first round in the background
+            while not prober.statuses():
+                await asyncio.sleep(0.01)
+            assert prober.statuses()[0]["circuit"] == CircuitBreaker.CLOSED
+            assert COMET in aiostreams_addon_names()
+
+            await prober.probe_all()
+            status = prober.statuses()[0]
+            assert status["circuit"] == CircuitBreaker.OPEN
+            assert status["status_code"] == 503
+            assert COMET not in aiostreams_addon_names()
+
+            # While open the addon isn't probed at all
+            await prober.probe_all()
+            assert prober.statuses()[0]["checked_at"] == status["checked_at"]
+
+            await asyncio.sleep(0.35)
+            assert prober.is_available(COMET)
+            assert COMET in prober.unavailable()  # half-open, still excluded
+
+            await prober.probe_all()
+            assert prober.statuses()[0]["circuit"] == CircuitBreaker.OPEN
+
+            await asyncio.sleep(0.35)
+            target["manifestUrl"] = f"{stub_url}/ok/manifest.json"
+            await prober.probe_all()
+            status = prober.statuses()[0]
+            assert status["healthy"]
+            assert status["circuit"] == CircuitBreaker.CLOSED
+            assert prober.unavailable() == frozenset()
+            assert COMET in aiostreams_addon_names()
+        finally:
+            await prober.stop()
+            addon_profiles.set_excluded_addons(frozenset())
+
+    asyncio.run(main())
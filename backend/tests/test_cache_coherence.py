@@ -0,0 +1,110 @@
+import asyncio
+import importlib.util
+import multiprocessing
+import os
+import shutil
+from types import SimpleNamespace
+
+import pytest
+
+from app.api.v1.routers.auth_router import authenticate_token
+from app.core.cache import TTLCache
+from app.core.generations import GenerationTable, generations
+from app.core.security import create_access_token
+from app.core.user_cache import user_cache
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Worker processes are forked, like gunicorn's
+fork = multiprocessing.get_context("fork")
+
+
+def hold_cached_user(path: str, ready, bumped, results):
+    cache = TTLCache(maxsize=10, ttl=600, generation=GenerationTable(path).channel("user"))
+    cache.set("admin@example.com", "admin")
+    ready.release()
+    bumped.wait(timeout=10)
+    results.put((cache.get("admin@example.com"), cache.generation_resets))
+
+
+def bump_user_generation(path: str):
+    GenerationTable(path).bump("user")
+
+
+def test_bump_clears_the_cache_of_every_process(tmp_path):
+    path = str(tmp_path / "generations")
+    ready, bumped, results = fork.Semaphore(0), fork.Event(), fork.Queue()
+    processes = [fork.Process(target=hold_cached_user, args=(path, ready, bumped, results)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        assert ready.acquire(timeout=10)
+
+    GenerationTable(path).bump("user")
+    bumped.set()
+
+    seen = [results.get(timeout=10) for _ in processes]
+    for process in processes:
+        process.join(timeout=10)
+    assert seen == [(None, 1)] * len(processes)
+
+
+def test_set_skips_values_loaded_before_another_process_invalidated(tmp_path):
+    path = str(tmp_path / "generations")
+    cache = TTLCache(maxsize=10, ttl=600, generation=GenerationTable(path).channel("user"))
+
+    generation = cache.current_generation()
+    writer = fork.Process(target=bump_user_generation, args=(path,))
+    writer.start()
+    writer.join(timeout=10)
+    cache.set("admin@example.com", "stale", generation=generation)
+    assert cache.get("admin@example.com") is None
+
+    cache.set("admin@example.com", "fresh", generation=cache.current_generation())
+    assert cache.get("admin@example.com") == "fresh"
+
+
+class WriteDuringRead:
+    """A session whose read overlaps another worker demoting the user."""
+
+    def __init__(self, is_admin: bool, invalidate: bool):
+        self.is_admin = is_admin
+        self.invalidate = invalidate
+        self.reads = 0
+
+    async def execute(self, statement):
+        self.reads += 1
+        if self.invalidate:
+            writer = fork.Process(target=bump_user_generation, args=(generations.path,))
+            writer.start()
+            writer.join(timeout=10)
+        row = SimpleNamespace(id=1, email="admin@example.com", is_admin=self.is_admin)
+        return SimpleNamespace(one_or_none=lambda: row)
+
+
+def test_authenticate_token_does_not_cache_a_user_read_during_an_invalidation():
+    user_cache.clear()
+    token = create_access_token({"sub": "admin@example.com"})
+
+    racing = WriteDuringRead(is_admin=True, invalidate=True)
+    assert asyncio.run(authenticate_token(racing, token)).is_admin
+
+    after = WriteDuringRead(is_admin=False, invalidate=False)
+    assert not asyncio.run(authenticate_token(after, token)).is_admin
+    assert after.reads == 1
+
+    # Without a concurrent write the snapshot is cached as usual
+    cached = WriteDuringRead(is_admin=True, invalidate=False)
+    assert not asyncio.run(authenticate_token(cached, token)).is_admin
+    assert cached.reads == 0
+
+
+@pytest.mark.skipif(shutil.which("gunicorn") is None, reason="gunicorn is not installed")
+def test_gunicorn_workers_see_writes_made_by_another_worker():
+    spec = importlib.util.spec_from_file_location(
+        "check_cache_coherence", os.path.join(BACKEND_DIR, "scripts", "check_cache_coherence.py")
+    )
+    check_cache_coherence = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(check_cache_coherence)
+
+    assert check_cache_coherence.run(workers=4, requests=40)
@@ -0,0 +1,52 @@
+import sqlite3
+import threading
+import time
+from dataclasses import replace
+
+import pytest
+from sqlalchemy import text
+
+from app.database import PROFILES, create_sqlite_engine
+
+
+@pytest.mark.parametrize("name", list(PROFILES))
+def test_profiles_apply_their_pragmas(name, tmp_path):
+    profile = replace(PROFILES[name], echo=False)
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'profile.db'}", profile)
+    try:
+        with engine.connect() as conn:
+            pragmas = {
+                pragma: conn.execute(text(f"PRAGMA {pragma}")).scalar()
+                for pragma in ("journal_mode", "busy_timeout", "cache_size", "mmap_size")
+            }
+    finally:
+        engine.dispose()
+    assert pragmas == {
+        "journal_mode": profile.journal_mode.lower(),
+        "busy_timeout": profile.busy_timeout,
+        "cache_size": profile.cache_size,
+        "mmap_size": profile.mmap_size,
+    }
+
+
+def test_legacy_profile_waits_for_locks_like_sqlite3(tmp_path):
+    # sqlite3.connect() waits up to 5 s for a lock instead of failing with
+    # "database is locked", and the legacy profile keeps that behaviour
+    path = tmp_path / "locked.db"
+    holder = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    holder.execute("CREATE TABLE t (x INTEGER)")
+    holder.execute("BEGIN IMMEDIATE")
+    release = threading.Timer(0.5, holder.execute, ["COMMIT"])
+
+    engine = create_sqlite_engine(f"sqlite:///{path}", replace(PROFILES["legacy"], echo=False))
+    try:
+        release.start()
+        start = time.perf_counter()
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO t VALUES (1)"))
+        waited = time.perf_counter() - start
+    finally:
+        release.join()
+        engine.dispose()
+        holder.close()
+    assert waited >= 0.4
@@ -0,0 +1,79 @@
+import multiprocessing
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.metrics import MetricsRegistry
+from app.main import app
+
+client = TestClient(app)
+
+
+@pytest.mark.parametrize("metrics_dir, token, headers, status_code", [
+    # A single local process without a token stays open
+    (None, None, {}, 200),
+    # Production workers never serve metrics without a token
+    ("/tmp/metrics", None, {}, 403),
+    ("/tmp/metrics", "secret", {}, 401),
+    ("/tmp/metrics", "secret", {"Authorization": "Bearer wrong"}, 401),
+    ("/tmp/metrics", "secret", {"Authorization": "Bearer secret"}, 200),
+    (None, "secret", {}, 401),
+])
+def test_metrics_access(monkeypatch, metrics_dir, token, headers, status_code):
+    monkeypatch.setattr(settings, "METRICS_DIR", metrics_dir)
+    monkeypatch.setattr(settings, "METRICS_BEARER_TOKEN", token)
+    response = client.get("/metrics", headers=headers)
+    assert response.status_code == status_code
+    if status_code == 200:
+        assert "stremio_cache_hits_total" in response.text
+
+
+fork = multiprocessing.get_context("fork")
+
+
+def worker_registry(directory: str, requests: int, connections: float) -> MetricsRegistry:
+    registry = MetricsRegistry(directory=directory)
+    registry.counter("requests_total", "Requests.")
+    registry.histogram("latency_seconds", "Latency.", (0.1, 1.0))
+    registry.gauge("connections", "Open connections.")
+    registry.register_collector(lambda: [("connections", {}, connections)])
+    for _ in range(requests):
+        registry.inc("requests_total", {"route": "/"})
+        registry.observe("latency_seconds", {"route": "/"}, 0.5)
+    return registry
+
+
+def run_worker(directory: str, requests: int, connections: float, written, done):
+    worker_registry(directory, requests, connections)._write_snapshot()
+    written.set()
+    done.wait(timeout=10)
+
+
+def test_render_merges_the_snapshots_of_all_workers(tmp_path):
+    directory = str(tmp_path)
+    workers = []
+    for requests, connections in [(2, 10), (3, 100)]:
+        written, done = fork.Event(), fork.Event()
+        worker = fork.Process(target=run_worker, args=(directory, requests, connections, written, done))
+        worker.start()
+        assert written.wait(timeout=10)
+        workers.append((worker, done))
+    # The second worker exits: its counters stay in the totals, its gauges don't
+    workers[1][1].set()
+    workers[1][0].join(timeout=10)
+    assert not workers[1][0].is_alive()
+
+    try:
+        rendered = worker_registry(directory, 1, 1000).render().splitlines()
+    finally:
+        workers[0][1].set()
+        workers[0][0].join(timeout=10)
+
+    assert 'requests_total{route="/"} 6' in rendered
+    assert 'latency_seconds_bucket{route="/",le="0.1"} 0' in rendered
+    assert 'latency_seconds_bucket{route="/",le="1.0"} 6' in rendered
+    assert 'latency_seconds_count{route="/"} 6' in rendered
+    assert 'latency_seconds_sum{route="/"} 3.000000' in rendered
+    # This process and the first worker, which was alive when the snapshots were read
+    assert "connections 1010" in rendered
@@ -0,0 +1,56 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlmodel import SQLModel
+
+from app import models
+from app.api.v1.routers.auth_router import get_current_admin_user
+from app.core.user_cache import UserSnapshot
+from app.database import engine
+from app.main import app
+
+
+@pytest.fixture(scope="module")
+def client():
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"email": f"user{i}@example.com", "hashed_password": "x", "is_admin": False} for i in range(3)
+        ])
+    app.dependency_overrides[get_current_admin_user] = lambda: UserSnapshot(id=1, email="user0@example.com", is_admin=True)
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    SQLModel.metadata.drop_all(engine)
+
+
+@pytest.mark.parametrize("path", ["/api/v1/users/", "/api/v1/addons/torrentio/usage-logs"])
+@pytest.mark.parametrize("query", ["limit=0", "limit=-1", "limit=1001", "skip=-1"])
+def test_out_of_range_paging_is_rejected(client, path, query):
+    assert client.get(f"{path}?{query}").status_code == 422
+
+
+def test_full_page_returns_next_cursor(client):
+    response = client.get("/api/v1/users/?limit=2")
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+    rest = client.get(f"/api/v1/users/?limit=2&cursor={response.headers['X-Next-Cursor']}")
+    assert [user["email"] for user in rest.json()] == ["user2@example.com"]
+    assert "X-Next-Cursor" not in rest.headers
+
+
+@pytest.mark.parametrize("path, query", [
+    ("/api/v1/users/", "skip=1&cursor=WzFd"),
+    ("/api/v1/addons/torrentio/usage-logs", "skip=1&cursor=WzFd"),
+    ("/api/v1/addons/torrentio/usage-logs", "skip=1&user_id=1"),
+    ("/api/v1/addons/torrentio/usage-logs", "skip=1&since=2024-01-01T00:00:00"),
+    ("/api/v1/addons/torrentio/usage-logs", "skip=1&until=2024-01-01T00:00:00"),
+])
+def test_skip_is_not_combined_with_cursor_or_filters(client, path, query):
+    # Offset paging ignores them, so the page would silently not match the request
+    assert client.get(f"{path}?{query}").status_code == 400
+
+
+def test_skip_alone_still_pages_by_offset(client):
+    response = client.get("/api/v1/users/?skip=1&limit=1")
+    assert [user["email"] for user in response.json()] == ["user1@example.com"]
@@ -0,0 +1,35 @@
+import multiprocessing
+
+import pytest
+
+from app.core.rate_limit import SharedTokenBucket
+
+fork = multiprocessing.get_context("fork")
+
+
+def reserve_tokens(path: str, count: int, start, results):
+    bucket = SharedTokenBucket(rate=10, capacity=5, path=path)
+    start.wait(timeout=10)
+    results.put([bucket.reserve() for _ in range(count)])
+
+
+def test_processes_share_one_budget(tmp_path):
+    path = str(tmp_path / "rate-limit")
+    start, results = fork.Barrier(4), fork.Queue()
+    processes = [fork.Process(target=reserve_tokens, args=(path, 5, start, results)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    delays = sorted(delay for _ in processes for delay in results.get(timeout=10))
+    for process in processes:
+        process.join(timeout=10)
+
+    # 20 tokens from one bucket of 5 refilling at 10/s: the first 5 are free and
+    # the last waits 1.5 s. Separate buckets would have let every call through.
+    assert delays[:5] == [0.0] * 5
+    assert delays[-1] == pytest.approx(1.5, abs=0.1)
+
+
+def test_without_a_path_the_bucket_is_private():
+    bucket = SharedTokenBucket(rate=10, capacity=1, path=None)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
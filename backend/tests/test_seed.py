@@ -0,0 +1,77 @@
+import importlib.util
+import os
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+from sqlmodel import SQLModel
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+spec = importlib.util.spec_from_file_location("seed", os.path.join(BACKEND_DIR, "scripts", "seed.py"))
+seed = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(seed)
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "seed.db")
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    engine.dispose()
+    return path
+
+
+def usage_log_indexes(path: str) -> set[str]:
+    with sqlite3.connect(path) as conn:
+        return {
+            name for (name,) in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'addonusagelog'"
+            )
+        } & set(seed.USAGE_LOG_INDEXES)
+
+
+def journal_mode(path: str) -> str:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("PRAGMA journal_mode").fetchone()[0]
+
+
+def test_seed_loads_events_and_rebuilds_indexes(database):
+    seed.generate_dataset(database, users=20, events=2000, days=5)
+
+    with sqlite3.connect(database) as conn:
+        assert conn.execute("SELECT count(*) FROM addonusagelog").fetchone()[0] == 2000
+        assert conn.execute("SELECT sum(count) FROM addonusagedaily").fetchone()[0] == 2000
+    assert usage_log_indexes(database) == set(seed.USAGE_LOG_INDEXES)
+    assert journal_mode(database) == "delete"
+
+
+def test_indexes_are_restored_when_the_load_fails(database, monkeypatch):
+    generate_day = seed.generate_day
+    days = []
+
+    def failing_generate_day(*args):
+        days.append(args[1])
+        if len(days) == 3:
+            raise RuntimeError("disk full")
+        return generate_day(*args)
+
+    monkeypatch.setattr(seed, "generate_day", failing_generate_day)
+    with pytest.raises(RuntimeError):
+        seed.generate_dataset(database, users=20, events=2000, days=5, commit_every=1)
+
+    assert usage_log_indexes(database) == set(seed.USAGE_LOG_INDEXES)
+    assert journal_mode(database) == "delete"
+    with sqlite3.connect(database) as conn:
+        # The two days committed before the failure are kept
+        assert conn.execute("SELECT count(DISTINCT substr(created_at, 1, 10)) FROM addonusagelog").fetchone()[0] == 2
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+
+
+def test_rerunning_restores_indexes_left_dropped_by_a_killed_run(database):
+    with sqlite3.connect(database) as conn:
+        for name in seed.USAGE_LOG_INDEXES:
+            conn.execute(f"DROP INDEX {name}")
+
+    seed.generate_dataset(database, users=20, events=0)
+    assert usage_log_indexes(database) == set(seed.USAGE_LOG_INDEXES)
@@ -0,0 +1,97 @@
+import multiprocessing
+import os
+
+import pytest
+
+from app.core.slow_queries import SlowQueryLog, normalize_statement, redact_parameters
+
+fork = multiprocessing.get_context("fork")
+
+
+@pytest.mark.parametrize("statement, shape", [
+    ("SELECT * FROM user WHERE email = 'a@example.com'", "SELECT * FROM user WHERE email = ?"),
+    ("SELECT * FROM user WHERE name = 'O''Brien' AND id = 42", "SELECT * FROM user WHERE name = ? AND id = ?"),
+    ("SELECT * FROM t1 WHERE t1.score > -1.5 LIMIT 10", "SELECT * FROM t1 WHERE t1.score > ? LIMIT ?"),
+    ("SELECT * FROM user WHERE id IN (1, 2, 3)", "SELECT * FROM user WHERE id IN (?...)"),
+    ("SELECT * FROM user WHERE id IN (?,?,?,?,?)", "SELECT * FROM user WHERE id IN (?...)"),
+    ("SELECT *\n  FROM user\n  WHERE id = ?", "SELECT * FROM user WHERE id = ?"),
+])
+def test_normalize_statement(statement, shape):
+    assert normalize_statement(statement) == shape
+
+
+def test_in_lists_of_any_length_share_a_shape():
+    shapes = {normalize_statement(f"SELECT * FROM user WHERE id IN ({', '.join(['?'] * n)})") for n in range(2, 50)}
+    assert len(shapes) == 1
+
+
+def test_redact_parameters_keeps_no_strings_or_bytes():
+    email, info_hash = "someone@example.com", "a" * 40
+    redacted = redact_parameters((email, info_hash.encode(), 7, 1.5, True, None))
+    assert redacted == ["<str(19)>", "<bytes(40)>", 7, 1.5, True, None]
+    named = redact_parameters({"email": email, "hash": info_hash, "limit": 10})
+    assert named == {"email": "<str(19)>", "hash": "<str(40)>", "limit": 10}
+    assert email not in repr((redacted, named)) and info_hash not in repr((redacted, named))
+    assert redact_parameters(None) is None
+
+
+def record(log: SlowQueryLog, statement: str, duration: float, database: str = "main"):
+    log.record(None, database, statement, ("secret",), duration, executemany=False)
+
+
+def test_worst_groups_by_database_and_shape():
+    log = SlowQueryLog(threshold=0.1, explain=False)
+    record(log, "SELECT * FROM user WHERE id = 1", 0.2)
+    record(log, "SELECT * FROM user WHERE id = 2", 0.5)
+    record(log, "SELECT * FROM user WHERE id = 3", 0.1, database="usage")
+    for _ in range(4):
+        record(log, "SELECT count(*) FROM addonusagelog", 0.15)
+
+    by_total = log.worst()
+    assert [(group["database"], group["count"]) for group in by_total] == [("main", 2), ("main", 4), ("usage", 1)]
+    user = by_total[0]
+    assert user["shape"] == "SELECT * FROM user WHERE id = ?"
+    assert (user["total_ms"], user["max_ms"], user["mean_ms"]) == (700.0, 500.0, 350.0)
+    assert user["routes"] == {"(background)": 2}
+    assert user["parameters"] == ["<str(6)>"]
+
+    assert [group["max_ms"] for group in log.worst(sort="max")] == [500.0, 150.0, 100.0]
+    assert [group["count"] for group in log.worst(sort="count", limit=1)] == [4]
+
+
+def record_in_worker(directory: str):
+    log = SlowQueryLog(threshold=0.1, explain=False, directory=directory)
+    record(log, "SELECT * FROM user WHERE id = 1", 0.3)
+    record(log, "SELECT count(*) FROM addonusagelog", 0.2)
+
+
+def test_workers_sharing_a_directory_are_merged(tmp_path):
+    directory = str(tmp_path)
+    worker = fork.Process(target=record_in_worker, args=(directory,))
+    worker.start()
+    worker.join(timeout=10)
+
+    log = SlowQueryLog(threshold=0.1, explain=False, directory=directory)
+    record(log, "SELECT * FROM user WHERE id = 2", 0.1)
+    stats = log.stats()
+    assert (stats["workers"], stats["buffered"], stats["pid"]) == (2, 3, os.getpid())
+    assert {group["shape"]: group["count"] for group in log.worst()} == {
+        "SELECT * FROM user WHERE id = ?": 2,
+        "SELECT count(*) FROM addonusagelog": 1,
+    }
+
+    # Clearing applies to every worker and forgets the ones that exited
+    log.clear()
+    assert log.worst() == []
+    assert log.stats()["workers"] == 1
+    record(log, "SELECT * FROM user WHERE id = 3", 0.1)
+    assert [group["count"] for group in log.worst()] == [1]
+
+
+def test_worker_files_stay_bounded(tmp_path):
+    log = SlowQueryLog(threshold=0.1, maxsize=5, explain=False, directory=str(tmp_path))
+    for i in range(50):
+        record(log, f"SELECT * FROM user WHERE id = {i}", 0.1)
+    with open(tmp_path / f"{os.getpid()}.jsonl") as f:
+        assert len(f.readlines()) <= 10
+    assert log.stats()["buffered"] == 5
@@ -0,0 +1,96 @@
+import asyncio
+import contextlib
+import json
+import time
+
+import pytest
+
+from app.services.stream_proxy import StreamProxy
+
+
+def upstream(stub_url: str, mode: str, name: str | None = None, timeout: float = 5.0) -> dict:
+    return {"name": name or mode, "manifestUrl": f"{stub_url}/{mode}/manifest.json", "timeout": timeout}
+
+
+@contextlib.asynccontextmanager
+async def stream_proxy(*upstreams: dict, **kwargs):
+    proxy = StreamProxy(upstreams=lambda: list(upstreams), **kwargs)
+    await proxy.start()
+    try:
+        yield proxy
+    finally:
+        await proxy.stop()
+
+
+def streams(body: bytes) -> list[dict]:
+    return json.loads(body)["streams"]
+
+
+def requests(proxy: StreamProxy, name: str) -> int:
+    return proxy.stats()["upstreams"].get(name, {}).get("requests", 0)
+
+
+def test_concurrent_lookups_share_one_upstream_fetch(stub_url):
+    async def main():
+        async with stream_proxy(upstream(stub_url, "ok"), upstream(stub_url, "ok2")) as proxy:
+            bodies = await asyncio.gather(*(proxy.get_streams("movie", "tt0000001") for _ in range(5)))
+            return bodies, requests(proxy, "ok"), requests(proxy, "ok2"), proxy.coalesced
+
+    bodies, ok, ok2, coalesced = asyncio.run(main())
+    assert bodies == [bodies[0]] * 5
+    assert (ok, ok2, coalesced) == (1, 1, 4)
+
+
+@pytest.mark.parametrize("first, second", [("ok", "ok2"), ("ok2", "ok")])
+def test_duplicate_hashes_are_merged_in_upstream_order(stub_url, first, second):
+    """Comet is the first upstream, so its copy of a stream both providers know is the one kept."""
+    async def main():
+        async with stream_proxy(upstream(stub_url, first), upstream(stub_url, second)) as proxy:
+            return streams(await proxy.get_streams("movie", "tt0000002"))
+
+    merged = asyncio.run(main())
+    # ok and ok2 return ten streams each, five of them with the same info hash
+    assert len(merged) == 15
+    assert len({stream["infoHash"] for stream in merged}) == 15
+    assert [stream["name"] for stream in merged] == [f"Stub {first}"] * 10 + [f"Stub {second}"] * 5
+
+
+def test_slow_upstream_times_out_without_holding_back_the_others(stub_url):
+    async def main():
+        async with stream_proxy(upstream(stub_url, "ok"), upstream(stub_url, "slow", timeout=0.3)) as proxy:
+            start = time.perf_counter()
+            body = await proxy.get_streams("movie", "tt0000003")
+            return body, time.perf_counter() - start, proxy.stats()["upstreams"]
+
+    body, elapsed, stats = asyncio.run(main())
+    assert len(streams(body)) == 10
+    assert elapsed < 2
+    assert stats["slow"]["timeouts"] == 1
+    assert stats["ok"]["timeouts"] == 0
+
+
+def test_results_are_cached_until_the_ttl(stub_url):
+    async def main():
+        async with stream_proxy(upstream(stub_url, "ok"), ttl=0.5) as proxy:
+            first = await proxy.get_streams("movie", "tt0000004")
+            cached = await proxy.get_streams("movie", "tt0000004")
+            fetches = requests(proxy, "ok")
+            await asyncio.sleep(0.6)
+            await proxy.get_streams("movie", "tt0000004")
+            return first, cached, fetches, requests(proxy, "ok")
+
+    first, cached, fetches_while_cached, fetches_after_ttl = asyncio.run(main())
+    assert cached == first
+    assert (fetches_while_cached, fetches_after_ttl) == (1, 2)
+
+
+def test_failed_lookups_are_not_cached(stub_url):
+    async def main():
+        async with stream_proxy(upstream(stub_url, "fail")) as proxy:
+            first = await proxy.get_streams("movie", "tt0000005")
+            await proxy.get_streams("movie", "tt0000005")
+            return first, proxy.stats()["upstreams"]["fail"]
+
+    body, stats = asyncio.run(main())
+    assert streams(body) == []
+    assert (stats["requests"], stats["errors"]) == (2, 2)
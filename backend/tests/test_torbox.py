@@ -0,0 +1,89 @@
+import asyncio
+import contextlib
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from app.services.torbox import TorboxAvailabilityChecker
+
+# The stub reports hashes starting with 0-7 as cached, those starting with 7 without details
+HASHES = [f"{i % 16:x}{i:039x}" for i in range(250)]
+
+
+def is_cached(info_hash: str) -> bool:
+    return info_hash[0] in "01234567"
+
+
+@contextlib.asynccontextmanager
+async def torbox(stub_url: str, tmp_path, **kwargs):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'torbox.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    checker = TorboxAvailabilityChecker(
+        base_url=f"{stub_url}/torbox",
+        api_key="test",
+        rate=100,
+        session_factory=sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False),
+        **kwargs,
+    )
+    await checker.start()
+    try:
+        yield checker
+    finally:
+        await checker.stop()
+        await engine.dispose()
+
+
+def test_normalize_lowercases_and_deduplicates():
+    info_hash = "AB" * 20
+    assert TorboxAvailabilityChecker.normalize([f" {info_hash} ", info_hash.lower(), "cd" * 20]) == [
+        "ab" * 20, "cd" * 20
+    ]
+    with pytest.raises(ValueError):
+        TorboxAvailabilityChecker.normalize(["ab" * 20, "not-a-hash"])
+
+
+def test_hashes_are_checked_in_batches(stub_url, tmp_path):
+    async def main():
+        async with torbox(stub_url, tmp_path, batch_size=100) as checker:
+            return await checker.check([info_hash.upper() for info_hash in HASHES]), checker.stats()
+
+    results, stats = asyncio.run(main())
+    assert list(results) == HASHES
+    assert stats["requests"] == 3  # the stub rejects more than 100 hashes per request
+    assert stats["failed_requests"] == 0
+    assert all(results[info_hash]["cached"] == is_cached(info_hash) for info_hash in HASHES)
+    assert results["0" * 40]["name"] == "Torrent 00000000"
+    # Cached, but answered without details
+    seventh = next(info_hash for info_hash in HASHES if info_hash[0] == "7")
+    assert results[seventh] == {"cached": True, "name": None, "size": None, "from_cache": False}
+
+
+def test_fresh_answers_are_reused(stub_url, tmp_path):
+    async def main():
+        async with torbox(stub_url, tmp_path, negative_ttl=0) as checker:
+            await checker.check(HASHES)
+            again = await checker.check(HASHES)
+            return again, checker.stats()
+
+    again, stats = asyncio.run(main())
+    # Positive answers are still fresh; negative ones expire at once and are asked again
+    assert all(again[info_hash]["from_cache"] == is_cached(info_hash) for info_hash in HASHES)
+    assert all(again[info_hash]["cached"] == is_cached(info_hash) for info_hash in HASHES)
+    assert stats["cache_hits"] == sum(map(is_cached, HASHES))
+    assert stats["requests"] == 3 + 2
+
+
+def test_failed_batches_are_unknown_and_not_stored(stub_url, tmp_path):
+    async def main():
+        async with torbox(stub_url, tmp_path, batch_size=150) as checker:
+            first = await checker.check(HASHES[:150])
+            second = await checker.check(HASHES[:150])
+            return first, second, checker.stats()
+
+    first, second, stats = asyncio.run(main())
+    assert all(result["cached"] is None for result in first.values())
+    assert all(not result["from_cache"] for result in second.values())
+    assert stats["failed_requests"] == 2
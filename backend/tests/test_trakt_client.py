@@ -0,0 +1,188 @@
+import asyncio
+import contextlib
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from app.services.trakt_client import TraktClient, _retry_after
+
+
+@contextlib.asynccontextmanager
+async def trakt(stub_url: str, cache_dir: str | None = None, **kwargs):
+    client = TraktClient(base_url=f"{stub_url}/trakt", client_id="test", cache_dir=cache_dir, **kwargs)
+    await client.start()
+    try:
+        yield client
+    finally:
+        await client.aclose()
+
+
+def stub_requests(stub_url: str, path: str) -> int:
+    return httpx.get(f"{stub_url}/trakt/stub/requests").json().get(path, 0)
+
+
+def fail_next(stub_url: str, count: int = 1, status: int = 503, retry_after: str | None = None):
+    params = {"count": count, "status": status}
+    if retry_after is not None:
+        params["retry_after"] = retry_after
+    httpx.post(f"{stub_url}/trakt/stub/fail", params=params).raise_for_status()
+
+
+def test_gets_wait_for_the_rate_limit(stub_url):
+    async def main():
+        async with trakt(stub_url, get_rate=10, get_burst=1) as client:
+            start = time.perf_counter()
+            for _ in range(4):
+                assert (await client.get("/sync/last_activities")).status_code == 200
+            return time.perf_counter() - start
+
+    # The first GET spends the burst, the other three wait 0.1 s each for a token
+    assert asyncio.run(main()) >= 0.25
+
+
+@pytest.mark.parametrize("retry_after", [
+    "0",
+    "Wed, 21 Oct 2015 07:28:00 GMT",
+    format_datetime(datetime.now(timezone.utc) - timedelta(seconds=5), usegmt=True),
+])
+def test_429_is_retried_after_retry_after(stub_url, retry_after):
+    async def main():
+        async with trakt(stub_url) as client:
+            fail_next(stub_url, status=429, retry_after=retry_after)
+            response = await client.get("/sync/last_activities")
+            return response, client.rate_limited
+
+    before = stub_requests(stub_url, "/trakt/sync/last_activities")
+    response, rate_limited = asyncio.run(main())
+    assert response.status_code == 200
+    assert rate_limited == 1
+    assert stub_requests(stub_url, "/trakt/sync/last_activities") == before + 2
+
+
+def test_retry_after_accepts_seconds_and_http_dates():
+    assert _retry_after("7", 1.0) == 7.0
+    assert _retry_after(None, 1.0) == 1.0
+    assert _retry_after("soon", 4.0) == 4.0
+    assert _retry_after("Wed, 21 Oct 2015 07:28:00 GMT", 1.0) == 0.0
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 <= _retry_after(later, 1.0) <= 30
+
+
+def test_5xx_is_retried_until_max_retries(stub_url):
+    async def main():
+        async with trakt(stub_url, max_retries=1) as client:
+            fail_next(stub_url)
+            recovered = await client.get("/sync/last_activities")
+            fail_next(stub_url, count=2)
+            exhausted = await client.get("/sync/last_activities")
+            return recovered, exhausted, client.stats()
+
+    recovered, exhausted, stats = asyncio.run(main())
+    assert recovered.status_code == 200
+    assert exhausted.status_code == 503
+    assert stats["endpoints"]["/sync/last_activities"]["errors"] == 3
+
+
+@pytest.mark.parametrize("path", ["/users/me", "/users/settings"])
+def test_cached_gets_revalidate(stub_url, tmp_path, path):
+    """/users/me revalidates with its ETag, /users/settings only has Last-Modified."""
+    async def main():
+        async with trakt(stub_url, cache_dir=str(tmp_path)) as client:
+            first = await client.get(path, access_token="revalidate")
+            second = await client.get(path, access_token="revalidate")
+            return first, second, client.stats()
+
+    before = stub_requests(stub_url, f"/trakt{path}")
+    first, second, stats = asyncio.run(main())
+    assert not first.from_cache
+    assert second.from_cache
+    assert second.status_code == 200
+    assert second.data == first.data
+    assert stats["endpoints"][path]["not_modified"] == 1
+    assert stub_requests(stub_url, f"/trakt{path}") == before + 2
+
+
+def test_identical_concurrent_gets_are_coalesced(stub_url):
+    async def main():
+        async with trakt(stub_url) as client:
+            same = await asyncio.gather(*(client.get("/users/me", access_token="coalesce") for _ in range(5)))
+            other = await client.get("/users/me", access_token="someone-else")
+            return same, other, client.coalesced
+
+    before = stub_requests(stub_url, "/trakt/users/me")
+    same, other, coalesced = asyncio.run(main())
+    assert [response.data for response in same] == [same[0].data] * 5
+    assert other.status_code == 200
+    assert coalesced == 4
+    assert stub_requests(stub_url, "/trakt/users/me") == before + 2
+
+
+def test_disk_cache_keeps_the_most_recently_used_entries(stub_url, tmp_path):
+    async def main():
+        async with trakt(stub_url, cache_dir=str(tmp_path), cache_max_entries=5) as client:
+            await asyncio.gather(*(client.get("/users/me", access_token=f"user-{i}") for i in range(12)))
+
+    asyncio.run(main())
+    assert len(os.listdir(tmp_path)) == 5
+
+
+def test_disk_cache_drops_entries_unused_for_the_max_age(stub_url, tmp_path):
+    month_ago = time.time() - 31 * 86400
+    for name in ("unused.json", "abandoned.json.123.tmp"):
+        (tmp_path / name).write_text("{}")
+        os.utime(tmp_path / name, (month_ago, month_ago))
+    (tmp_path / "recent.json").write_text("{}")
+    (tmp_path / "in-progress.json.456.tmp").write_text("{}")
+
+    async def main():
+        async with trakt(stub_url, cache_dir=str(tmp_path)):
+            pass
+
+    asyncio.run(main())
+    assert sorted(os.listdir(tmp_path)) == ["in-progress.json.456.tmp", "recent.json"]
+
+
+def test_posts_that_must_not_repeat_are_only_retried_when_trakt_did_not_process_them(stub_url):
+    payload = {"grant_type": "refresh_token", "refresh_token": "single-use"}
+
+    async def main():
+        async with trakt(stub_url) as client:
+            fail_next(stub_url, status=503)
+            failed = await client.post("/oauth/token", json=payload, retry=False)
+            fail_next(stub_url, status=429, retry_after="0")
+            rate_limited = await client.post("/oauth/token", json=payload, retry=False)
+            return failed, rate_limited
+
+    before = stub_requests(stub_url, "/trakt/oauth/token")
+    failed, rate_limited = asyncio.run(main())
+    assert failed.status_code == 503
+    assert rate_limited.status_code == 200
+    # One 503 that wasn't retried, then a 429 and its retry (the stub itself may add another 429)
+    assert stub_requests(stub_url, "/trakt/oauth/token") - before in (3, 4)
+
+
+def test_connection_failures_are_retried_even_when_posts_must_not_repeat():
+    async def main():
+        # Nothing listens on port 9 (discard), so every attempt fails to connect
+        async with trakt("http://127.0.0.1:9", max_retries=1) as client:
+            with pytest.raises(httpx.ConnectError):
+                await client.post("/oauth/token", json={}, retry=False)
+            return client.stats()
+
+    assert asyncio.run(main())["endpoints"]["/oauth/token"]["requests"] == 2
+
+
+def test_write_limit_follows_the_user_across_token_refreshes(stub_url):
+    async def main():
+        async with trakt(stub_url, write_rate=5) as client:
+            start = time.perf_counter()
+            await client.post("/sync/history", json={}, access_token="before-refresh", user_id=1)
+            await client.post("/sync/history", json={}, access_token="after-refresh", user_id=1)
+            return time.perf_counter() - start
+
+    # The second write waits for user 1's bucket (0.2 s at 5/s) despite the new token
+    assert asyncio.run(main()) >= 0.15
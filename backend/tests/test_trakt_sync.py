@@ -0,0 +1,110 @@
+import asyncio
+import contextlib
+import time
+from collections import Counter
+
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from app import models
+from app.database import PROFILES, create_async_sqlite_engine
+from app.services.trakt_client import TraktClient
+from app.services.trakt_sync import TraktSyncEngine, TraktSyncInProgress
+
+USERS = 8
+
+
+@contextlib.asynccontextmanager
+async def database(tmp_path):
+    engine = create_async_sqlite_engine(f"sqlite+aiosqlite:///{tmp_path / 'sync.db'}", PROFILES["fast"])
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.execute(insert(models.User), [
+            {"id": i, "email": f"user{i}@example.com", "hashed_password": "x", "is_admin": False}
+            for i in range(1, USERS + 1)
+        ])
+        await conn.execute(insert(models.TraktUserAuth), [
+            {"user_id": i, "access_token": f"access-{i}", "refresh_token": f"refresh-{i}",
+             "expires_in": 86400, "scope": "public", "created_at": int(time.time())}
+            for i in range(1, USERS + 1)
+        ])
+    try:
+        yield sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    finally:
+        await engine.dispose()
+
+
+class RecordingSyncEngine(TraktSyncEngine):
+    """Notes every user it syncs, in a Counter shared by the engines of one test."""
+
+    def __init__(self, synced: Counter, **kwargs):
+        super().__init__(**kwargs)
+        self.synced_users = synced
+
+    async def _sync(self, row, full: bool = False) -> dict:
+        self.synced_users[row.user_id] += 1
+        return await super()._sync(row, full=full)
+
+
+@contextlib.asynccontextmanager
+async def sync_engines(stub_url: str, session_factory, count: int, synced: Counter):
+    """Engines like those of separate workers: one client and engine each, one database."""
+    clients = [
+        TraktClient(base_url=f"{stub_url}/trakt", client_id="test", cache_dir=None, get_rate=1000)
+        for _ in range(count)
+    ]
+    for client in clients:
+        await client.start()
+    try:
+        yield [
+            RecordingSyncEngine(synced, client=client, batch_size=2, concurrency=2, session_factory=session_factory)
+            for client in clients
+        ]
+    finally:
+        for client in clients:
+            await client.aclose()
+
+
+def test_concurrent_engines_never_sync_the_same_user(stub_url, tmp_path):
+    synced = Counter()
+
+    async def main():
+        async with database(tmp_path) as session_factory:
+            async with sync_engines(stub_url, session_factory, 4, synced) as engines:
+                counts = await asyncio.gather(*(engine.run_once() for engine in engines))
+            async with session_factory() as db:
+                states = (await db.execute(select(models.TraktSyncState))).scalars().all()
+            return counts, states
+
+    counts, states = asyncio.run(main())
+    assert sum(counts) == USERS
+    assert synced == Counter(range(1, USERS + 1))
+    assert all(state.error is None and state.claimed_until is None for state in states)
+
+
+def test_claimed_user_is_skipped_until_the_sync_is_saved(stub_url, tmp_path):
+    synced = Counter()
+
+    async def main():
+        async with database(tmp_path) as session_factory:
+            async with sync_engines(stub_url, session_factory, 2, synced) as (first, second):
+                # Another worker holds user 1 while it syncs them
+                async with session_factory() as db:
+                    db.add(models.TraktSyncState(user_id=1, claimed_until=int(time.time()) + 60))
+                    await db.commit()
+                assert await first.run_once() == USERS - 1
+                with pytest.raises(TraktSyncInProgress):
+                    await second.sync_user(1)
+
+                async with session_factory() as db:
+                    state = await db.get(models.TraktSyncState, 1)
+                    state.claimed_until = int(time.time()) - 1  # the lease ran out
+                    await db.commit()
+                assert (await second.sync_user(1))["user_id"] == 1
+                assert await second.sync_user(USERS + 1) is None
+
+    asyncio.run(main())
+    assert synced == Counter(range(1, USERS + 1))
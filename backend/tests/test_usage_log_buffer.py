@@ -0,0 +1,94 @@
+import asyncio
+import contextlib
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from app import models
+from app.services.usage_log_buffer import UsageLogBuffer
+
+
+@contextlib.asynccontextmanager
+async def usage_log_buffer(tmp_path, **kwargs):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'usage.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.execute(
+            insert(models.User), [{"id": 1, "email": "user@example.com", "hashed_password": "x", "is_admin": False}]
+        )
+    session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    buffer = UsageLogBuffer(session_factory=session_factory, **kwargs)
+    await buffer.start()
+    try:
+        yield buffer, session_factory
+    finally:
+        await buffer.stop()
+        await engine.dispose()
+
+
+async def stored(session_factory) -> tuple[int, int]:
+    """(usage log rows, events counted in the daily rollup)"""
+    async with session_factory() as db:
+        logs = (await db.execute(select(func.count()).select_from(models.AddonUsageLog))).scalar()
+        daily = (await db.execute(select(func.coalesce(func.sum(models.AddonUsageDaily.count), 0)))).scalar()
+    return logs, daily
+
+
+def test_full_batches_are_written_without_waiting_for_the_interval(tmp_path):
+    async def main():
+        async with usage_log_buffer(tmp_path, batch_size=10, flush_interval=60) as (buffer, session_factory):
+            for _ in range(5):
+                buffer.record(1, "torrentio")
+            await asyncio.sleep(0.2)
+            partial = await stored(session_factory)
+            for _ in range(20):
+                buffer.record(1, "torrentio")
+            await asyncio.sleep(0.2)
+            return partial, await stored(session_factory), buffer.stats()
+
+    partial, full, stats = asyncio.run(main())
+    assert partial == (0, 0)
+    assert full == (25, 25)
+    assert (stats["written"], stats["batches"], stats["queue_depth"]) == (25, 3, 0)
+
+
+def test_partial_batches_are_written_after_the_interval(tmp_path):
+    async def main():
+        async with usage_log_buffer(tmp_path, batch_size=100, flush_interval=0.2) as (buffer, session_factory):
+            for _ in range(3):
+                buffer.record(1)
+            await asyncio.sleep(0.5)
+            return await stored(session_factory), buffer.stats()
+
+    written, stats = asyncio.run(main())
+    assert written == (3, 3)
+    assert (stats["written"], stats["batches"]) == (3, 1)
+
+
+def test_stop_writes_what_is_still_buffered(tmp_path):
+    async def main():
+        async with usage_log_buffer(tmp_path, batch_size=100, flush_interval=60) as (buffer, session_factory):
+            for _ in range(7):
+                buffer.record(1)
+            await buffer.stop()
+            return await stored(session_factory), buffer.stats()
+
+    written, stats = asyncio.run(main())
+    assert written == (7, 7)
+    assert (stats["written"], stats["queue_depth"]) == (7, 0)
+
+
+def test_events_are_dropped_and_counted_when_the_buffer_is_full(tmp_path):
+    async def main():
+        async with usage_log_buffer(tmp_path, batch_size=100, maxsize=5) as (buffer, session_factory):
+            accepted = [buffer.record(1) for _ in range(8)]
+            stats = buffer.stats()
+            await buffer.stop()
+            return accepted, stats, await stored(session_factory)
+
+    accepted, stats, written = asyncio.run(main())
+    assert accepted == [True] * 5 + [False] * 3
+    assert (stats["enqueued"], stats["dropped"], stats["queue_depth"]) == (5, 3, 5)
+    assert written == (5, 5)